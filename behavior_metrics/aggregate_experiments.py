@@ -0,0 +1,34 @@
+import argparse
+
+from utils import experiments_aggregation
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Aggregate the metrics of the experiments of a directory in a Parquet '
+                                                 'table. Only new or updated experiments are read on each run and '
+                                                 'broken ones are moved to a quarantine folder.',
+                                     epilog='Enjoy the program! :)')
+
+    parser.add_argument('-r',
+                        '--root',
+                        type=str,
+                        required=True,
+                        help='Directory that contains the experiment folders.')
+
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        default=None,
+                        help='Parquet file of the aggregated metrics. By default {} in the root '
+                             'directory.'.format(experiments_aggregation.AGGREGATED_METRICS_FILENAME))
+
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=None,
+                        help='Number of worker processes. By default the number of CPUs.')
+
+    args = parser.parse_args()
+
+    result = experiments_aggregation.aggregate_experiments(args.root, output=args.output, jobs=args.jobs)
+    print('Aggregated metrics of {} experiments'.format(len(result)))
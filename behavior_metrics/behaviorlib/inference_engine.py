@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+
+"""This module contains the inference engines used by the neural brains.
+
+An InferenceEngine loads a model in one of the supported formats (Keras, TF-Lite, TF-TRT, ONNX, TorchScript or an
+eager PyTorch module) and runs single sample inference on it. The input tensors are allocated once, the model is
+warmed up when it is loaded, so the first iterations of the experiment do not pay for the graph tracing or JIT
+compilation, and the latency of every call is recorded in a histogram.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import numpy as np
+
+from utils.logger import logger
+
+WARMUP_ITERATIONS = 10
+# Ways of running a Keras model, selected with the `KerasInference` brain option
+KERAS_INFERENCE_MODES = ('predict', 'call', 'compiled', 'xla')
+DEFAULT_KERAS_INFERENCE = 'compiled'
+# Latency histogram bins: 20 per decade from 10 us to 10 s
+LATENCY_HISTOGRAM_EDGES = np.logspace(-5, 1, 121)
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+class LatencyHistogram:
+    """Histogram of the inference latencies, in seconds, with logarithmic bins.
+
+    Attributes:
+        counts {np.ndarray} -- Calls per bin, the first and last bins also count the latencies out of the edges
+        total {float} -- Sum of the latencies
+        minimum {float} -- Fastest call
+        maximum {float} -- Slowest call
+    """
+
+    def __init__(self, edges=LATENCY_HISTOGRAM_EDGES):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) - 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = 0.0
+
+    def record(self, latency):
+        index = min(max(int(np.searchsorted(self.edges, latency, side='right')) - 1, 0), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += float(latency)
+        self.minimum = min(self.minimum, float(latency))
+        self.maximum = max(self.maximum, float(latency))
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percentile):
+        """Upper edge of the bin that contains the given percentile of the latencies."""
+        if not self.count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), percentile / 100 * self.count))
+        return float(min(self.edges[index + 1], self.maximum))
+
+    def summary(self, prefix='inference_latency'):
+        """Flat dict with the number of calls, mean, minimum, maximum and percentiles, ready for the metrics."""
+        summary = {
+            prefix + '_count': self.count,
+            prefix + '_mean': self.mean(),
+            prefix + '_min': self.minimum if self.count else 0.0,
+            prefix + '_max': self.maximum,
+        }
+        for percentile in LATENCY_PERCENTILES:
+            summary['{}_p{}'.format(prefix, percentile)] = self.percentile(percentile)
+        return summary
+
+
+class InferenceEngine:
+    """Single sample inference on a model.
+
+    Subclasses load the model in `load` and run it in `_infer`, which takes the preallocated input already filled.
+
+    Attributes:
+        model_path {str} -- Path of the model
+        input_shape {tuple} -- Shape of the model input, batch dimension included
+        input_dtype {np.dtype} -- Type of the model input
+        latencies {LatencyHistogram} -- Latency of the calls after the warm-up
+        last_latency {float} -- Latency of the last call, in seconds
+        gpu_inference {bool} -- Whether the model runs on a GPU
+    """
+
+    def __init__(self, model_path, input_shape=None, warmup=WARMUP_ITERATIONS):
+        self.model_path = model_path
+        self.input_shape = tuple(input_shape) if input_shape is not None else None
+        self.input_dtype = np.float32
+        self.latencies = LatencyHistogram()
+        self.last_latency = 0.0
+        self.gpu_inference = False
+        logger.info("Loading {} model {}".format(type(self).__name__, model_path))
+        self.load()
+        if warmup:
+            self.warmup(warmup)
+
+    def load(self):
+        raise NotImplementedError
+
+    def _set_input(self, x):
+        raise NotImplementedError
+
+    def _infer(self):
+        raise NotImplementedError
+
+    def warmup(self, iterations=WARMUP_ITERATIONS):
+        """Run the model on a blank input, without recording the latencies."""
+        if self.input_shape is None or None in self.input_shape:
+            logger.info("Skipping warm-up of {}: unknown input shape".format(self.model_path))
+            return
+        sample = np.zeros(self.input_shape, dtype=self.input_dtype)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            self._set_input(sample)
+            self._infer()
+        logger.info("Warmed up {} in {:.3f} s".format(self.model_path, time.perf_counter() - start))
+
+    def __call__(self, x):
+        """Run the model on a batch of one sample.
+
+        Arguments:
+            x {np.ndarray} -- Model input, batch dimension included
+
+        Returns:
+            np.ndarray -- Model output
+        """
+        start = time.perf_counter()
+        self._set_input(x)
+        output = self._infer()
+        self.last_latency = time.perf_counter() - start
+        self.latencies.record(self.last_latency)
+        return output
+
+
+def get_keras_inference_mode(config=None):
+    """Keras inference mode of a brain, from its `KerasInference` option (`DEFAULT_KERAS_INFERENCE` if missing)."""
+    mode = (config or {}).get('KerasInference') or DEFAULT_KERAS_INFERENCE
+    if mode not in KERAS_INFERENCE_MODES:
+        raise ValueError('Unknown Keras inference mode {}, use one of {}'.format(mode, ', '.join(KERAS_INFERENCE_MODES)))
+    return mode
+
+
+def get_keras_inference(model, mode=DEFAULT_KERAS_INFERENCE):
+    """Function that runs a Keras model on a batch and returns the prediction as a numpy array.
+
+    Keras `predict` sets up its data pipeline and callbacks on every call, which dominates the cost of a single
+    sample. The other modes call the model directly:
+        predict -- `model.predict`
+        call -- `model(x, training=False)`, run eagerly
+        compiled -- `tf.function` traced once (here) for the model input signature
+        xla -- as `compiled`, with XLA
+
+    Arguments:
+        model {tf.keras.Model} -- Keras model
+        mode {str} -- One of `KERAS_INFERENCE_MODES`
+
+    Returns:
+        function -- Function of a numpy batch
+    """
+    import tensorflow as tf
+
+    if mode == 'predict':
+        return lambda x: model.predict(x, verbose=0)
+    if mode == 'call':
+        return lambda x: model(x, training=False).numpy()
+    if mode not in KERAS_INFERENCE_MODES:
+        raise ValueError('Unknown Keras inference mode {}, use one of {}'.format(mode, ', '.join(KERAS_INFERENCE_MODES)))
+
+    jit_compile = mode == 'xla'
+    if len(model.inputs) != 1:
+        function = tf.function(lambda x: model(x, training=False), jit_compile=jit_compile)
+        return lambda x: function(x).numpy()
+
+    # Fixed signature, so the function is traced only once whatever the batch size or input type
+    spec = tf.TensorSpec((None,) + tuple(model.inputs[0].shape[1:]), model.inputs[0].dtype)
+    input_dtype = spec.dtype.as_numpy_dtype
+    function = tf.function(lambda x: model(x, training=False), input_signature=[spec], jit_compile=jit_compile)
+    function.get_concrete_function()
+    return lambda x: function(np.asarray(x, dtype=input_dtype)).numpy()
+
+
+class KerasEngine(InferenceEngine):
+    """Keras model called directly (see `get_keras_inference`), which avoids the per call overhead of `predict`.
+    The input is copied to an array allocated once, in the type of the model input.
+
+    Arguments:
+        mode {str} -- Keras inference mode (`compiled` by default)
+    """
+
+    def __init__(self, model_path, mode=DEFAULT_KERAS_INFERENCE, input_shape=None, warmup=WARMUP_ITERATIONS):
+        self.mode = mode
+        super().__init__(model_path, input_shape=input_shape, warmup=warmup)
+
+    def load(self):
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(self.model_path, compile=False)
+        self.inference = get_keras_inference(self.model, self.mode)
+        self.gpu_inference = bool(tf.test.gpu_device_name())
+        self.single_input = len(self.model.inputs) == 1
+        if self.single_input:
+            self.input_dtype = np.dtype(tf.as_dtype(self.model.inputs[0].dtype).as_numpy_dtype)
+        if self.input_shape is None:
+            self.input_shape = (1,) + tuple(self.model.input_shape[1:])
+        self.input = None
+        if self.single_input and None not in self.input_shape:
+            self.input = np.empty(self.input_shape, dtype=self.input_dtype)
+
+    def _set_input(self, x):
+        if not self.single_input:
+            self.input = x
+            return
+        if self.input is None or self.input.shape != np.shape(x):
+            self.input = np.empty(np.shape(x), dtype=self.input_dtype)
+        np.copyto(self.input, x, casting='unsafe')
+
+    def _infer(self):
+        return self.inference(self.input)
+
+
+class TFLiteEngine(InferenceEngine):
+    """TF-Lite interpreter, quantized (uint8/int8 input) models included. The input is written in place."""
+
+    def load(self):
+        import tensorflow as tf
+        self.net = tf.lite.Interpreter(model_path=self.model_path)
+        self.net.allocate_tensors()
+        input_details = self.net.get_input_details()[0]
+        output_details = self.net.get_output_details()[0]
+        self.input_index = input_details['index']
+        self.output_index = output_details['index']
+        self.tensor_dtype = input_details['dtype']
+        self.input_quantization = input_details['quantization'] if self.tensor_dtype in (np.uint8, np.int8) \
+            else None
+        self.output_quantization = output_details['quantization'] \
+            if output_details['dtype'] in (np.uint8, np.int8) else None
+        if self.input_shape is None:
+            self.input_shape = tuple(input_details['shape'])
+
+    def _set_input(self, x):
+        # The interpreter buffer is only borrowed while it is filled
+        tensor = self.net.tensor(self.input_index)()
+        if self.input_quantization is not None:
+            scale, zero_point = self.input_quantization
+            np.copyto(tensor, x / scale + zero_point, casting='unsafe')
+        else:
+            np.copyto(tensor, x, casting='unsafe')
+
+    def _infer(self):
+        self.net.invoke()
+        output = self.net.get_tensor(self.output_index)
+        if self.output_quantization is not None:
+            scale, zero_point = self.output_quantization
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+class TFTRTEngine(InferenceEngine):
+    """TF-TRT (or any TF SavedModel) through its default serving signature."""
+
+    def load(self):
+        import tensorflow as tf
+        from tensorflow.python.saved_model import signature_constants, tag_constants
+        self.tf = tf
+        self.net = tf.saved_model.load(self.model_path, tags=[tag_constants.SERVING])
+        self.infer = self.net.signatures[signature_constants.DEFAULT_SERVING_SIGNATURE_DEF_KEY]
+        self.output_name = list(self.infer.structured_outputs.keys())[0]
+        self.gpu_inference = bool(tf.test.gpu_device_name())
+        if self.input_shape is None:
+            input_spec = list(self.infer.structured_input_signature[1].values())[0]
+            self.input_shape = tuple(input_spec.shape.as_list())
+        self.input = None
+
+    def _set_input(self, x):
+        self.input = self.tf.convert_to_tensor(x, dtype=self.tf.float32)
+
+    def _infer(self):
+        return self.infer(self.input)[self.output_name].numpy()
+
+
+class ONNXEngine(InferenceEngine):
+    """ONNX model run by ONNX Runtime on the CPU."""
+
+    def load(self):
+        import onnxruntime
+        self.session = onnxruntime.InferenceSession(self.model_path, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_names = [self.session.get_outputs()[0].name]
+        if self.input_shape is None and all(isinstance(dimension, int) for dimension in model_input.shape):
+            self.input_shape = tuple(model_input.shape)
+        self.input = None
+
+    def _set_input(self, x):
+        self.input = np.asarray(x, dtype=self.input_dtype)
+
+    def _infer(self):
+        return self.session.run(self.output_names, {self.input_name: self.input})[0]
+
+
+class TorchEngine(InferenceEngine):
+    """Eager PyTorch module. The input is copied to a tensor allocated once on the model device (from pinned
+    memory when it is a GPU).
+
+    Arguments:
+        model {torch.nn.Module} -- Module whose weights are loaded from `model_path` (None to keep its weights)
+        device {str} -- Device where the model runs (`cuda` when available by default)
+    """
+
+    def __init__(self, model_path, model=None, device=None, input_shape=None, warmup=WARMUP_ITERATIONS):
+        self.model = model
+        self.device_name = device
+        super().__init__(model_path, input_shape=input_shape, warmup=warmup)
+
+    def _set_device(self):
+        import torch
+        self.torch = torch
+        if self.device_name is None:
+            self.device_name = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = torch.device(self.device_name)
+        self.gpu_inference = self.device.type == 'cuda'
+
+    def load(self):
+        self._set_device()
+        if self.model_path is not None:
+            self.model.load_state_dict(self.torch.load(self.model_path, map_location=self.device))
+        self._prepare()
+
+    def _prepare(self):
+        self.model = self.model.to(self.device).eval()
+        self.input = None
+        self.host_input = None
+        if self.input_shape is not None:
+            self._allocate(self.input_shape)
+
+    def _allocate(self, shape):
+        self.input = self.torch.empty(shape, dtype=self.torch.float32, device=self.device)
+        if self.gpu_inference:
+            self.host_input = self.torch.empty(shape, dtype=self.torch.float32).pin_memory()
+
+    def _set_input(self, x):
+        if self.input is None or tuple(self.input.shape) != tuple(x.shape):
+            self._allocate(tuple(x.shape))
+        source = self.torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32))
+        if self.host_input is not None:
+            self.host_input.copy_(source)
+            self.input.copy_(self.host_input, non_blocking=True)
+        else:
+            self.input.copy_(source)
+
+    def _infer(self):
+        with self.torch.inference_mode():
+            return self.model(self.input).cpu().numpy()
+
+
+class TorchScriptEngine(TorchEngine):
+    """TorchScript module (`torch.jit.load`)."""
+
+    def load(self):
+        self._set_device()
+        self.model = self.torch.jit.load(self.model_path, map_location=self.device)
+        self._prepare()
+
+
+ENGINES = {
+    'keras': KerasEngine,
+    'tflite': TFLiteEngine,
+    'tftrt': TFTRTEngine,
+    'onnx': ONNXEngine,
+    'torchscript': TorchScriptEngine,
+    'torch': TorchEngine,
+}
+
+
+def get_backend(model_path):
+    """Backend of a model from its path: `.tflite` files, SavedModel directories, `.onnx` files, `.pt`/`.pth` files
+    (TorchScript) and anything else as Keras."""
+    if model_path.endswith('.tflite'):
+        return 'tflite'
+    if model_path.endswith('.onnx'):
+        return 'onnx'
+    if os.path.isdir(model_path) and os.path.isfile(os.path.join(model_path, 'saved_model.pb')) and \
+            not os.path.isfile(os.path.join(model_path, 'keras_metadata.pb')):
+        return 'tftrt'
+    if model_path.endswith(('.pt', '.pth')):
+        return 'torchscript'
+    return 'keras'
+
+
+def get_inference_engine(model_path, backend=None, **kwargs):
+    """Load a model in the inference engine of its backend.
+
+    Arguments:
+        model_path {str} -- Path of the model
+        backend {str} -- One of `ENGINES`, guessed from the path by default (see `get_backend`)
+        kwargs -- Arguments of the engine (`input_shape`, `warmup`, `mode` for Keras and `model`/`device` for
+        PyTorch)
+
+    Returns:
+        InferenceEngine -- Engine of the model
+    """
+    backend = backend or get_backend(model_path)
+    if backend not in ENGINES:
+        raise ValueError('Unknown inference backend {}, use one of {}'.format(backend, ', '.join(ENGINES)))
+    return ENGINES[backend](model_path, **kwargs)
@@ -27,6 +27,7 @@ import numpy as np
 import tensorflow as tf
 from keras.backend import set_session
 from keras.models import load_model
+from behaviorlib.inference_engine import get_keras_inference
 from utils.logger import logger
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
@@ -43,13 +44,16 @@ class KerasPredictor:
         model -- Keras model instance
         img_width {int} -- Input images width
         img_height {int} -- Input images height
+        inference_mode {str} -- How the model is run (see behaviorlib.inference_engine.get_keras_inference)
     """
 
-    def __init__(self, path_to_hdf5):
+    def __init__(self, path_to_hdf5, inference_mode='predict'):
         """Constructor of the class.
 
         Arguments:
             path_to_hdf5 {str} -- Path to the model file.
+            inference_mode {str} -- `predict` runs the model in the session graph, `call`, `compiled` and `xla` run
+            it directly, without the per call overhead of `predict` (default: 'predict')
         """
 
         # Obtain the graph
@@ -58,6 +62,8 @@ class KerasPredictor:
         self.graph = tf.compat.v1.get_default_graph()
         tf.compat.v1.keras.backend.set_session(self.sess)
         self.model = tf.keras.models.load_model(path_to_hdf5)
+        self.inference_mode = inference_mode
+        self.inference = get_keras_inference(self.model, inference_mode) if inference_mode != 'predict' else None
 
         input_size = self.model.input.shape.as_list()
         self.img_height = input_size[1]
@@ -79,9 +85,12 @@ class KerasPredictor:
         img_resized = cv2.resize(img, (self.img_width, self.img_height))
         input_img = np.stack([img_resized], axis=0)
 
-        with self.graph.as_default():
-            set_session(self.sess)
-            y_pred = self.model.predict(input_img)
+        if self.inference is not None:
+            y_pred = self.inference(input_img)
+        else:
+            with self.graph.as_default():
+                set_session(self.sess)
+                y_pred = self.model.predict(input_img)
 
         if type == 'classification':
             return [np.argmax(prediction) for prediction in y_pred][0]
@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QApplication, QGridLayout, QWidget
+
+from ui.gui.views.widgets.camera import CameraWidget, DEFAULT_REFRESH_RATE
+from utils.frame_sink import GUIFrameSink
+
+# Period of the refresh loop of the GUI before the refresh timer
+LEGACY_REFRESH_MS = 100
+# Period of the refresh timer of the GUI (ui.gui.views_controller.REFRESH_TICK_MS, not imported to keep the benchmark
+# free of the ROS dependencies of the views)
+REFRESH_TICK_MS = 20
+
+
+class FramesController:
+    """Stands for the application controller: a frame sink fed by a thread, as the brains do."""
+
+    def __init__(self, frame_ids, size, rate):
+        self.frame_sink = GUIFrameSink(letterbox=True)
+        self.frame_ids = frame_ids
+        rng = np.random.default_rng(0)
+        self.images = [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(4)]
+        self.period = 1 / rate
+        self.running = True
+        self.thread = threading.Thread(target=self.produce, daemon=True)
+
+    def produce(self):
+        i = 0
+        while self.running:
+            for frame_id in self.frame_ids:
+                self.frame_sink.update_frame(frame_id, self.images[i % len(self.images)])
+            i += 1
+            time.sleep(self.period)
+
+    def get_data(self, frame_id):
+        return self.frame_sink.get_data(frame_id)
+
+    def get_frame(self, frame_id):
+        return self.frame_sink.get_frame(frame_id)
+
+
+class FramesWindow(QWidget):
+    def __init__(self, controller, frames, frame_size):
+        QWidget.__init__(self)
+        self.controller = controller
+        layout = QGridLayout()
+        self.widgets = []
+        for i in range(frames):
+            widget = CameraWidget('frame_{}'.format(i), frame_size[0], frame_size[1], True, self)
+            layout.addWidget(widget, i // 2, i % 2)
+            self.widgets.append(widget)
+        self.setLayout(layout)
+
+
+def legacy_update(widget):
+    # As CameraWidget.update did on every refresh, whether the frame changed or not
+    image = widget.parent.controller.get_data(widget.id)
+    if image is not None:
+        im = QImage(image.data, image.shape[1], image.shape[0], QImage.Format_RGB888)
+        pixmap = QPixmap.fromImage(im)
+        pixmap = pixmap.scaled(widget.parent_width, widget.parent_height, Qt.KeepAspectRatio)
+        widget.image_label.setPixmap(pixmap)
+        return 1
+    return 0
+
+
+def timer_update(widget):
+    shown_seq = widget.shown_seq
+    widget.update()
+    return int(widget.shown_seq != shown_seq)
+
+
+def cpu_usage(app, args, mode):
+    """Percentage of one core used by the process while the frames are produced (and shown, unless mode is None),
+    and redraws per second."""
+    controller = FramesController(['frame_{}'.format(i) for i in range(args.frames)], args.input_size, args.rate)
+    window = FramesWindow(controller, args.frames, args.frame_size)
+    window.show()
+    timer = QTimer()
+    redraws = [0]
+    if mode == 'legacy':
+        # The legacy loop ran in a Python thread, the same work is done here from the event loop so QPixmap is only
+        # used in the GUI thread
+        update, interval = legacy_update, LEGACY_REFRESH_MS
+    else:
+        update, interval = timer_update, REFRESH_TICK_MS
+    if mode is not None:
+        def refresh():
+            redraws[0] += sum(update(widget) for widget in window.widgets)
+        timer.timeout.connect(refresh)
+        timer.start(interval)
+    controller.thread.start()
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    while time.perf_counter() - start_wall < args.duration:
+        app.processEvents()
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start_wall
+    usage = (time.process_time() - start_cpu) / elapsed * 100
+    timer.stop()
+    controller.running = False
+    controller.thread.join()
+    window.close()
+    return usage, redraws[0] / elapsed
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark the CPU used by the GUI to show the camera frames, '
+                                                 'redrawing every frame at full resolution on every refresh against '
+                                                 'the refresh timer that only redraws new frames, downscaled.',
+                                     epilog='Enjoy the program! :)')
+
+    parser.add_argument('-i',
+                        '--input-size',
+                        type=int,
+                        nargs=2,
+                        default=[800, 600],
+                        help='Width and height of the camera frames.')
+
+    parser.add_argument('-f',
+                        '--frame-size',
+                        type=int,
+                        nargs=2,
+                        default=[400, 400],
+                        help='Width and height of the GUI frames.')
+
+    parser.add_argument('-n',
+                        '--frames',
+                        type=int,
+                        default=4,
+                        help='Number of GUI frames.')
+
+    parser.add_argument('-r',
+                        '--rate',
+                        type=float,
+                        default=20,
+                        help='New camera images per second of each frame.')
+
+    parser.add_argument('-d',
+                        '--duration',
+                        type=float,
+                        default=10,
+                        help='Seconds measured for each mode.')
+
+    args = parser.parse_args()
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication(sys.argv)
+
+    baseline, _ = cpu_usage(app, args, None)
+    print('{} frames of {}x{} at {:g} images/s shown in {}x{} (redraws capped at {} per second per frame)'.format(
+        args.frames, args.input_size[0], args.input_size[1], args.rate, args.frame_size[0], args.frame_size[1],
+        DEFAULT_REFRESH_RATE))
+    print('{:<24} {:>10} {:>14} {:>12} {:>16}'.format('mode', 'CPU (%)', 'GUI CPU (%)', 'redraws/s',
+                                                      'ms per redraw'))
+    print('{:<24} {:>10.1f}'.format('frames only (no GUI)', baseline))
+    for name, mode in (('before: {} ms loop'.format(LEGACY_REFRESH_MS), 'legacy'), ('after: refresh timer', 'timer')):
+        usage, redraws = cpu_usage(app, args, mode)
+        per_redraw = (usage - baseline) * 10 / redraws if redraws else 0
+        print('{:<24} {:>10.1f} {:>14.1f} {:>12.1f} {:>16.2f}'.format(name, usage, usage - baseline, redraws,
+                                                                      per_redraw))
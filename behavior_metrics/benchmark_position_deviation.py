@@ -0,0 +1,70 @@
+import os
+import time
+import argparse
+import numpy as np
+
+from utils import metrics_gazebo
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark the Gazebo position deviation metric against the perfect '
+                                                 'laps, comparing the sampled spline search with the original '
+                                                 'optimization based one.', epilog='Enjoy the program! :)')
+
+    parser.add_argument('-i',
+                        '--input',
+                        type=str,
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perfect_bags'),
+                        help='Path to the perfect lap ROS Bags directory.')
+
+    parser.add_argument('-n',
+                        '--noise',
+                        type=float,
+                        default=0.1,
+                        help='Standard deviation in meters of the noise added to the simulated experiment.')
+
+    parser.add_argument('-s',
+                        '--seed',
+                        type=int,
+                        default=0,
+                        help='Seed of the simulated experiment noise.')
+
+    parser.add_argument('--skip-optimization',
+                        action='store_true',
+                        help='Only time the sampled spline search.')
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    print('{:<30} {:>8} {:>12} {:>12} {:>10} {:>14}'.format('bag', 'points', 'spline (s)', 'optim. (s)', 'speedup',
+                                                             'MAE delta (%)'))
+    for name in sorted(os.listdir(args.input)):
+        if not name.endswith('.bag'):
+            continue
+        perfect_lap_checkpoints, _ = metrics_gazebo.read_perfect_lap_rosbag(os.path.join(args.input, name))
+
+        # Simulated experiment: the perfect lap started a tenth of the lap later, at half the rate and with noise
+        offset = len(perfect_lap_checkpoints) // 10
+        perfect_x, perfect_y = metrics_gazebo.get_checkpoints_positions(perfect_lap_checkpoints)
+        x = np.roll(perfect_x, -offset)[::2] + rng.normal(0, args.noise, (len(perfect_x) + 1) // 2)
+        y = np.roll(perfect_y, -offset)[::2] + rng.normal(0, args.noise, (len(perfect_y) + 1) // 2)
+
+        start = time.perf_counter()
+        spline_metrics = metrics_gazebo.get_robot_position_deviation_score(perfect_lap_checkpoints, x, y, {})
+        spline_time = time.perf_counter() - start
+
+        if args.skip_optimization:
+            print('{:<30} {:>8} {:>12.3f} {:>12} {:>10} {:>14}'.format(name, len(x), spline_time, '-', '-',
+                                                                       '-'))
+            continue
+
+        start = time.perf_counter()
+        optimization_metrics = metrics_gazebo.get_robot_position_deviation_score(perfect_lap_checkpoints, x, y, {},
+                                                                                 global_optimization=True)
+        optimization_time = time.perf_counter() - start
+
+        delta = 100 * (spline_metrics['position_deviation_mae'] - optimization_metrics['position_deviation_mae']) \
+            / optimization_metrics['position_deviation_mae']
+        print('{:<30} {:>8} {:>12.3f} {:>12.3f} {:>10.1f} {:>14.3f}'.format(name, len(x), spline_time,
+                                                                          optimization_time,
+                                                                          optimization_time / spline_time, delta))
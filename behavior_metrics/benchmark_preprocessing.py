@@ -0,0 +1,109 @@
+import time
+import argparse
+import numpy as np
+import cv2
+
+from albumentations import Compose, Normalize
+from albumentations.pytorch.transforms import ToTensorV2
+from brains.preprocessing import ImagePreprocessor
+
+
+def time_per_frame(function, frames, repetitions):
+    for frame in frames[:10]:
+        function(frame)
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for frame in frames:
+            function(frame)
+    return (time.perf_counter() - start) / (repetitions * len(frames))
+
+
+def legacy_tensorflow(size):
+    def preprocess(frame):
+        # As the brains did on every iteration
+        img_base = cv2.resize(frame, size)
+        augmentations = Compose([
+            Normalize()
+        ])
+        return np.expand_dims(augmentations(image=img_base)['image'], axis=0)
+    return preprocess
+
+
+def legacy_pytorch(size):
+    transformations = Compose([Normalize(), ToTensorV2()])
+
+    def preprocess(frame):
+        img = cv2.resize(frame, size)
+        return transformations(image=img)['image'].unsqueeze(0)
+    return preprocess
+
+
+def preprocessor_tensorflow(size):
+    preprocessor = ImagePreprocessor(size=size)
+
+    def preprocess(frame):
+        return np.expand_dims(preprocessor(frame), axis=0)
+    return preprocess
+
+
+def preprocessor_pytorch(size):
+    import torch
+    preprocessor = ImagePreprocessor(size=size, channels_first=True)
+
+    def preprocess(frame):
+        return torch.from_numpy(preprocessor(frame)).unsqueeze(0)
+    return preprocess
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark the per frame cost of the brains image preprocessing, '
+                                                 'building the Albumentations pipeline on every frame against the '
+                                                 'shared ImagePreprocessor.', epilog='Enjoy the program! :)')
+
+    parser.add_argument('-i',
+                        '--input-size',
+                        type=int,
+                        nargs=2,
+                        default=[640, 480],
+                        help='Width and height of the camera frames.')
+
+    parser.add_argument('-s',
+                        '--size',
+                        type=int,
+                        nargs=2,
+                        action='append',
+                        help='Width and height of the model input (several can be given). By default the CARLA '
+                             'bird-eye brains sizes, 66x200 and 50x150.')
+
+    parser.add_argument('-n',
+                        '--repetitions',
+                        type=int,
+                        default=50,
+                        help='Times every frame is preprocessed.')
+
+    parser.add_argument('--pytorch',
+                        action='store_true',
+                        help='Also benchmark the channels first (PyTorch) preprocessing.')
+
+    args = parser.parse_args()
+    sizes = [tuple(size) for size in args.size] if args.size else [(66, 200), (50, 150)]
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.input_size[1], args.input_size[0], 3), dtype=np.uint8) for _ in range(20)]
+
+    pipelines = [('tensorflow', legacy_tensorflow, preprocessor_tensorflow)]
+    if args.pytorch:
+        pipelines.append(('pytorch', legacy_pytorch, preprocessor_pytorch))
+
+    print('{:<12} {:>10} {:>14} {:>18} {:>10} {:>14}'.format('pipeline', 'size', 'before (us)', 'preprocessor (us)',
+                                                             'speedup', 'max abs diff'))
+    for name, legacy, preprocessor in pipelines:
+        for size in sizes:
+            before = legacy(size)
+            after = preprocessor(size)
+            difference = np.abs(np.asarray(before(frames[0])) - np.asarray(after(frames[0]))).max()
+            before_time = time_per_frame(before, frames, args.repetitions)
+            after_time = time_per_frame(after, frames, args.repetitions)
+            print('{:<12} {:>10} {:>14.1f} {:>18.1f} {:>10.1f} {:>14.2e}'.format(
+                name, '{}x{}'.format(*size), before_time * 1e6, after_time * 1e6, before_time / after_time,
+                difference))
@@ -21,6 +21,7 @@ PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'CARLA/'
 from tensorflow.python.framework.errors_impl import NotFoundError
 from tensorflow.python.framework.errors_impl import UnimplementedError
 import tensorflow as tf
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 
 import os
 # os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
@@ -87,6 +88,8 @@ class Brain:
                 logger.info("File " + model + " cannot be found in " + PRETRAINED_MODELS)
             logger.info("** Load TF model **")
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+            self.keras_inference_mode = get_keras_inference_mode(config)
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
             logger.info("** Loaded TF model **")
         else:
             logger.info("** Brain not loaded **")
@@ -103,19 +106,6 @@ class Brain:
             frame_id {str} -- Id of the frame that will represent the data
             data {*} -- Data to be shown in the frame. Depending on the type of frame (rgbimage, laser, pose3d, etc)
         """
-        if data.shape[0] != data.shape[1]:
-            if data.shape[0] > data.shape[1]:
-                difference = data.shape[0] - data.shape[1]
-                extra_left, extra_right = int(difference/2), int(difference/2)
-                extra_top, extra_bottom = 0, 0
-            else:
-                difference = data.shape[1] - data.shape[0]
-                extra_left, extra_right = 0, 0
-                extra_top, extra_bottom = int(difference/2), int(difference/2)
-                
-
-            data = np.pad(data, ((extra_top, extra_bottom), (extra_left, extra_right), (0, 0)), mode='constant', constant_values=0)
-            
         self.handler.update_frame(frame_id, data)
 
     def update_pose(self, pose_data):
@@ -175,7 +165,7 @@ class Brain:
         img = np.expand_dims(img, axis=0)
         start_time = time.time()
         try:
-            prediction = self.net.predict(img)
+            prediction = self.inference(img)
             self.inference_times.append(time.time() - start_time)
             throttle_brake_val = np.interp(prediction[0][0], (0, 1), (-1, 1))
             steer = np.interp(prediction[0][1], (0, 1), (-1, 1))
@@ -2,10 +2,7 @@ from PIL import Image
 from brains.CARLA.pytorch.utils.pilotnet import PilotNet
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
 from os import path
-from albumentations import (
-    Compose, Normalize
-)
-from albumentations.pytorch.transforms  import ToTensorV2
+from brains.preprocessing import ImagePreprocessor
 
 import numpy as np
 
@@ -46,10 +43,7 @@ class Brain:
         self.gpu_inference = config['GPU']
         self.device = torch.device('cuda' if (torch.cuda.is_available() and self.gpu_inference) else 'cpu')
         self.first_image = None
-        self.transformations = Compose([
-                                        Normalize(),
-                                        ToTensorV2()
-                                    ])
+        self.preprocessor = ImagePreprocessor(size=(66, 200), channels_first=True)
         
         self.suddenness_distance = []
         self.previous_v = None
@@ -92,19 +86,6 @@ class Brain:
             frame_id {str} -- Id of the frame that will represent the data
             data {*} -- Data to be shown in the frame. Depending on the type of frame (rgbimage, laser, pose3d, etc)
         """
-        if data.shape[0] != data.shape[1]:
-            if data.shape[0] > data.shape[1]:
-                difference = data.shape[0] - data.shape[1]
-                extra_left, extra_right = int(difference/2), int(difference/2)
-                extra_top, extra_bottom = 0, 0
-            else:
-                difference = data.shape[1] - data.shape[0]
-                extra_left, extra_right = 0, 0
-                extra_top, extra_bottom = int(difference/2), int(difference/2)
-                
-
-            data = np.pad(data, ((extra_top, extra_bottom), (extra_left, extra_right), (0, 0)), mode='constant', constant_values=0)
-
         self.handler.update_frame(frame_id, data)
         
     def execute(self):
@@ -127,11 +108,7 @@ class Brain:
         self.update_frame('frame_0', bird_eye_view_1)
 
         try:
-            img = cv2.resize(bird_eye_view_1, (int(66), int(200)))
-            image = self.transformations(image=img)
-            image = image['image']
-            image = image.unsqueeze(0) 
-            image = FLOAT(image).to(self.device)
+            image = torch.from_numpy(self.preprocessor(bird_eye_view_1)).unsqueeze(0).to(self.device)
             
             start_time = time.time()
             with torch.no_grad():
@@ -9,10 +9,11 @@ import time
 import carla
 from os import path
 from albumentations import (
-    Compose, Normalize, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare, GridDropout, ChannelDropout
+    Compose, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare, GridDropout, ChannelDropout
 )
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
 from utils.logger import logger
+from brains.preprocessing import ImagePreprocessor
 from traceback import print_exc
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'CARLA/'
@@ -20,6 +21,7 @@ PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'CARLA/'
 from tensorflow.python.framework.errors_impl import NotFoundError
 from tensorflow.python.framework.errors_impl import UnimplementedError
 import tensorflow as tf
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 
 
 #import os
@@ -47,6 +49,7 @@ class Brain:
         self.handler = handler
         self.config = config
         self.inference_times = []
+        self.preprocessor = ImagePreprocessor(size=(66, 200))
         self.gpu_inference = True if tf.test.gpu_device_name() else False
 
         self.threshold_image = np.zeros((640, 360, 3), np.uint8)
@@ -64,13 +67,15 @@ class Brain:
                 logger.info("File " + model + " cannot be found in " + PRETRAINED_MODELS)
             logger.info("** Load TF model **")
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model, compile=False)
+            self.keras_inference_mode = get_keras_inference_mode(config)
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
             logger.info("** Loaded TF model **")
         else:
             logger.info("** Brain not loaded **")
             logger.info("- Models path: " + PRETRAINED_MODELS)
             logger.info("- Model: " + str(model))
 
-        self.previous_bird_eye_view_image = 0
+        self.previous_bird_eye_view_seq = 0
         self.bird_eye_view_images = 0
         self.bird_eye_view_unique_images = 0
 
@@ -82,19 +87,6 @@ class Brain:
             frame_id {str} -- Id of the frame that will represent the data
             data {*} -- Data to be shown in the frame. Depending on the type of frame (rgbimage, laser, pose3d, etc)
         """
-        if data.shape[0] != data.shape[1]:
-            if data.shape[0] > data.shape[1]:
-                difference = data.shape[0] - data.shape[1]
-                extra_left, extra_right = int(difference/2), int(difference/2)
-                extra_top, extra_bottom = 0, 0
-            else:
-                difference = data.shape[1] - data.shape[0]
-                extra_left, extra_right = 0, 0
-                extra_top, extra_bottom = int(difference/2), int(difference/2)
-                
-
-            data = np.pad(data, ((extra_top, extra_bottom), (extra_left, extra_right), (0, 0)), mode='constant', constant_values=0)
-
         self.handler.update_frame(frame_id, data)
 
     def update_pose(self, pose_data):
@@ -139,24 +131,17 @@ class Brain:
         
         self.update_pose(self.pose.getPose3d())
 
-        image_shape=(66, 200)
-        img_base = cv2.resize(bird_eye_view_1, image_shape)
-
-        AUGMENTATIONS_TEST = Compose([
-            Normalize()
-        ])
-        image = AUGMENTATIONS_TEST(image=img_base)
-        img = image["image"]
+        img = self.preprocessor(bird_eye_view_1)
 
         self.bird_eye_view_images += 1
-        if (self.previous_bird_eye_view_image==img).all() == False:
+        if self.bird_eye_view.sequence.seq != self.previous_bird_eye_view_seq:
             self.bird_eye_view_unique_images += 1
-        self.previous_bird_eye_view_image = img
+        self.previous_bird_eye_view_seq = self.bird_eye_view.sequence.seq
 
         img = np.expand_dims(img, axis=0)
         start_time = time.time()
         try:
-            prediction = self.net.predict(img, verbose=0)
+            prediction = self.inference(img)
             self.inference_times.append(time.time() - start_time)
             throttle = prediction[0][0]
             steer = prediction[0][1] * (1 - (-1)) + (-1)
@@ -9,18 +9,18 @@ import time
 import carla
 from os import path
 from albumentations import (
-    Compose, Normalize, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare
+    Compose, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare
 )
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
 from utils.logger import logger
+from brains.preprocessing import ImagePreprocessor
+from behaviorlib.inference_engine import get_inference_engine
 from traceback import print_exc
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'CARLA/'
 
 from tensorflow.python.framework.errors_impl import NotFoundError
 from tensorflow.python.framework.errors_impl import UnimplementedError
-from tensorflow.python.saved_model import signature_constants
-from tensorflow.python.saved_model import tag_constants
 import tensorflow as tf
 
 #import os
@@ -48,6 +48,7 @@ class Brain:
         self.handler = handler
         self.config = config
         self.inference_times = []
+        self.preprocessor = ImagePreprocessor(size=(66, 200))
         self.gpu_inference = True if tf.test.gpu_device_name() else False
 
         self.threshold_image = np.zeros((640, 360, 3), np.uint8)
@@ -66,10 +67,7 @@ class Brain:
             logger.info("** Load TF model **")
 
             logger.info("Using TensorRT models.....")
-            self.net = tf.saved_model.load(PRETRAINED_MODELS + model, tags=[tag_constants.SERVING])
-            self.infer = self.net.signatures[signature_constants.DEFAULT_SERVING_SIGNATURE_DEF_KEY]
-            self.output_tensorname = list(self.infer.structured_outputs.keys())[0]
-            self.inf_func = self.tftrt_inference
+            self.inference_engine = get_inference_engine(PRETRAINED_MODELS + model, backend='tftrt')
 
             logger.info("** Loaded TF model **")
         else:
@@ -77,24 +75,10 @@ class Brain:
             logger.info("- Models path: " + PRETRAINED_MODELS)
             logger.info("- Model: " + str(model))
 
-        self.previous_bird_eye_view_image = 0
+        self.previous_bird_eye_view_seq = 0
         self.bird_eye_view_images = 0
         self.bird_eye_view_unique_images = 0
 
-    def tftrt_inference(self, img):
-        """ Utilize the TensorRT optimized model for inference
-        Arguments:
-            img {ndarray} -- Image to make prediction on
-        Return:
-            output -- prediction from the model
-        """
-        # Pre-processing
-        img = tf.convert_to_tensor(img, dtype=tf.float32)
-        # Run inference
-        output = self.infer(img)[self.output_tensorname]
-
-        return output.numpy()
-
     def update_frame(self, frame_id, data):
         """Update the information to be shown in one of the GUI's frames.
 
@@ -102,19 +86,6 @@ class Brain:
             frame_id {str} -- Id of the frame that will represent the data
             data {*} -- Data to be shown in the frame. Depending on the type of frame (rgbimage, laser, pose3d, etc)
         """
-        if data.shape[0] != data.shape[1]:
-            if data.shape[0] > data.shape[1]:
-                difference = data.shape[0] - data.shape[1]
-                extra_left, extra_right = int(difference/2), int(difference/2)
-                extra_top, extra_bottom = 0, 0
-            else:
-                difference = data.shape[1] - data.shape[0]
-                extra_left, extra_right = 0, 0
-                extra_top, extra_bottom = int(difference/2), int(difference/2)
-                
-
-            data = np.pad(data, ((extra_top, extra_bottom), (extra_left, extra_right), (0, 0)), mode='constant', constant_values=0)
-
         self.handler.update_frame(frame_id, data)
 
     def update_pose(self, pose_data):
@@ -152,25 +123,17 @@ class Brain:
         
         self.update_pose(self.pose.getPose3d())
 
-        image_shape=(66, 200)
-        img_base = cv2.resize(bird_eye_view_1, image_shape)
-
-        AUGMENTATIONS_TEST = Compose([
-            Normalize()
-        ])
-        image = AUGMENTATIONS_TEST(image=img_base)
-        img = image["image"]
+        img = self.preprocessor(bird_eye_view_1)
 
         self.bird_eye_view_images += 1
-        if (self.previous_bird_eye_view_image==img).all() == False:
+        if self.bird_eye_view.sequence.seq != self.previous_bird_eye_view_seq:
             self.bird_eye_view_unique_images += 1
-        self.previous_bird_eye_view_image = img
+        self.previous_bird_eye_view_seq = self.bird_eye_view.sequence.seq
 
         img = np.expand_dims(img, axis=0)
-        start_time = time.time()
         try:
-            prediction = self.inf_func(img)
-            self.inference_times.append(time.time() - start_time)
+            prediction = self.inference_engine(img)
+            self.inference_times.append(self.inference_engine.last_latency)
             throttle = prediction[0][0]
             steer = prediction[0][1] * (1 - (-1)) + (-1)
             break_command = prediction[0][2]
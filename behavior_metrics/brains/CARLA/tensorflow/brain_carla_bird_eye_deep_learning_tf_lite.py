@@ -9,10 +9,12 @@ import time
 import carla
 from os import path
 from albumentations import (
-    Compose, Normalize, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare
+    Compose, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare
 )
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
 from utils.logger import logger
+from brains.preprocessing import ImagePreprocessor
+from behaviorlib.inference_engine import get_inference_engine
 from traceback import print_exc
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'CARLA/'
@@ -46,6 +48,7 @@ class Brain:
         self.handler = handler
         self.config = config
         self.inference_times = []
+        self.preprocessor = ImagePreprocessor(size=(66, 200))
         self.gpu_inference = True if tf.test.gpu_device_name() else False
 
         self.threshold_image = np.zeros((640, 360, 3), np.uint8)
@@ -64,11 +67,7 @@ class Brain:
             logger.info("** Load TF model **")
 
             logger.info("Using TF lite models.....")
-            self.net = tf.lite.Interpreter(model_path= PRETRAINED_MODELS + model)
-            self.net.allocate_tensors()
-            self.input_index = self.net.get_input_details()[0]
-            self.output_index = self.net.get_output_details()[0]["index"]
-            self.inf_func = self.optim_inference
+            self.inference_engine = get_inference_engine(PRETRAINED_MODELS + model, backend='tflite')
 
             logger.info("** Loaded TF model **")
         else:
@@ -76,37 +75,10 @@ class Brain:
             logger.info("- Models path: " + PRETRAINED_MODELS)
             logger.info("- Model: " + str(model))
 
-        self.previous_bird_eye_view_image = 0
+        self.previous_bird_eye_view_seq = 0
         self.bird_eye_view_images = 0
         self.bird_eye_view_unique_images = 0
 
-    def optim_inference(self, img):
-        """ Utilize the optimized models in `.tflite` format for inference
-
-        Arguments:
-            img {ndarray} -- Image to make prediction on
-        Return:
-            output -- prediction from the model
-        """
-        # Pre-processing
-        if self.net.get_input_details()[0]['dtype'] == np.uint8:
-            input_scale, input_zero_point = self.net.get_input_details()[0]["quantization"]
-            img = img / input_scale + input_zero_point
-            img = img.astype(self.net.get_input_details()[0]["dtype"])
-
-        self.net.set_tensor(self.input_index["index"], img.astype(self.input_index["dtype"]))
-        # Run inference.
-        self.net.invoke()
-        # Post-processing
-        output = self.net.get_tensor(self.output_index)
-
-        if self.net.get_input_details()[0]['dtype'] == np.uint8:
-            output_scale, input_zero_point = self.net.get_output_details()[0]["quantization"]
-            output = output.astype(np.float32)
-            output = (output - input_zero_point) * output_scale
-
-        return output
-
     def update_frame(self, frame_id, data):
         """Update the information to be shown in one of the GUI's frames.
 
@@ -114,19 +86,6 @@ class Brain:
             frame_id {str} -- Id of the frame that will represent the data
             data {*} -- Data to be shown in the frame. Depending on the type of frame (rgbimage, laser, pose3d, etc)
         """
-        if data.shape[0] != data.shape[1]:
-            if data.shape[0] > data.shape[1]:
-                difference = data.shape[0] - data.shape[1]
-                extra_left, extra_right = int(difference/2), int(difference/2)
-                extra_top, extra_bottom = 0, 0
-            else:
-                difference = data.shape[1] - data.shape[0]
-                extra_left, extra_right = 0, 0
-                extra_top, extra_bottom = int(difference/2), int(difference/2)
-                
-
-            data = np.pad(data, ((extra_top, extra_bottom), (extra_left, extra_right), (0, 0)), mode='constant', constant_values=0)
-
         self.handler.update_frame(frame_id, data)
 
     def update_pose(self, pose_data):
@@ -164,25 +123,17 @@ class Brain:
         
         self.update_pose(self.pose.getPose3d())
 
-        image_shape=(66, 200)
-        img_base = cv2.resize(bird_eye_view_1, image_shape)
-
-        AUGMENTATIONS_TEST = Compose([
-            Normalize()
-        ])
-        image = AUGMENTATIONS_TEST(image=img_base)
-        img = image["image"]
+        img = self.preprocessor(bird_eye_view_1)
 
         self.bird_eye_view_images += 1
-        if (self.previous_bird_eye_view_image==img).all() == False:
+        if self.bird_eye_view.sequence.seq != self.previous_bird_eye_view_seq:
             self.bird_eye_view_unique_images += 1
-        self.previous_bird_eye_view_image = img
+        self.previous_bird_eye_view_seq = self.bird_eye_view.sequence.seq
 
         img = np.expand_dims(img, axis=0)
-        start_time = time.time()
         try:
-            prediction = self.inf_func(img)
-            self.inference_times.append(time.time() - start_time)
+            prediction = self.inference_engine(img)
+            self.inference_times.append(self.inference_engine.last_latency)
             throttle = prediction[0][0]
             steer = prediction[0][1] * (1 - (-1)) + (-1)
             break_command = prediction[0][2]
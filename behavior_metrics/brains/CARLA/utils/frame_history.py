@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class FrameHistory:
+    """Last frames seen by a brain, for the models that take several past frames as input.
+
+    The frames are kept in a preallocated ring buffer, so storing a frame is a single copy, and the frames fed to
+    the model are gathered into a model input array that is also allocated once.
+
+    Arguments:
+        length {int} -- Number of frames kept
+        offsets {tuple} -- Age of each frame of the model input, from the oldest to the newest, 0 being the last
+        frame (e.g. `(9, 5, 0)` for t-9, t-5 and t)
+        extra_channels {int} -- Constant channels appended to every frame (e.g. the vehicle speed)
+        dtype {np.dtype} -- Type of the stored frames
+    """
+
+    def __init__(self, length, offsets, extra_channels=0, dtype=np.float32):
+        if not offsets or max(offsets) >= length or min(offsets) < 0:
+            raise ValueError('Frame offsets {} out of a history of {} frames'.format(offsets, length))
+        self.length = length
+        self.offsets = tuple(offsets)
+        self.extra_channels = extra_channels
+        self.dtype = dtype
+        self.frames = None
+        self.model_input = None
+        self.count = 0
+        self._head = -1
+        self._offsets = np.array(self.offsets, dtype=np.intp)
+        self._indices = np.empty(len(self.offsets), dtype=np.intp)
+
+    def _allocate(self, frame):
+        shape = frame.shape[:-1] + (frame.shape[-1] + self.extra_channels,)
+        self.frames = np.zeros((self.length,) + shape, dtype=self.dtype)
+        self.model_input = np.zeros((1, len(self.offsets)) + shape, dtype=self.dtype)
+
+    @property
+    def full(self):
+        return self.count >= self.length
+
+    def push(self, frame, *channels):
+        """Store a new frame, overwriting the oldest one once the history is full.
+
+        Arguments:
+            frame {np.ndarray} -- HxWxC frame
+            channels {float} -- Value of each extra channel of the frame
+        """
+        if self.frames is None:
+            self._allocate(frame)
+        self._head = (self._head + 1) % self.length
+        slot = self.frames[self._head]
+        frame_channels = frame.shape[-1]
+        slot[..., :frame_channels] = frame
+        for channel, value in enumerate(channels):
+            slot[..., frame_channels + channel] = value
+        self.count += 1
+
+    def get(self, offset=0):
+        """Frame stored `offset` frames ago (a view, valid until it is overwritten)."""
+        if offset >= min(self.count, self.length):
+            raise IndexError('No frame {} frames ago in a history of {} frames'.format(offset, self.count))
+        return self.frames[(self._head - offset) % self.length]
+
+    def gather(self):
+        """Model input with the frames at the history offsets, shaped (1, len(offsets), H, W, C).
+
+        The same array is returned and overwritten in every call.
+        """
+        np.subtract(self._head, self._offsets, out=self._indices)
+        np.mod(self._indices, self.length, out=self._indices)
+        # The indices are in range, 'clip' lets take write straight into the output instead of through a buffer
+        np.take(self.frames, self._indices, axis=0, out=self.model_input[0], mode='clip')
+        return self.model_input
+
+    def clear(self):
+        self.count = 0
+        self._head = -1
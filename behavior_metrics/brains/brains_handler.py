@@ -5,9 +5,7 @@ import os
 import traceback
 
 from abc import abstractmethod
-from albumentations import (
-    Compose, Normalize, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare, Affine
-)
+from brains.preprocessing import get_augmentation
 
 
 """ TODO: fix neural brains """
@@ -42,6 +40,7 @@ class Brains(object):
         else:
             import_name = 'brains.' + robot_type + '.' + module_name
 
+        self.unload_brain()
         if robot_type == 'CARLA':
             module = importlib.import_module(import_name)
             Brain = getattr(module, 'Brain')
@@ -64,6 +63,12 @@ class Brains(object):
                 else:
                     self.active_brain = Brain(self.sensors, self.actuators, handler=self, config=self.config)
 
+    def unload_brain(self):
+        """Stop the background workers of the active brain, before it is replaced or the pilot is killed."""
+        gradcam = getattr(getattr(self, 'active_brain', None), 'gradcam', None)
+        if gradcam is not None:
+            gradcam.stop()
+
     def get_image(self, camera_name):
         camera = self.sensors.get_camera(camera_name)
         return camera.getImage()
@@ -89,29 +94,7 @@ class Brains(object):
         #     pass
 
     def transform_image(self, image, option):
-        augmentation_option = Compose([])
-        if option == 'rain':
-            augmentation_option = Compose([
-                RandomRain(slant_lower=-10, slant_upper=10,
-                           drop_length=20, drop_width=1, drop_color=(200, 200, 200),
-                           blur_value=7, brightness_coefficient=0.7,
-                           rain_type='torrential', always_apply=True)
-            ])
-        elif option == 'night':
-            augmentation_option = Compose([RandomBrightness([-0.5, -0.5], always_apply=True)])
-        elif option == 'shadow':
-            augmentation_option = Compose([RandomShadow(always_apply=True)])
-        elif option == 'snow':
-            augmentation_option = Compose([RandomSnow(always_apply=True)])
-        elif option == 'fog':
-            augmentation_option = Compose([RandomFog(always_apply=True)])
-        elif option == 'sunflare':
-            augmentation_option = Compose([RandomSunFlare(always_apply=True)])
-        elif option == 'daytime':
-            augmentation_option = Compose([RandomBrightness([0.3, 0.3], always_apply=True)])
-        elif option == 'affine':
-            augmentation_option = Compose([Affine(translate_percent={'x': -0.1, 'y': 0}, always_apply=True)])
-        transformed_image = augmentation_option(image=image)
+        transformed_image = get_augmentation(option)(image=image)
         transformed_image = transformed_image["image"]
         return transformed_image
 
@@ -16,6 +16,7 @@ import time
 import os
 
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from os import path
 from albumentations import (
     Compose, HorizontalFlip, RandomBrightnessContrast, 
@@ -60,6 +61,8 @@ class Brain:
                 print("File " + model + " cannot be found in " + PRETRAINED_MODELS)
 
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+            self.keras_inference_mode = get_keras_inference_mode()
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
             self.net.summary()
             lkasbdflasbflkdasbflkjsaf
             exit()
@@ -136,7 +139,7 @@ class Brain:
             print(6)
 
             start_time = time.time()
-            prediction = self.net.predict(img_points)
+            prediction = self.inference(img_points)
             # prediction = self.net.predict(self.previous_images)
             print(prediction)
             self.inference_times.append(time.time() - start_time)
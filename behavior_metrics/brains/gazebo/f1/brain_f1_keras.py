@@ -16,11 +16,10 @@ import time
 import os
 
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from os import path
-from albumentations import (
-    Compose, Normalize
-)
-from utils.gradcam.gradcam import GradCAM
+from brains.preprocessing import ImagePreprocessor
+from utils.gradcam.gradcam import AsyncGradCAM
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'gazebo/tf_models/'
 
@@ -45,6 +44,8 @@ class Brain:
         self.cont = 0
         self.inference_times = []
         self.config = config
+        self.preprocessor = ImagePreprocessor.from_config(config)
+        self.gradcam = None
 
         if self.config['GPU'] is False:
             os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
@@ -63,6 +64,9 @@ class Brain:
                 self.output_index = self.net.get_output_details()[0]["index"]
             else:
                 self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+                self.keras_inference_mode = get_keras_inference_mode(config)
+                self.inference = get_keras_inference(self.net, self.keras_inference_mode)
+                self.gradcam = AsyncGradCAM.from_config(self.net, self.update_gradcam_frame, config)
                 print(self.net.summary())
         else:
             print("** Brain not loaded **")
@@ -78,6 +82,10 @@ class Brain:
         """
         self.handler.update_frame(frame_id, data)
 
+    def update_gradcam_frame(self, output):
+        """Show the GradCAM overlay of a frame, called by the GradCAM worker when it is ready."""
+        self.update_frame('frame_1', output)
+
     def optim_inference(self, img):
         """ Utilize the optimized models in `.tflite` format for inference
 
@@ -110,19 +118,8 @@ class Brain:
         self.update_frame('frame_0', image)
 
         try:
-            if self.config['ImageCropped']:
-                image = image[240:480, 0:640]
-            if 'ImageSize' in self.config:
-                img = cv2.resize(image, (self.config['ImageSize'][0], self.config['ImageSize'][1]))
-            else:
-                img = image
-            orig = img
-            if self.config['ImageNormalized']:
-                AUGMENTATIONS_TEST = Compose([
-                    Normalize()
-                ])
-                image = AUGMENTATIONS_TEST(image=img)
-                img = image["image"]
+            img = self.preprocessor(image)
+            orig = self.preprocessor.resized
 
             img = np.expand_dims(img, axis=0)
 
@@ -132,7 +129,7 @@ class Brain:
                 self.inference_times.append(time.time() - start_time)
             else:
                 start_time = time.time()
-                prediction = self.net.predict(img)
+                prediction = self.inference(img)
                 self.inference_times.append(time.time() - start_time)
 
             if self.config['PredictionsNormalized']:
@@ -151,13 +148,9 @@ class Brain:
                 self.motors.sendV(prediction_v)
                 self.motors.sendW(prediction_w)
 
-            # GradCAM from image
-            i = np.argmax(prediction[0])
-            cam = GradCAM(self.net, i)
-            heatmap = cam.compute_heatmap(img)
-            heatmap = cv2.resize(heatmap, (heatmap.shape[1], heatmap.shape[0]))
-            (heatmap, output) = cam.overlay_heatmap(heatmap, orig, alpha=0.5)
-            self.update_frame('frame_1', output)
+            # GradCAM from image, shown in frame_1 when the background worker has it ready
+            if self.gradcam is not None:
+                self.gradcam.submit(img, orig)
 
         except Exception as err:
             print(err)
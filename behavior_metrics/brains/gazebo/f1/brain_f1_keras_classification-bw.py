@@ -16,6 +16,7 @@ import time
 import os
 
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from os import path
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'dir1/'
@@ -46,6 +47,8 @@ class Brain:
                 print("File " + model + " cannot be found in " + PRETRAINED_MODELS)
 
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+            self.keras_inference_mode = get_keras_inference_mode(config)
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
         else: 
             print("Brain not loaded")
 
@@ -209,7 +212,7 @@ class Brain:
             img = np.expand_dims(img, axis=0)
             img = img.reshape(-1, 32, 32, 1)
             start_time = time.time()
-            prediction = self.net.predict_classes(img)
+            prediction = np.argmax(self.inference(img), axis=-1)
             self.calculate_v_w(prediction[0])
             self.inference_times.append(time.time() - start_time)
         except Exception as err:
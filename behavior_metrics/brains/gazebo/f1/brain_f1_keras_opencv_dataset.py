@@ -15,12 +15,11 @@ import numpy as np
 import os
 import tensorflow as tf
 import time
-from albumentations import (
-    Compose, Normalize
-)
+from brains.preprocessing import ImagePreprocessor
 from os import path
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
-from utils.gradcam.gradcam import GradCAM
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
+from utils.gradcam.gradcam import AsyncGradCAM
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'gazebo/tf_models/'
 
@@ -45,6 +44,8 @@ class Brain:
         self.cont = 0
         self.inference_times = []
         self.config = config
+        self.preprocessor = ImagePreprocessor.from_config(config)
+        self.gradcam = None
 
         self.suddenness_distance = []
         self.previous_v = None
@@ -79,6 +80,9 @@ class Brain:
                     
             else:
                 self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+                self.keras_inference_mode = get_keras_inference_mode(config)
+                self.inference = get_keras_inference(self.net, self.keras_inference_mode)
+                self.gradcam = AsyncGradCAM.from_config(self.net, self.update_gradcam_frame, config)
                 print(self.net.summary())
                 
         else:
@@ -121,6 +125,10 @@ class Brain:
 
         self.handler.update_frame(frame_id, data)
 
+    def update_gradcam_frame(self, output):
+        """Show the GradCAM overlay of a frame, called by the GradCAM worker when it is ready."""
+        self.update_frame('frame_1', output)
+
     def optim_inference(self, img):
         """ Utilize the optimized models in `.tflite` format for inference
 
@@ -169,19 +177,8 @@ class Brain:
         self.update_frame('frame_0', image)
 
         try:
-            if self.config['ImageCropped']:
-                image = image[240:480, 0:640]
-            if 'ImageSize' in self.config:
-                img = cv2.resize(image, (self.config['ImageSize'][0], self.config['ImageSize'][1]))
-            else:
-                img = image
-            orig = img
-            if self.config['ImageNormalized']:
-                AUGMENTATIONS_TEST = Compose([
-                    Normalize()
-                ])
-                image = AUGMENTATIONS_TEST(image=img)
-                img = image["image"]
+            img = self.preprocessor(image)
+            orig = self.preprocessor.resized
 
             img = np.expand_dims(img, axis=0)
             
@@ -191,7 +188,7 @@ class Brain:
                 self.inference_times.append(time.time() - start_time)
             else:
                 start_time = time.time()
-                prediction = self.net.predict(img)
+                prediction = self.inference(img)
                 self.inference_times.append(time.time() - start_time)
 
             if self.config['PredictionsNormalized']:
@@ -222,13 +219,9 @@ class Brain:
 
 
             if not self.config['UseOptimized']: # not available for optimized models
-                # GradCAM from image
-                i = np.argmax(prediction[0])
-                cam = GradCAM(self.net, i)
-                heatmap = cam.compute_heatmap(img)
-                heatmap = cv2.resize(heatmap, (heatmap.shape[1], heatmap.shape[0]))
-                (heatmap, output) = cam.overlay_heatmap(heatmap, orig, alpha=0.5)
-                self.update_frame('frame_1', output)
+                # GradCAM from image, shown in frame_1 when the background worker has it ready
+                if self.gradcam is not None:
+                    self.gradcam.submit(img, orig)
 
         except Exception as err:
             print(err)
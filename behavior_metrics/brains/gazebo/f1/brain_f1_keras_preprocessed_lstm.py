@@ -16,6 +16,7 @@ import time
 import os
 
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from os import path
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'dir1/'
@@ -47,6 +48,8 @@ class Brain:
                 print("File " + model + " cannot be found in " + PRETRAINED_MODELS)
 
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+            self.keras_inference_mode = get_keras_inference_mode(config)
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
         else: 
             print("Brain not loaded")
 
@@ -116,7 +119,7 @@ class Brain:
 
             img_points = np.expand_dims(self.previous_images, axis=0)
             start_time = time.time()
-            prediction = self.net.predict(img_points)
+            prediction = self.inference(img_points)
             self.inference_times.append(time.time() - start_time)
             prediction_v = prediction[0][0]*13
             prediction_w = prediction[0][1]*3
@@ -16,6 +16,7 @@ import time
 import os
 
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from os import path
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'behavior-studio-volume/'
@@ -70,6 +71,8 @@ class Brain:
                 print("File " + model + " cannot be found in " + PRETRAINED_MODELS)
 
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+            self.keras_inference_mode = get_keras_inference_mode()
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
         else:
             print("Brain not loaded")
         
@@ -157,7 +160,7 @@ class Brain:
 
                 
             start_time = time.time()
-            prediction = self.net.predict(img_points)
+            prediction = self.inference(img_points)
             #prediction_v = self.net_v.predict(img_points)
             #prediction_w = self.net_w.predict(img_points)
             # print('prediciton time ' + str(time.time() - start_time))
@@ -16,6 +16,7 @@ import time
 import os
 
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from os import path
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'dir1/'
@@ -47,7 +48,10 @@ class Brain:
                 print("File " + model[1] + " cannot be found in " + PRETRAINED_MODELS)
 
             self.net_v = tf.keras.models.load_model(PRETRAINED_MODELS + model[0])
+            self.keras_inference_mode = get_keras_inference_mode(config)
+            self.inference_v = get_keras_inference(self.net_v, self.keras_inference_mode)
             self.net_w = tf.keras.models.load_model(PRETRAINED_MODELS + model[1])
+            self.inference_w = get_keras_inference(self.net_w, self.keras_inference_mode)
         else: 
             print("Brain not loaded")
 
@@ -106,8 +110,8 @@ class Brain:
             
             img_points = np.expand_dims(img_points, axis=0)
             start_time = time.time()
-            prediction_v = self.net_v.predict(img_points)
-            prediction_w = self.net_w.predict(img_points)
+            prediction_v = self.inference_v(img_points)
+            prediction_w = self.inference_w(img_points)
             print(str(prediction_v) + " - " + str(prediction_w))
             self.inference_times.append(time.time() - start_time)
             prediction_v = prediction_v*13
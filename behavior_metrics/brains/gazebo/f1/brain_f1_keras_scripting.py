@@ -18,10 +18,9 @@ import time
 import os
 
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from os import path
-from albumentations import (
-    Compose, Normalize
-)
+from brains.preprocessing import ImagePreprocessor
 from utils.gradcam.gradcam import GradCAM
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'behavior-studio-volume/'
@@ -47,6 +46,7 @@ class Brain:
         self.cont = 0
         self.inference_times = []
         self.config = config
+        self.preprocessor = ImagePreprocessor.from_config(config)
 
         if self.config['GPU'] is False:
             os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
@@ -58,6 +58,8 @@ class Brain:
                 print("File " + model + " cannot be found in " + PRETRAINED_MODELS)
 
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+            self.keras_inference_mode = get_keras_inference_mode(config)
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
         else:
             print("** Brain not loaded **")
             print("- Models path: " + PRETRAINED_MODELS)
@@ -100,24 +102,12 @@ class Brain:
         if self.cont == 1:
             self.first_image = image
         try:
-            if self.config['ImageCropped']:
-                image = image[240:480, 0:640]
-            if 'ImageSize' in self.config:
-                img = cv2.resize(image, (self.config['ImageSize'][0], self.config['ImageSize'][1]))
-            else:
-                img = image
-
-            orig = img
-            if self.config['ImageNormalized']:
-                AUGMENTATIONS_TEST = Compose([
-                    Normalize()
-                ])
-                image = AUGMENTATIONS_TEST(image=img)
-                img = image["image"]
+            img = self.preprocessor(image)
+            orig = self.preprocessor.resized
 
             img = np.expand_dims(img, axis=0)
             start_time = time.perf_counter()
-            prediction = self.net.predict(img)
+            prediction = self.inference(img)
             self.inference_times.append(time.perf_counter() - start_time)
 
             if self.config['PredictionsNormalized']:
@@ -20,6 +20,7 @@ from albumentations import (
 )
 from os import path
 from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+from behaviorlib.inference_engine import get_keras_inference, get_keras_inference_mode
 from utils.gradcam.gradcam import GradCAM
 
 PRETRAINED_MODELS = ROOT_PATH + '/' + PRETRAINED_MODELS_DIR + 'gazebo/tf_models/'
@@ -66,6 +67,8 @@ class Brain:
                 print("File " + model + " cannot be found in " + PRETRAINED_MODELS)
 
             self.net = tf.keras.models.load_model(PRETRAINED_MODELS + model)
+            self.keras_inference_mode = get_keras_inference_mode(config)
+            self.inference = get_keras_inference(self.net, self.keras_inference_mode)
             print(self.net.summary())
         else:
             print("** Brain not loaded **")
@@ -191,7 +194,7 @@ class Brain:
                 self.nineth_image_stack = self.tenth_image_stack
 
                 start_time = time.time()
-                prediction = self.net.predict(img)
+                prediction = self.inference(img)
                 self.inference_times.append(time.time() - start_time)
                 if self.config['PredictionsNormalized']:
                     prediction_v = prediction[0][0] * (24 - (6.5)) + (6.5)
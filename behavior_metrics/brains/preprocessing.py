@@ -0,0 +1,153 @@
+"""Image preprocessing shared by the neural brains.
+
+The crop, resize, colour conversion and normalization applied to the camera images before inference are set up
+once per brain and write into preallocated buffers, instead of building the Albumentations pipeline on every
+iteration. The normalization gives the same float32 values as Albumentations `Normalize`.
+"""
+
+import cv2
+import numpy as np
+
+from albumentations import (
+    Compose, RandomRain, RandomBrightness, RandomShadow, RandomSnow, RandomFog, RandomSunFlare, Affine
+)
+
+# Albumentations `Normalize` defaults (ImageNet statistics)
+NORMALIZE_MEAN = (0.485, 0.456, 0.406)
+NORMALIZE_STD = (0.229, 0.224, 0.225)
+NORMALIZE_MAX_PIXEL_VALUE = 255.0
+# Rows and columns of the Gazebo camera images kept by the `ImageCropped` brain option
+GAZEBO_IMAGE_CROP = (240, 480, 0, 640)
+
+_augmentations = {}
+
+
+def get_augmentation(option):
+    """Albumentations pipeline of an image transformation option (`rain`, `night`, ...), built once per option.
+
+    Unknown options (and `None`) give an empty pipeline.
+    """
+    if option not in _augmentations:
+        if option == 'rain':
+            transforms = [RandomRain(slant_lower=-10, slant_upper=10,
+                                     drop_length=20, drop_width=1, drop_color=(200, 200, 200),
+                                     blur_value=7, brightness_coefficient=0.7,
+                                     rain_type='torrential', always_apply=True)]
+        elif option == 'night':
+            transforms = [RandomBrightness([-0.5, -0.5], always_apply=True)]
+        elif option == 'shadow':
+            transforms = [RandomShadow(always_apply=True)]
+        elif option == 'snow':
+            transforms = [RandomSnow(always_apply=True)]
+        elif option == 'fog':
+            transforms = [RandomFog(always_apply=True)]
+        elif option == 'sunflare':
+            transforms = [RandomSunFlare(always_apply=True)]
+        elif option == 'daytime':
+            transforms = [RandomBrightness([0.3, 0.3], always_apply=True)]
+        elif option == 'affine':
+            transforms = [Affine(translate_percent={'x': -0.1, 'y': 0}, always_apply=True)]
+        else:
+            transforms = []
+        _augmentations[option] = Compose(transforms)
+    return _augmentations[option]
+
+
+class ImagePreprocessor:
+    """Crop, resize, colour conversion and normalization of the images fed to a model.
+
+    Every call writes into buffers allocated on the first call. They alternate between two sets, so the result
+    of the previous call stays valid (e.g. to compare consecutive frames) until the next one is computed.
+
+    Arguments:
+        crop {tuple} -- Top, bottom, left and right limits of the region of the image that is kept
+        size {tuple} -- Width and height of the model input (as in `cv2.resize`)
+        color_conversion {int} -- OpenCV colour conversion code (e.g. `cv2.COLOR_BGR2RGB`)
+        normalize {bool} -- Normalize like Albumentations `Normalize` into float32
+        mean {tuple} -- Normalization mean, per channel
+        std {tuple} -- Normalization standard deviation, per channel
+        max_pixel_value {float} -- Normalization maximum pixel value
+        channels_first {bool} -- Give CxHxW images, as PyTorch models take them
+    """
+
+    def __init__(self, crop=None, size=None, color_conversion=None, normalize=True, mean=NORMALIZE_MEAN,
+                 std=NORMALIZE_STD, max_pixel_value=NORMALIZE_MAX_PIXEL_VALUE, channels_first=False):
+        self.crop = crop
+        self.size = tuple(size) if size is not None else None
+        self.color_conversion = color_conversion
+        self.normalize = normalize
+        self.channels_first = channels_first
+        # Same constants and operations as albumentations.augmentations.functional.normalize
+        self.mean = np.array(mean, dtype=np.float32) * np.float32(max_pixel_value)
+        self.denominator = np.reciprocal(np.array(std, dtype=np.float32) * np.float32(max_pixel_value),
+                                         dtype=np.float32)
+        self._scratch = None
+        self._resized = None
+        self._outputs = None
+        self._mean = None
+        self._denominator = None
+        self._allocated = False
+        self._current = 0
+        self.resized = None
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Preprocessor of the Gazebo brains options (`ImageCropped`, `ImageSize` and `ImageNormalized`)."""
+        return cls(crop=GAZEBO_IMAGE_CROP if config.get('ImageCropped') else None, size=config.get('ImageSize'),
+                   normalize=bool(config.get('ImageNormalized')), **kwargs)
+
+    def _allocate(self, image):
+        height, width = (self.size[1], self.size[0]) if self.size is not None else image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        if self.color_conversion is not None:
+            channels = cv2.cvtColor(np.zeros((1, 1, channels), dtype=image.dtype), self.color_conversion).shape[-1]
+        if self.size is not None and self.color_conversion is not None:
+            self._scratch = np.empty((height, width) + image.shape[2:], dtype=image.dtype)
+        if self.size is not None or self.color_conversion is not None:
+            self._resized = [np.empty((height, width, channels), dtype=image.dtype) for _ in range(2)]
+        if self.normalize:
+            shape = (channels, height, width) if self.channels_first else (height, width, channels)
+            self._outputs = [np.empty((1,) + shape, dtype=np.float32) for _ in range(2)]
+            # Expanded to the whole image, so the normalization runs over contiguous arrays instead of broadcasting
+            # along the short channels axis
+            mean, denominator = (self.mean[:, None, None], self.denominator[:, None, None]) if self.channels_first \
+                else (self.mean, self.denominator)
+            self._mean = np.ascontiguousarray(np.broadcast_to(mean, shape))
+            self._denominator = np.ascontiguousarray(np.broadcast_to(denominator, shape))
+
+    def __call__(self, image):
+        """Preprocess an image.
+
+        Arguments:
+            image {np.ndarray} -- HxWxC image
+
+        Returns:
+            np.ndarray -- Preprocessed image (HxWxC, or CxHxW with `channels_first`). Normalized images are views of
+            a buffer with a leading batch dimension, so `np.expand_dims(image, axis=0)` does not copy them.
+        """
+        if self.crop is not None:
+            top, bottom, left, right = self.crop
+            image = image[top:bottom, left:right]
+        if not self._allocated:
+            self._allocate(image)
+            self._allocated = True
+        self._current = 1 - self._current
+
+        if self.size is not None and self.color_conversion is not None:
+            resized = cv2.resize(image, self.size, dst=self._scratch)
+            image = cv2.cvtColor(resized, self.color_conversion, dst=self._resized[self._current])
+        elif self.size is not None:
+            image = cv2.resize(image, self.size, dst=self._resized[self._current])
+        elif self.color_conversion is not None:
+            image = cv2.cvtColor(image, self.color_conversion, dst=self._resized[self._current])
+        self.resized = image
+
+        if self.channels_first:
+            image = image.transpose(2, 0, 1)
+        if not self.normalize:
+            return image
+        output = self._outputs[self._current][0]
+        np.copyto(output, image)
+        np.subtract(output, self._mean, out=output)
+        np.multiply(output, self._denominator, out=output)
+        return output
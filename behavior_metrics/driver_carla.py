@@ -17,6 +17,8 @@ from utils.controller_carla import ControllerCarla
 from utils.logger import logger
 from utils.tmp_world_generator import tmp_world_generator
 from utils import metrics_carla
+from utils import aggregated_plots
+from utils.metrics_postprocessing import MetricsPostprocessingQueue
 from datetime import datetime
 from pilot_carla import PilotCarla
 
@@ -128,7 +130,7 @@ def is_config_correct(app_configuration):
     return is_correct
 
 def generate_agregated_experiments_metrics(experiments_starting_time, experiments_elapsed_times, app_configuration):
-    result = metrics_carla.get_aggregated_experiments_list(experiments_starting_time)
+    result = metrics_carla.get_aggregated_experiments_list(experiments_starting_time, root=app_configuration.stats_out)
 
     experiments_starting_time_dt = datetime.fromtimestamp(experiments_starting_time)
     experiments_starting_time_str = str(experiments_starting_time_dt.strftime("%Y%m%d-%H%M%S")) + '_experiments_metrics'
@@ -260,7 +262,7 @@ def generate_agregated_experiments_metrics(experiments_starting_time, experiment
     ]
 
     if app_configuration.task == 'follow_lane_traffic':
-        experiments_metrics_and_titles.append(
+        experiments_metrics_and_titles.extend([
             {
                 'metric': 'dangerous_distance_pct_km',
                 'title': 'Percentage of dangerous distance per km'
@@ -277,11 +279,14 @@ def generate_agregated_experiments_metrics(experiments_starting_time, experiment
                 'metric': 'great_distance_pct_km',
                 'title': 'Percentage of great distance per km'
             },
-        )
+        ])
 
-    metrics_carla.get_all_experiments_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles)
-    metrics_carla.get_per_model_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles)
-    metrics_carla.get_all_experiments_aggregated_metrics_boxplot(result, experiments_starting_time_str, experiments_metrics_and_titles)
+    if app_configuration.stats_aggregated_metrics:
+        experiments_metrics_and_titles = [experiment_metric_and_title for experiment_metric_and_title in experiments_metrics_and_titles
+                                          if experiment_metric_and_title['metric'] in app_configuration.stats_aggregated_metrics]
+    plot_kinds = app_configuration.stats_aggregated_plots or aggregated_plots.PLOT_KINDS
+    aggregated_plots.render_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles,
+                                               kinds=plot_kinds, jobs=app_configuration.stats_plots_jobs)
 
     with open(experiments_starting_time_str + '/' + 'experiment_elapsed_times.json', 'w') as f:
         json.dump(experiments_elapsed_times, f)
@@ -329,6 +334,9 @@ def main():
         environment.close_ros_and_simulators()
     else:
         if is_config_correct(app_configuration):
+            metrics_queue = None
+            if app_configuration.stats_metrics_workers > 0:
+                metrics_queue = MetricsPostprocessingQueue(app_configuration.stats_out, jobs=app_configuration.stats_metrics_workers)
             if app_configuration.task == 'follow_lane':
                 experiments_starting_time = time.time()
                 experiment_counter = 0
@@ -368,6 +376,8 @@ def main():
                                     experiments_elapsed_times['elapsed_time'].append(time.time() - current_experiment_starting_time)
                                     experiment_counter += 1
                                 logger.info("Python process finished.")
+                                if metrics_queue is not None:
+                                    metrics_queue.submit_pending()
 
                             logger.info('Experiments information: ')
                             logger.info(experiments_information)
@@ -411,12 +421,23 @@ def main():
                                     experiments_elapsed_times['elapsed_time'].append(time.time() - current_experiment_starting_time)
                                     experiment_counter += 1
                                 logger.info("Python process finished.")
+                                if metrics_queue is not None:
+                                    metrics_queue.submit_pending()
                             
                             logger.info('Last experiment folder: ')
                             logger.info(max(glob.glob(os.path.join('./', '*/')), key=os.path.getmtime))
             else:
                 logger.info('Invalid task type. Try "follow_route", "follow_lane" or "follow_lane_traffic". Killing program...')
                 sys.exit(-1)
+            if metrics_queue is not None:
+                try:
+                    failed_manifests = metrics_queue.drain()
+                finally:
+                    metrics_queue.shutdown()
+                if failed_manifests:
+                    logger.warning('Metrics post-processing failed for {} experiments, left out of the aggregated '
+                                   'metrics. Their manifests are kept: {}'.format(len(failed_manifests),
+                                                                                 ', '.join(failed_manifests)))
             experiments_elapsed_times['total_experiments_elapsed_time'] = time.time() - experiments_starting_time
             generate_agregated_experiments_metrics(experiments_starting_time, experiments_elapsed_times, app_configuration)
     if app_configuration.experiment_random_spawn_point == True or app_configuration.task == 'follow_route':
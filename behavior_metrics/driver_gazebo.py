@@ -25,6 +25,7 @@ from utils import environment, script_manager_gazebo
 from utils.colors import Colors
 from utils.configuration import Config
 from utils.controller_gazebo import ControllerGazebo
+from utils.frame_sink import get_script_frame_sink
 from utils.logger import logger
 from utils.tmp_world_generator import tmp_world_generator
 
@@ -164,8 +165,11 @@ def main():
     for config in config_data['config']:
         app_configuration = Config(config)
 
-        # Create controller of model-view
-        controller = ControllerGazebo()
+        # Create controller of model-view, nobody shows the frames in script mode
+        if config_data['script']:
+            controller = ControllerGazebo(frame_sink=get_script_frame_sink(app_configuration))
+        else:
+            controller = ControllerGazebo()
 
         # If there's no config, configure the app through the GUI
         if app_configuration.empty and config_data['gui']:
@@ -211,6 +215,7 @@ def main():
             environment.close_ros_and_simulators()
         else:
             script_manager_gazebo.run_brains_worlds(app_configuration, controller, randomize=config_data['random'])
+            controller.frame_sink.close()
             logger.info('closing all processes...')
             environment.close_ros_and_simulators()
 
@@ -0,0 +1,301 @@
+import os
+# The variants are compared on the CPU
+os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+
+import csv
+import glob
+import argparse
+import numpy as np
+import cv2
+
+from behaviorlib.inference_engine import get_inference_engine
+from brains.preprocessing import ImagePreprocessor
+from utils.constants import PRETRAINED_MODELS_DIR, ROOT_PATH
+
+MODELS_PATH = os.path.join(ROOT_PATH, PRETRAINED_MODELS_DIR)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Brain that runs each kind of variant in the CARLA configs
+BRAINS = {
+    'keras': 'brains/CARLA/tensorflow/brain_carla_bird_eye_deep_learning.py',
+    'tflite': 'brains/CARLA/tensorflow/brain_carla_bird_eye_deep_learning_tf_lite.py',
+    'torchscript': 'brains/CARLA/pytorch/brain_carla_bird_eye_deep_learning_torch.py',
+}
+TABLE_FIELDS = ['variant', 'backend', 'model', 'size_mb', 'mean_latency_ms', 'p50_latency_ms', 'p99_latency_ms',
+                'throughput_fps', 'max_drift', 'mean_drift']
+
+
+def get_model_path(model):
+    """Model path, as given or relative to the models directory (e.g. `CARLA/pilotnet.h5`)."""
+    if os.path.exists(model):
+        return os.path.abspath(model)
+    return os.path.join(MODELS_PATH, model)
+
+
+def load_frames(frames_path, count, seed):
+    """Random sample of the recorded bird-eye view frames (RGB) of a dataset directory."""
+    filenames = sorted(filename for filename in glob.glob(os.path.join(frames_path, '**', '*'), recursive=True)
+                       if filename.lower().endswith(IMAGE_EXTENSIONS))
+    if not filenames:
+        raise ValueError('No frames found in {}'.format(frames_path))
+    rng = np.random.default_rng(seed)
+    filenames = rng.choice(filenames, min(count, len(filenames)), replace=False)
+    return [cv2.cvtColor(cv2.imread(filename), cv2.COLOR_BGR2RGB) for filename in filenames]
+
+
+def get_inputs(frames, height, width, channels_first=False):
+    """Model inputs of the frames, preprocessed as the bird-eye brains do, shaped (N, 1, ...)."""
+    preprocessor = ImagePreprocessor(size=(width, height), channels_first=channels_first)
+    return np.stack([np.expand_dims(preprocessor(frame), axis=0) for frame in frames])
+
+
+def export_keras(model_path, output_path, inputs, calibration):
+    """TF-Lite float32, dynamic range, float16 and INT8 variants of a Keras model, and its ONNX export.
+
+    Returns:
+        list -- (variant, backend, path) of the exported models
+    """
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    stem = os.path.splitext(os.path.basename(model_path.rstrip('/')))[0]
+    variants = []
+
+    def convert(variant, optimize=False, supported_types=None, representative_dataset=None):
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if optimize:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if supported_types:
+            converter.target_spec.supported_types = supported_types
+        if representative_dataset is not None:
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.uint8
+            converter.inference_output_type = tf.uint8
+        path = os.path.join(output_path, '{}_{}.tflite'.format(stem, variant))
+        with open(path, 'wb') as f:
+            f.write(converter.convert())
+        variants.append((variant, 'tflite', path))
+
+    convert('float32')
+    convert('dynamic_quant', optimize=True)
+    convert('float16_quant', optimize=True, supported_types=[tf.float16])
+    if calibration is not None:
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample.astype(np.float32)]
+        convert('int_quant', optimize=True, representative_dataset=representative_dataset)
+    else:
+        print('Skipping the INT8 variant: it needs recorded frames (--frames) to calibrate')
+
+    try:
+        import tf2onnx
+    except ImportError:
+        print('Skipping the ONNX variant: tf2onnx is not installed')
+    else:
+        path = os.path.join(output_path, '{}.onnx'.format(stem))
+        signature = [tf.TensorSpec((None,) + inputs.shape[2:], tf.float32, name='input')]
+        tf2onnx.convert.from_keras(model, input_signature=signature, output_path=path)
+        variants.append(('onnx', 'onnx', path))
+    return variants
+
+
+def load_torch_model(model_path, image_shape):
+    import torch
+    from brains.CARLA.pytorch.utils.pilotnet import PilotNet
+
+    try:
+        return torch.jit.load(model_path, map_location='cpu').eval()
+    except RuntimeError:
+        model = PilotNet(image_shape, 3)
+        model.load_state_dict(torch.load(model_path, map_location='cpu'))
+        return model.eval()
+
+
+def export_torch(model_path, output_path, inputs, image_shape):
+    """Frozen TorchScript, frozen TorchScript with dynamic INT8 linear layers and ONNX variants of a PilotNet model.
+
+    Returns:
+        list -- (variant, backend, path) of the exported models
+    """
+    import torch
+
+    model = load_torch_model(model_path, image_shape)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    example = torch.from_numpy(inputs[0])
+    variants = []
+
+    def freeze(variant, module):
+        with torch.no_grad():
+            traced = module if isinstance(module, torch.jit.ScriptModule) else torch.jit.trace(module, example)
+            frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+        path = os.path.join(output_path, '{}_{}.pt'.format(stem, variant))
+        torch.jit.save(frozen, path)
+        variants.append((variant, 'torchscript', path))
+
+    freeze('frozen', model)
+    if isinstance(model, torch.jit.ScriptModule):
+        print('Skipping the INT8 and ONNX variants: they need the eager PilotNet model')
+        return variants
+
+    freeze('dynamic_int8', torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8))
+    path = os.path.join(output_path, '{}.onnx'.format(stem))
+    torch.onnx.export(model, example, path, input_names=['input'], output_names=['output'],
+                      dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}}, opset_version=13)
+    variants.append(('onnx', 'onnx', path))
+    return variants
+
+
+def benchmark(name, backend, path, inputs, reference, repetitions, **kwargs):
+    """Latency, throughput and drift from the reference outputs of a model on the CPU, as a table row."""
+    # The eager PyTorch model is given already loaded
+    engine = get_inference_engine(None if backend == 'torch' else path, backend=backend,
+                                  input_shape=inputs.shape[1:], **kwargs)
+    outputs = np.concatenate([engine(sample) for sample in inputs])
+    for _ in range(repetitions - 1):
+        for sample in inputs:
+            engine(sample)
+    drift = np.abs(outputs - reference) if reference is not None else np.zeros(1)
+    latencies = engine.latencies
+    size = sum(os.path.getsize(filename) for filename in glob.glob(os.path.join(path, '**'), recursive=True)
+               if os.path.isfile(filename)) if os.path.isdir(path) else os.path.getsize(path)
+    row = {
+        'variant': name,
+        'backend': backend,
+        'model': path,
+        'size_mb': size / 2 ** 20,
+        'mean_latency_ms': latencies.mean() * 1000,
+        'p50_latency_ms': latencies.percentile(50) * 1000,
+        'p99_latency_ms': latencies.percentile(99) * 1000,
+        'throughput_fps': 1 / latencies.mean(),
+        'max_drift': float(drift.max()),
+        'mean_drift': float(drift.mean()),
+    }
+    return row, outputs
+
+
+def write_table(rows, filename):
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=TABLE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_config(rows, filename, models_path):
+    """`BrainPath` and `Model` lists of the variants that have a brain, to paste in a CARLA multiple brains config
+    (as default_carla_multiple_tensorflow_optimizations.yml), each commented with its benchmark results."""
+    rows = [row for row in rows if row['backend'] in BRAINS]
+    lines = ['# Generated by optimize_models.py, CPU benchmark:',
+             '# {:<20} {:>12} {:>14} {:>10}'.format('variant', 'latency (ms)', 'throughput (fps)', 'max drift')]
+    for row in rows:
+        lines.append('# {:<20} {:>12.3f} {:>14.1f} {:>10.2e}'.format(row['variant'], row['mean_latency_ms'],
+                                                                      row['throughput_fps'], row['max_drift']))
+    lines.append('BrainPath: [')
+    lines.extend("    '{}',".format(BRAINS[row['backend']]) for row in rows)
+    lines.append('    ]')
+    lines.append('Parameters:')
+    lines.append('    Model: [')
+    lines.extend("        '{}',".format(os.path.relpath(row['model'], models_path)) for row in rows)
+    lines.append('        ]')
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Export CPU optimized variants (TF-Lite dynamic range, float16 and '
+                                                 'INT8, ONNX, frozen TorchScript) of a brain model and benchmark '
+                                                 'their latency, throughput and output drift against the original.',
+                                     epilog='Enjoy the program! :)')
+
+    parser.add_argument('-m',
+                        '--model',
+                        type=str,
+                        required=True,
+                        help='Keras (.h5 or SavedModel) or PyTorch (.pth, PilotNet) model, relative to the models '
+                             'directory (e.g. CARLA/pilotnet.h5) or as a path.')
+
+    parser.add_argument('-f',
+                        '--frames',
+                        type=str,
+                        help='Directory of recorded bird-eye view frames, used to calibrate the INT8 variant and as '
+                             'benchmark inputs. Random images are used if it is not given (no INT8 variant).')
+
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        help='Directory of the exported models and results (default: optimized_<model> next to '
+                             'the model).')
+
+    parser.add_argument('-n',
+                        '--samples',
+                        type=int,
+                        default=100,
+                        help='Frames used as benchmark inputs and INT8 calibration data.')
+
+    parser.add_argument('-r',
+                        '--repetitions',
+                        type=int,
+                        default=5,
+                        help='Times every benchmark input is run.')
+
+    parser.add_argument('--image-shape',
+                        type=int,
+                        nargs=3,
+                        default=[200, 66, 3],
+                        help='Height, width and channels of the PyTorch PilotNet input.')
+
+    parser.add_argument('--models-dir',
+                        type=str,
+                        default=os.path.join(MODELS_PATH, 'CARLA'),
+                        help='Directory the brains load the models from, the config model paths are relative to it.')
+
+    parser.add_argument('-s',
+                        '--seed',
+                        type=int,
+                        default=0,
+                        help='Seed of the frames sample.')
+
+    args = parser.parse_args()
+    model_path = get_model_path(args.model)
+    stem = os.path.splitext(os.path.basename(model_path.rstrip('/')))[0]
+    output_path = args.output or os.path.join(os.path.dirname(model_path.rstrip('/')), 'optimized_' + stem)
+    os.makedirs(output_path, exist_ok=True)
+    is_torch = model_path.endswith(('.pth', '.pt'))
+
+    if is_torch:
+        height, width = args.image_shape[:2]
+    else:
+        import tensorflow as tf
+        height, width = tf.keras.models.load_model(model_path, compile=False).input_shape[1:3]
+
+    if args.frames:
+        frames = load_frames(args.frames, args.samples, args.seed)
+    else:
+        rng = np.random.default_rng(args.seed)
+        frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(args.samples)]
+    inputs = get_inputs(frames, height, width, channels_first=is_torch)
+
+    if is_torch:
+        original = ('original', 'torch', model_path, {'model': load_torch_model(model_path, tuple(args.image_shape)),
+                                                      'device': 'cpu'})
+        variants = export_torch(model_path, output_path, inputs, tuple(args.image_shape))
+    else:
+        original = ('original', 'keras', model_path, {'mode': 'compiled'})
+        variants = export_keras(model_path, output_path, inputs, inputs if args.frames else None)
+
+    name, backend, path, kwargs = original
+    row, reference = benchmark(name, backend, path, inputs, None, args.repetitions, **kwargs)
+    rows = [row]
+    for name, backend, path in variants:
+        rows.append(benchmark(name, backend, path, inputs, reference, args.repetitions)[0])
+
+    print('{:<16} {:<12} {:>10} {:>14} {:>14} {:>14} {:>12} {:>12}'.format(
+        'variant', 'backend', 'size (MB)', 'latency (ms)', 'p99 (ms)', 'throughput', 'max drift', 'mean drift'))
+    for row in rows:
+        print('{:<16} {:<12} {:>10.2f} {:>14.3f} {:>14.3f} {:>14.1f} {:>12.2e} {:>12.2e}'.format(
+            row['variant'], row['backend'], row['size_mb'], row['mean_latency_ms'], row['p99_latency_ms'],
+            row['throughput_fps'], row['max_drift'], row['mean_drift']))
+
+    write_table(rows, os.path.join(output_path, 'benchmark.csv'))
+    write_config(rows, os.path.join(output_path, 'benchmark.yml'), args.models_dir)
+    print('Results written to ' + output_path)
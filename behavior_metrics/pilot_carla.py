@@ -24,6 +24,7 @@ from robot.actuators import Actuators
 from robot.sensors import Sensors
 from utils.logger import logger
 from utils.constants import MIN_EXPERIMENT_PERCENTAGE_COMPLETED, ROOT_PATH
+from utils.pilot_scheduler import PilotScheduler
 from rosgraph_msgs.msg import Clock
 from carla_msgs.msg import CarlaControl
 
@@ -47,6 +48,7 @@ class PilotCarla(threading.Thread):
         sensors {robot.sensors.Sensors} -- Sensors instance of the robot
         actuators {robot.actuators.Actuators} -- Actuators instance of the robot
         brains {brains.brains_handler.Brains} -- Brains controller instance
+        scheduler {utils.pilot_scheduler.PilotScheduler} -- Scheduler that paces the main loop
     """
 
     def __init__(self, configuration, controller, brain_path, experiment_model=None):
@@ -107,6 +109,8 @@ class PilotCarla(threading.Thread):
         else:
             self.brains = Brains(self.sensors, self.actuators, self.brain_path, self.controller,
                                  config=self.configuration.brain_kwargs)
+        self.scheduler = PilotScheduler(self.configuration.pilot_scheduler, self.configuration.pilot_time_cycle,
+                                        self.sensors.get_sensor(self.configuration.pilot_event_sensor))
         self.__wait_carla()
 
     def stop_interfaces(self):
@@ -115,35 +119,39 @@ class PilotCarla(threading.Thread):
             self.sensors.kill()
         if self.actuators:
             self.actuators.kill()
+        if self.brains:
+            self.brains.unload_brain()
         pass
 
     def run(self):
-        """Main loop of the class. Calls a brain action every self.time_cycle"""
+        """Main loop of the class. Calls a brain action every iteration started by self.scheduler"""
         "TODO: cleanup measure of ips"
         self.brain_iterations_simulated_time = []
         self.real_time_factors = []
-        self.sensors.get_camera('camera_0').total_frames = 0
+        for camera in (self.sensors.cameras or {}).values():
+            camera.resetFrameCounters()
         self.pilot_start_time = time.time()
+        self.scheduler.reset()
 
         control_pub = rospy.Publisher('/carla/control', CarlaControl, queue_size=1)
         control_command = CarlaControl()
         control_command.command = 1 # PAUSE
         control_pub.publish(control_command)
 
+        step_command = CarlaControl()
+        if self.async_mode:
+            step_command.command = 2 # STEP_ONCE
+        else:
+            step_command.command = 0 # PLAY
+
         self.waypoint_publisher = None
         while not self.kill_event.is_set():
             if not self.stop_event.is_set():
                 if self.waypoint_publisher is None and self.waypoint_publisher_path is not None:
                     self.waypoint_publisher = subprocess.Popen(["roslaunch", ROOT_PATH + '/' + self.waypoint_publisher_path])
-                control_pub = rospy.Publisher('/carla/control', CarlaControl, queue_size=1)
-                control_command = CarlaControl()
-                if self.async_mode:
-                    control_command.command = 2 # STEP_ONCE
-                else:
-                    control_command.command = 0 # PLAY
-                control_pub.publish(control_command)
-
-                start_time = datetime.now()
+                control_pub.publish(step_command)
+
+                self.scheduler.wait()
                 start_time_ros = self.ros_clock_time
                 self.execution_completed = False
                 try:
@@ -159,11 +167,7 @@ class PilotCarla(threading.Thread):
                     self.kill()
                     os._exit(-1)
 
-                dt = datetime.now() - start_time
-                ms = (dt.days * 24 * 60 * 60 + dt.seconds) * 1000 + dt.microseconds / 1000.0
-                self.brain_iterations_real_time.append(ms / 1000)
-                if ms < self.time_cycle:
-                    time.sleep((self.time_cycle - ms) / 1000.0)
+                self.brain_iterations_real_time.append(self.scheduler.done())
                 self.real_time_factors.append(self.real_time_factor)
                 self.brain_iterations_simulated_time.append(self.ros_clock_time - start_time_ros)
                 if not self.async_mode:
@@ -176,6 +180,7 @@ class PilotCarla(threading.Thread):
         """Pause the main loop"""
 
         self.stop_event.set()
+        self.scheduler.pause()
 
     def play(self):
         """Resume the main loop."""
@@ -214,6 +219,7 @@ class PilotCarla(threading.Thread):
 
     def clock_callback(self, clock_data):
         self.ros_clock_time = clock_data.clock.to_sec()
+        self.scheduler.update_clock(self.ros_clock_time)
 
     def track_stats(self):
         self.clock_subscriber = rospy.Subscriber("/clock", Clock, self.clock_callback)
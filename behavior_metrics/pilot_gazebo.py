@@ -24,6 +24,7 @@ from robot.actuators import Actuators
 from robot.sensors import Sensors
 from utils.logger import logger
 from utils.constants import MIN_EXPERIMENT_PERCENTAGE_COMPLETED
+from utils.pilot_scheduler import PilotScheduler
 from rosgraph_msgs.msg import Clock
 
 import numpy as np
@@ -46,6 +47,7 @@ class PilotGazebo(threading.Thread):
         sensors {robot.sensors.Sensors} -- Sensors instance of the robot
         actuators {robot.actuators.Actuators} -- Actuators instance of the robot
         brains {brains.brains_handler.Brains} -- Brains controller instance
+        scheduler {utils.pilot_scheduler.PilotScheduler} -- Scheduler that paces the main loop
     """
 
     def __init__(self, configuration, controller, brain_path):
@@ -109,6 +111,9 @@ class PilotGazebo(threading.Thread):
         else:
             self.brains = Brains(self.sensors, self.actuators, self.brain_path, self.controller,
                                  config=self.configuration.brain_kwargs)
+        event_sensor = self.sensors.get_sensor(self.configuration.pilot_event_sensor) if self.sensors else None
+        self.scheduler = PilotScheduler(self.configuration.pilot_scheduler, self.configuration.pilot_time_cycle,
+                                        event_sensor)
         self.__wait_gazebo()
 
     def stop_interfaces(self):
@@ -117,21 +122,24 @@ class PilotGazebo(threading.Thread):
             self.sensors.kill()
         if self.actuators:
             self.actuators.kill()
+        if self.brains:
+            self.brains.unload_brain()
         pass
 
     def run(self):
-        """Main loop of the class. Calls a brain action every self.time_cycle"""
+        """Main loop of the class. Calls a brain action every iteration started by self.scheduler"""
         "TODO: cleanup measure of ips"
         it = 0
         ss = time.time()
         self.brain_iterations_real_time = []
         self.brain_iterations_simulated_time = []
         self.real_time_factors = []
-        self.sensors.get_camera('camera_0').total_frames = 0
+        self.sensors.get_camera('camera_0').resetFrameCounters()
         self.pilot_start_time = time.time()
+        self.scheduler.reset()
         while not self.kill_event.is_set():
             if not self.stop_event.is_set():
-                start_time = datetime.now()
+                self.scheduler.wait()
                 start_time_ros = self.ros_clock_time
                 self.execution_completed = False
                 try:
@@ -141,17 +149,13 @@ class PilotGazebo(threading.Thread):
                     logger.warning('No Brain selected')
                     logger.error(e)
 
-                dt = datetime.now() - start_time
-                ms = (dt.days * 24 * 60 * 60 + dt.seconds) * 1000 + dt.microseconds / 1000.0
-                self.brain_iterations_real_time.append(ms / 1000)
+                self.brain_iterations_real_time.append(self.scheduler.done())
                 elapsed = time.time() - ss
                 if elapsed < 1:
                     it += 1
                 else:
                     ss = time.time()
                     it = 0
-                if ms < self.time_cycle:
-                    time.sleep((self.time_cycle - ms) / 1000.0)
                 self.real_time_factors.append(self.real_time_factor)
                 self.brain_iterations_simulated_time.append(self.ros_clock_time - start_time_ros)
         self.execution_completed = True
@@ -168,6 +172,7 @@ class PilotGazebo(threading.Thread):
         """Pause the main loop"""
 
         self.stop_event.set()
+        self.scheduler.pause()
 
     def play(self):
         """Resume the main loop."""
@@ -262,11 +267,15 @@ class PilotGazebo(threading.Thread):
         experiment_metrics['real_time_factor'] = real_time_factor
         experiment_metrics['real_time_update_rate'] = real_time_update_rate
         experiment_metrics['suddenness_distance'] = suddenness_distance
+        if hasattr(self.brains.active_brain, 'keras_inference_mode'):
+            experiment_metrics['keras_inference_mode'] = self.brains.active_brain.keras_inference_mode
+        experiment_metrics.update(self.scheduler.summary())
         logger.info('Saving metrics to ROS bag')
         return experiment_metrics, first_image
 
     def clock_callback(self, clock_data):
         self.ros_clock_time = clock_data.clock.to_sec()
+        self.scheduler.update_clock(self.ros_clock_time)
 
     def track_stats(self):
         args = ["gz", "stats", "-p"]
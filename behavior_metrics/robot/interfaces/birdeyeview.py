@@ -1,7 +1,13 @@
 import carla
 from carla_birdeye_view import BirdViewProducer, BirdViewCropType, PixelDimensions
+from robot.interfaces.sequence import SensorSequence
 
 class BirdEyeView:
+    """Bird-eye view of the CARLA world around a vehicle.
+
+    The view is rendered once per world frame: until the simulation ticks again, `getImage` returns the same image
+    with the same sequence number.
+    """
 
     def __init__(self):
         client = carla.Client('localhost', 2000)
@@ -13,14 +19,33 @@ class BirdEyeView:
             render_lanes_on_junctions=True,
             crop_type=BirdViewCropType.FRONT_AREA_ONLY
         )
+        self.sequence = SensorSequence()
+        self.world = None
+        self.frame = None
+        self.image = None
 
     def getImage(self, vehicle):
-        try:
-            birdview = self.birdview_producer.produce(
-                agent_vehicle=vehicle  # carla.Actor (spawned vehicle)
-            )
-        except Exception as ex:
-            print(ex)
-        # Mask to RGB image
-        image = BirdViewProducer.as_rgb(birdview)
-        return image
+        if self.world is None:
+            self.world = vehicle.get_world()
+        snapshot = self.world.get_snapshot()
+        frame = (snapshot.frame, vehicle.id)
+        if self.image is None or frame != self.frame:
+            try:
+                birdview = self.birdview_producer.produce(
+                    agent_vehicle=vehicle  # carla.Actor (spawned vehicle)
+                )
+            except Exception as ex:
+                print(ex)
+            # Mask to RGB image
+            self.image = BirdViewProducer.as_rgb(birdview)
+            self.frame = frame
+            self.sequence.update(snapshot.timestamp.elapsed_seconds)
+        self.sequence.read(self.sequence.seq)
+        return self.image
+
+    def wait_for_new(self, timeout=None, seq=None):
+        """Wait for a view newer than the last one read (or than `seq`), see `SensorSequence.wait_for_new`.
+
+        New views are only rendered by `getImage`, so this is only useful from another thread.
+        """
+        return self.sequence.wait_for_new(timeout, seq)
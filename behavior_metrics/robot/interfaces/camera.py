@@ -1,6 +1,8 @@
 import threading
+import cv2
 import numpy as np
 import rospy
+from robot.interfaces.sequence import SensorSequence
 
 from cv_bridge import CvBridge
 from sensor_msgs.msg import Image as ImageROS
@@ -8,6 +10,31 @@ from sensor_msgs.msg import Image as ImageROS
 MAXRANGE = 8  # max length received from imageD
 MINRANGE = 0
 
+# Colour conversion to RGB of the encodings decoded without CvBridge (rgb8 needs none)
+RGB8_CONVERSIONS = {
+    'rgb8': None,
+    'bgr8': cv2.COLOR_BGR2RGB,
+    'rgba8': cv2.COLOR_RGBA2RGB,
+    'bgra8': cv2.COLOR_BGRA2RGB,
+    'mono8': cv2.COLOR_GRAY2RGB,
+}
+ENCODING_CHANNELS = {'rgb8': 3, 'bgr8': 3, 'rgba8': 4, 'bgra8': 4, 'mono8': 1}
+
+
+def imgmsg_to_rgb8(img, bridge):
+    """RGB image of a ROS image message.
+
+    8 bit encodings are read straight from the message buffer, rgb8 images are a (read only) view of it and the
+    others are converted with a single OpenCV call. Other encodings go through CvBridge.
+    """
+    if img.encoding not in RGB8_CONVERSIONS:
+        return bridge.imgmsg_to_cv2(img, "rgb8")
+    channels = ENCODING_CHANNELS[img.encoding]
+    rows = np.frombuffer(img.data, dtype=np.uint8, count=img.height * img.step).reshape(img.height, img.step)
+    image = rows[:, :img.width * channels].reshape(img.height, img.width, channels)
+    conversion = RGB8_CONVERSIONS[img.encoding]
+    return image if conversion is None else cv2.cvtColor(image, conversion)
+
 
 def imageMsg2Image(img, bridge):
 
@@ -23,7 +50,7 @@ def imageMsg2Image(img, bridge):
         # cv_image = depthToRGB8(gray_img_buff, img.encoding)
         pass
     else:
-        cv_image = bridge.imgmsg_to_cv2(img, "rgb8")
+        cv_image = imgmsg_to_rgb8(img, bridge)
     image.data = cv_image
     return image
 
@@ -36,6 +63,7 @@ class Image:
         self.width = 3  # Image width [pixels]
         self.timeStamp = 0  # Time stamp [s] */
         self.format = ""  # Image format string (RGB8, BGR,...)
+        self.seq = 0  # Sequence number of the listener message
         self.data = np.zeros((self.height, self.width, 3), np.uint8)  # The image data itself
         self.data.shape = self.height, self.width, 3
 
@@ -47,24 +75,61 @@ class Image:
 
 
 class ListenerCamera:
+    """Camera subscribed to a ROS image topic.
+
+    The callback only keeps the last message; it is decoded on the first `getImage` call after it arrives, so the
+    frames nobody reads are never decoded.
+
+    Arguments:
+        topic {str} -- ROS image topic
+        decode_every_n {int} -- Keep only one of every n received frames, the others are dropped in the callback
+        on_demand {bool} -- Decode on `getImage` (default), or as soon as the message arrives
 
-    def __init__(self, topic):
+    Attributes:
+        total_frames {int} -- Frames received
+        decoded_frames {int} -- Frames decoded
+        dropped_frames {int} -- Frames received that were never decoded (skipped or replaced before being read)
+        sequence {SensorSequence} -- Sequence number and timestamp of the last frame kept
+    """
+
+    def __init__(self, topic, decode_every_n=1, on_demand=True):
         self.topic = topic
+        self.decode_every_n = max(int(decode_every_n), 1)
+        self.on_demand = on_demand
         self.data = Image()
         self.sub = None
         self.lock = threading.Lock()
         self.total_frames = 0
+        self.decoded_frames = 0
+        self.dropped_frames = 0
+        self.pending = None
+        self.pending_seq = 0
+        self.sequence = SensorSequence()
 
         self.bridge = CvBridge()
         self.start()
 
     def __callback(self, img):
         self.total_frames += 1
-        image = imageMsg2Image(img, self.bridge)
-
-        self.lock.acquire()
-        self.data = image
-        self.lock.release()
+        if (self.total_frames - 1) % self.decode_every_n:
+            self.dropped_frames += 1
+            return
+
+        with self.lock:
+            if self.pending is not None:
+                self.dropped_frames += 1
+            self.pending = img
+            self.pending_seq = self.sequence.seq + 1
+            if not self.on_demand:
+                self.__decode()
+        self.sequence.update(img.header.stamp.secs + (img.header.stamp.nsecs * 1e-9))
+
+    def __decode(self):
+        """Decode the pending message, with the lock held."""
+        self.data = imageMsg2Image(self.pending, self.bridge)
+        self.data.seq = self.pending_seq
+        self.pending = None
+        self.decoded_frames += 1
 
     def stop(self):
         self.sub.unregister()
@@ -73,12 +138,30 @@ class ListenerCamera:
         self.sub = rospy.Subscriber(self.topic, ImageROS, self.__callback)
 
     def getImage(self):
-        self.lock.acquire()
-        image = self.data
-        self.lock.release()
-
+        with self.lock:
+            if self.pending is not None:
+                self.__decode()
+            image = self.data
+        self.sequence.read(image.seq)
         return image
 
+    def wait_for_new(self, timeout=None, seq=None):
+        """Wait for a frame newer than the last one read (or than `seq`), see `SensorSequence.wait_for_new`."""
+        return self.sequence.wait_for_new(timeout, seq)
+
+    def resetFrameCounters(self):
+        self.total_frames = 0
+        self.decoded_frames = 0
+        self.dropped_frames = 0
+
+    def getFrameCounters(self):
+        """Received, decoded and dropped frames."""
+        return {
+            'total_frames': self.total_frames,
+            'decoded_frames': self.decoded_frames,
+            'dropped_frames': self.dropped_frames,
+        }
+
     def getTopic(self):
         return self.topic
 
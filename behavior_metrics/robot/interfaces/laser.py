@@ -1,6 +1,7 @@
 import rospy
 from sensor_msgs.msg import LaserScan
 import threading
+from robot.interfaces.sequence import SensorSequence
 from math import pi as PI
 from jderobotTypes import LaserData
 
@@ -47,8 +48,10 @@ class ListenerLaser:
         '''
         self.topic = topic
         self.data = LaserData()
+        self.data.seq = 0
         self.sub = None
         self.lock = threading.Lock()
+        self.sequence = SensorSequence()
         self.start()
 
     def __callback(self, scan):
@@ -61,8 +64,10 @@ class ListenerLaser:
         laser = laserScan2LaserData(scan)
 
         self.lock.acquire()
+        laser.seq = self.sequence.seq + 1
         self.data = laser
         self.lock.release()
+        self.sequence.update(laser.timeStamp)
 
     def stop(self):
         '''
@@ -88,8 +93,21 @@ class ListenerLaser:
         self.lock.acquire()
         laser = self.data
         self.lock.release()
+        self.sequence.read(laser.seq)
 
         return laser
 
+    def wait_for_new(self, timeout=None, seq=None):
+        '''
+        Waits for a laser scan newer than the last one returned by getLaserData (or than seq).
+
+        @param timeout: maximum time to wait [s], None to wait forever
+        @param seq: sequence number of the last scan already processed
+
+        @return whether a newer scan arrived (False on timeout)
+
+        '''
+        return self.sequence.wait_for_new(timeout, seq)
+
     def getTopic(self):
         return self.topic
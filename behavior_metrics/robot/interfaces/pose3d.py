@@ -1,6 +1,7 @@
 import rospy
 from nav_msgs.msg import Odometry
 import threading
+from robot.interfaces.sequence import SensorSequence
 from math import asin, atan2, pi
 
 
@@ -107,6 +108,7 @@ class Pose3d ():
         self.roll = 0  # Roll angle[rads]
         self.q = [0, 0, 0, 0]  # Quaternion
         self.timeStamp = 0  # Time stamp [s]
+        self.seq = 0  # Sequence number of the listener message
 
     def __str__(self):
         s = "Pose3D: {\n   x: " + str(self.x) + "\n   Y: " + str(self.y)
@@ -132,6 +134,7 @@ class ListenerPose3d:
         self.data = Pose3d()
         self.sub = None
         self.lock = threading.Lock()
+        self.sequence = SensorSequence()
         self.start()
 
     def __callback(self, odom):
@@ -146,8 +149,10 @@ class ListenerPose3d:
         pose = odometry2Pose3D(odom)
 
         self.lock.acquire()
+        pose.seq = self.sequence.seq + 1
         self.data = pose
         self.lock.release()
+        self.sequence.update(pose.timeStamp)
 
     def stop(self):
         '''
@@ -173,5 +178,18 @@ class ListenerPose3d:
         self.lock.acquire()
         pose = self.data
         self.lock.release()
+        self.sequence.read(pose.seq)
 
         return pose
+
+    def wait_for_new(self, timeout=None, seq=None):
+        '''
+        Waits until the pose is updated after the last getPose3d call (or after seq).
+
+        @param timeout: maximum time to wait [s], None to wait forever
+        @param seq: sequence number of the pose to compare with
+
+        @return whether a newer pose is available (False on timeout)
+
+        '''
+        return self.sequence.wait_for_new(timeout, seq)
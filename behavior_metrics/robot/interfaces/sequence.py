@@ -0,0 +1,49 @@
+import threading
+
+
+class SensorSequence:
+    """Sequence number and timestamp of the last data received by a sensor.
+
+    The sequence number starts at 0 (no data yet) and grows by one with every new message, so consumers can tell
+    whether there is new data by comparing two integers, or block until there is.
+
+    Attributes:
+        seq {int} -- Sequence number of the last data received
+        timestamp {float} -- Time stamp [s] of the last data received
+        read_seq {int} -- Sequence number of the last data read through the sensor getter
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.timestamp = 0
+        self.read_seq = 0
+
+    def update(self, timestamp):
+        """Count new data, waking up the consumers waiting for it.
+
+        Returns:
+            int -- Sequence number of the new data
+        """
+        with self.condition:
+            self.seq += 1
+            self.timestamp = timestamp
+            self.condition.notify_all()
+            return self.seq
+
+    def read(self, seq):
+        self.read_seq = seq
+
+    def wait_for_new(self, timeout=None, seq=None):
+        """Wait until there is data newer than a sequence number.
+
+        Arguments:
+            timeout {float} -- Maximum time to wait [s], None to wait forever
+            seq {int} -- Sequence number of the last data seen (default: the last one read through the getter)
+
+        Returns:
+            bool -- Whether there is newer data (False on timeout)
+        """
+        seq = self.read_seq if seq is None else seq
+        with self.condition:
+            return self.condition.wait_for(lambda: self.seq > seq, timeout)
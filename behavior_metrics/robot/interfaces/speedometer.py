@@ -1,6 +1,7 @@
 import rospy
 from std_msgs.msg import Float32
 import threading
+from robot.interfaces.sequence import SensorSequence
 
 
 def speedometer2Speedometer(speedometer):
@@ -20,6 +21,7 @@ class Speedometer():
 
         self.data = 0  # X coord [meters]
         self.timeStamp = 0  # Time stamp [s]
+        self.seq = 0  # Sequence number of the listener message
 
     def __str__(self):
         s = "Speedometer: {\n   x: " + str(self.x) + "\n   timeStamp: " + str(self.timeStamp) + "\n}"
@@ -42,6 +44,7 @@ class ListenerSpeedometer:
         self.data = Speedometer()
         self.sub = None
         self.lock = threading.Lock()
+        self.sequence = SensorSequence()
         self.start()
 
     def __callback(self, speedometer):
@@ -56,8 +59,10 @@ class ListenerSpeedometer:
         speedometer = speedometer2Speedometer(speedometer)
 
         self.lock.acquire()
+        speedometer.seq = self.sequence.seq + 1
         self.data = speedometer
         self.lock.release()
+        self.sequence.update(speedometer.timeStamp)
 
     def stop(self):
         '''
@@ -83,5 +88,18 @@ class ListenerSpeedometer:
         self.lock.acquire()
         speedometer = self.data
         self.lock.release()
+        self.sequence.read(speedometer.seq)
 
         return speedometer
+
+    def wait_for_new(self, timeout=None, seq=None):
+        '''
+        Waits for a speed reading newer than the last one returned by getSpeedometer (or than seq).
+
+        @param timeout: maximum time to wait [s], None to wait forever
+        @param seq: sequence number of the last speed reading the caller has
+
+        @return whether a newer reading arrived (False on timeout)
+
+        '''
+        return self.sequence.wait_for_new(timeout, seq)
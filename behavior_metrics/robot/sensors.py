@@ -79,7 +79,8 @@ class Sensors:
             name = sensor_config[elem]['Name']
             topic = sensor_config[elem]['Topic']
             if sensor_type == 'camera':
-                sensor_dict[name] = ListenerCamera(topic)
+                sensor_dict[name] = ListenerCamera(topic, decode_every_n=sensor_config[elem].get('DecodeEveryN', 1),
+                                                   on_demand=sensor_config[elem].get('OnDemand', True))
             elif sensor_type == 'laser':
                 sensor_dict[name] = ListenerLaser(topic)
             elif sensor_type == 'pose3d':
@@ -155,6 +156,21 @@ class Sensors:
         """
         return self.__get_sensor(bird_eye_view_name, 'bird_eye_view')
 
+    def get_sensor(self, sensor_name):
+        """Retrieve an specific existing sensor of any type
+
+        Arguments:
+            sensor_name {str} -- Name of the sensor to be retrieved
+
+        Returns:
+            object -- sensor instance, None if there is no sensor with that name
+        """
+        for sensors in (self.cameras, self.lasers, getattr(self, 'pose3d', None), self.bird_eye_view,
+                        self.speedometer):
+            if sensors and sensor_name in sensors:
+                return sensors[sensor_name]
+        return None
+
     def kill(self):
         """Destroy all the running sensors"""
         if self.cameras:
@@ -11,6 +11,7 @@ from utils import environment
 from utils.colors import Colors
 from utils.configuration import Config
 from utils.controller_carla import ControllerCarla
+from utils.frame_sink import get_script_frame_sink
 from utils.logger import logger
 from utils.tmp_world_generator import tmp_world_generator
 from utils.constants import CARLA_TOWNS_TIMEOUTS
@@ -123,7 +124,7 @@ def main():
         environment.launch_env(world, random_spawn_point=app_configuration.experiment_random_spawn_point, carla_simulator=True, config_spawn_point=app_configuration.spawn_points[world_counter][repetition_counter])
     else:
         environment.launch_env(world, random_spawn_point=app_configuration.experiment_random_spawn_point, carla_simulator=True)
-    controller = ControllerCarla()
+    controller = ControllerCarla(frame_sink=get_script_frame_sink(app_configuration))
 
     # Launch control
     pilot = PilotCarla(app_configuration, controller, brain, experiment_model=experiment_model)
@@ -139,7 +140,7 @@ def main():
         experiment_timeout = app_configuration.experiment_timeouts[world_counter]
 
     rospy.sleep(experiment_timeout)
-    controller.stop_recording_metrics()
+    controller.stop_recording_metrics(deferred=app_configuration.stats_metrics_workers > 0)
     controller.pilot.stop()
     controller.stop_pilot()
     controller.pause_carla_simulation()
@@ -149,6 +150,7 @@ def main():
     environment.close_ros_and_simulators()
     while not controller.pilot.execution_completed:
         time.sleep(1)
+    controller.frame_sink.close()
 
 
 if __name__ == '__main__':
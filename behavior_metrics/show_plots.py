@@ -1,12 +1,7 @@
-import json
-import yaml
-import rosbag
 import sys
 import argparse
-import cv2
-from cv_bridge import CvBridge
-import numpy as np
 
+from utils import experiment_bags
 from utils import metrics_gazebo
 from matplotlib.backends.qt_compat import QtWidgets
 from matplotlib.backends.backend_qt5agg import (FigureCanvas, NavigationToolbar2QT as NavigationToolbar)
@@ -14,8 +9,6 @@ from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QPushBut
 from matplotlib.figure import Figure
 from utils.colors import Colors
 
-bridge = CvBridge()
-
 
 class MetricsWindow(QtWidgets.QMainWindow):
     def __init__(self, bag_file, x_points, y_points, first_image, bag_metadata, experiment_metrics,
@@ -161,58 +154,31 @@ class MetricsWindow(QtWidgets.QMainWindow):
             self.layout.addWidget(label_circuit_diameter)
 
 
-def read_bags(bags):
+def read_bags(bags, jobs=None):
     bags_checkpoints = []
     bags_metadata = []
     bags_experiment_data = []
     first_images = []
-    correct_bags = 0
-    for bag_file in bags:
-        print('Reading bag: ' + bag_file)
-        try:
-            bag = rosbag.Bag(bag_file)
-            bag_checkpoints = []
-            for topic, point, t in bag.read_messages(topics=['/F1ROS/odom']):
-                bag_checkpoints.append(point)
-            bags_checkpoints.append(bag_checkpoints)
-
-            for topic, point, t in bag.read_messages(topics=['/metadata']):
-                y = yaml.load(str(point), Loader=yaml.FullLoader)
-                h = json.dumps(y, indent=4)
-                data = json.loads(h)
-                metadata = json.loads(data['data'])
-                bags_metadata.append(metadata)
-
-            for topic, point, t in bag.read_messages(topics=['/experiment_metrics']):
-                y = yaml.load(str(point), Loader=yaml.FullLoader)
-                h = json.dumps(y, indent=4)
-                data = json.loads(h)
-                lapdata = json.loads(data['data'])
-                bags_experiment_data.append(lapdata)
-            first_image = np.zeros((1, 1))
-            for topic, point, t in bag.read_messages(topics=['/first_image']):
-                first_image = bridge.imgmsg_to_cv2(point, desired_encoding='passthrough')
-            first_images.append(first_image)
-
-            bag.close()
-            correct_bags += 1
-        except Exception as excep:
-            print(excep)
-            print('Error in bag')
+    correct_bags = []
+    for experiment in experiment_bags.read_experiment_bags(bags, jobs=jobs):
+        if experiment is None or experiment['metadata'] is None or experiment['experiment_metrics'] is None:
+            continue
+        bags_checkpoints.append((experiment['x'], experiment['y']))
+        bags_metadata.append(experiment['metadata'])
+        bags_experiment_data.append(experiment['experiment_metrics'])
+        first_images.append(experiment['first_image'])
+        correct_bags.append(experiment['bag'])
 
-    print('Correct bags: ' + str(correct_bags))
+    print('Correct bags: ' + str(len(correct_bags)))
 
-    return bags_checkpoints, bags_metadata, bags_experiment_data, first_images
+    return correct_bags, bags_checkpoints, bags_metadata, bags_experiment_data, first_images
 
 
 def show_metrics(bags, bags_checkpoints, bags_metadata, bags_experiment_data, first_images):
     experiments_metrics = []
     world_completed = {}
 
-    for x, checkpoints in enumerate(bags_checkpoints):
-        x_points = []
-        y_points = []
-
+    for x, (x_points, y_points) in enumerate(bags_checkpoints):
         experiment_metrics = {'world': bags_metadata[x]['world'], 'brain_path': bags_metadata[x]['brain_path'],
                                  'robot_type': bags_metadata[x]['robot_type']}
         if bags_metadata[x]['world'] == 'simple_circuit.launch':
@@ -241,11 +207,6 @@ def show_metrics(bags, bags_checkpoints, bags_metadata, bags_experiment_data, fi
             print('CIRCUIT DIAMETER -> ' + str(experiment_metrics['circuit_diameter']))
             print('AVERAGE SPEED -> ' + str(experiment_metrics['average_speed']))
 
-        for point in checkpoints:
-            point_yml = yaml.load(str(point), Loader=yaml.FullLoader)
-            x_points.append(point_yml['pose']['pose']['position']['x'])
-            y_points.append(point_yml['pose']['pose']['position']['y'])
-
         qapp = QtWidgets.QApplication(sys.argv)
         app = MetricsWindow(bags[x], x_points, y_points, first_images[x], bags_metadata[x], experiment_metrics,
                             circuit_diameter)
@@ -264,13 +225,20 @@ def main():
                         help='{}Path to ROS Bag file.{}'.format(
                             Colors.OKBLUE, Colors.ENDC))
 
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=None,
+                        help='{}Number of processes reading bags. By default the number of CPUs.{}'.format(
+                            Colors.OKBLUE, Colors.ENDC))
+
     args = parser.parse_args()
     config_data = {'bags': None}
     if args.bags:
         config_data['bags'] = args.bags
 
-    bags_checkpoints, bags_metadata, bags_lapdata, first_images = read_bags(config_data['bags'])
-    show_metrics(config_data['bags'], bags_checkpoints, bags_metadata, bags_lapdata, first_images)
+    bags, bags_checkpoints, bags_metadata, bags_lapdata, first_images = read_bags(config_data['bags'], jobs=args.jobs)
+    show_metrics(bags, bags_checkpoints, bags_metadata, bags_lapdata, first_images)
 
 
 if __name__ == "__main__":
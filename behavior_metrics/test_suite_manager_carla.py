@@ -12,6 +12,7 @@ from utils import environment
 from utils.colors import Colors
 from utils.configuration import Config
 from utils.controller_carla import ControllerCarla
+from utils.frame_sink import get_script_frame_sink
 from utils.logger import logger
 from utils.constants import CARLA_TOWNS_TIMEOUTS
 from utils.traffic import TrafficManager
@@ -144,7 +145,7 @@ def main():
                            config_spawn_point=spawn_point,
                            config_town=town)
     
-    controller = ControllerCarla()
+    controller = ControllerCarla(frame_sink=get_script_frame_sink(app_configuration))
 
     # generate traffic
     traffic_manager = TrafficManager(app_configuration.number_of_vehicle, 
@@ -177,7 +178,8 @@ def main():
             break
                 
     # rospy.sleep(experiment_timeout)
-    controller.stop_recording_metrics(termination_code=termination_code, route_length=route_length)
+    controller.stop_recording_metrics(termination_code=termination_code, route_length=route_length,
+                                      deferred=app_configuration.stats_metrics_workers > 0)
     controller.pilot.stop()
     controller.stop_pilot()
     controller.pause_carla_simulation()
@@ -187,6 +189,7 @@ def main():
     environment.close_ros_and_simulators()
     while not controller.pilot.execution_completed:
         time.sleep(1)
+    controller.frame_sink.close()
 
 
 if __name__ == '__main__':
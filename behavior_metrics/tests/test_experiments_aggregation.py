@@ -0,0 +1,65 @@
+import json
+import os
+
+from utils import experiments_aggregation
+
+
+def write_experiment(root, folder, metrics):
+    os.makedirs(os.path.join(root, folder))
+    with open(os.path.join(root, folder, folder + '.json'), 'w') as f:
+        json.dump(metrics, f)
+
+
+def test_scan_experiments_only_finds_experiment_folders(tmp_path):
+    root = str(tmp_path)
+    write_experiment(root, '20230101-120000', {'timestamp': '20230101-120000', 'completed_distance': 10.0})
+    write_experiment(root, '20230101-130000', {'timestamp': '20230101-130000', 'completed_distance': 20.0})
+    # Folder of the aggregated metrics figures of a previous run, not an experiment
+    write_experiment(root, '20230101-140000_experiments_metrics', {'figures': ['completed_distance']})
+    write_experiment(root, '2023-1', {'timestamp': '2023-1'})
+
+    experiments = experiments_aggregation.scan_experiments(root)
+
+    assert sorted(experiments) == ['20230101-120000', '20230101-130000']
+
+
+def test_aggregate_experiments_skips_experiments_metrics_folder(tmp_path):
+    root = str(tmp_path)
+    write_experiment(root, '20230101-120000', {'timestamp': '20230101-120000', 'completed_distance': 10.0})
+    write_experiment(root, '20230101-140000_experiments_metrics', {'figures': ['completed_distance']})
+
+    table = experiments_aggregation.aggregate_experiments(root, jobs=1)
+
+    assert table[experiments_aggregation.EXPERIMENT_FOLDER_COLUMN].tolist() == ['20230101-120000']
+    assert table['completed_distance'].tolist() == [10.0]
+    assert os.path.isdir(os.path.join(root, '20230101-140000_experiments_metrics'))
+    assert not os.path.exists(os.path.join(root, experiments_aggregation.QUARANTINE_FOLDER))
+
+
+def test_aggregate_experiments_keeps_experiments_without_metrics(tmp_path):
+    root = str(tmp_path)
+    write_experiment(root, '20230101-120000', {'timestamp': '20230101-120000', 'completed_distance': 10.0})
+    # Experiments that finished too early to compute any metric write an empty JSON object
+    write_experiment(root, '20230101-130000', {})
+
+    table = experiments_aggregation.aggregate_experiments(root, jobs=1)
+
+    assert table[experiments_aggregation.EXPERIMENT_FOLDER_COLUMN].tolist() == ['20230101-120000', '20230101-130000']
+    assert table['completed_distance'].tolist()[0] == 10.0
+    assert table['completed_distance'].isna().tolist() == [False, True]
+    assert os.path.isdir(os.path.join(root, '20230101-130000'))
+    assert not os.path.exists(os.path.join(root, experiments_aggregation.QUARANTINE_FOLDER))
+
+
+def test_aggregate_experiments_quarantines_broken_experiments(tmp_path):
+    root = str(tmp_path)
+    write_experiment(root, '20230101-120000', {'timestamp': '20230101-120000', 'completed_distance': 10.0})
+    os.makedirs(os.path.join(root, '20230101-130000'))
+    with open(os.path.join(root, '20230101-130000', '20230101-130000.json'), 'w') as f:
+        f.write('{"completed_distance": ')
+
+    table = experiments_aggregation.aggregate_experiments(root, jobs=1)
+
+    assert table[experiments_aggregation.EXPERIMENT_FOLDER_COLUMN].tolist() == ['20230101-120000']
+    assert not os.path.exists(os.path.join(root, '20230101-130000'))
+    assert os.path.isdir(os.path.join(root, experiments_aggregation.QUARANTINE_FOLDER, '20230101-130000'))
@@ -0,0 +1,60 @@
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+from utils import metrics_gazebo
+from utils.perfect_lap import Checkpoints
+
+
+def make_lap(seed=0):
+    """Perfect lap of a closed circuit and a noisy experiment started later on it, that leaves the road for a while."""
+    rng = np.random.default_rng(seed)
+    s = np.linspace(0, 2 * np.pi, 240, endpoint=False)
+    perfect_x = 40 * np.cos(s) + 5 * np.cos(3 * s)
+    perfect_y = 25 * np.sin(s)
+    checkpoints = Checkpoints({'pose.pose.position.x': perfect_x, 'pose.pose.position.y': perfect_y})
+    x = np.roll(perfect_x, -20) + rng.normal(0, 0.1, len(s))
+    y = np.roll(perfect_y, -20) + rng.normal(0, 0.1, len(s))
+    y[80:110] += 3 * np.sin(np.linspace(0, np.pi, 30))
+    return checkpoints, x, y
+
+
+def deviation_distances(get_distances, checkpoints, x, y):
+    """Distances in meters from every perfect lap point to the experiment spline, as matched by `get_distances`,
+    and the maximum distance between consecutive spline samples."""
+    t = np.arange(len(x))
+    spline_x = CubicSpline(t, x, bc_type='natural')
+    spline_y = CubicSpline(t, y, bc_type='natural')
+    start = int(np.argmin((x[0] - checkpoints.x) ** 2 + (y[0] - checkpoints.y) ** 2))
+    perfect_x = np.roll(checkpoints.x, -start)
+    perfect_y = np.roll(checkpoints.y, -start)
+    distances = np.log(get_distances(spline_x, spline_y, t[-1], perfect_x, perfect_y)) / np.log(1000)
+    samples_t = np.arange(0, t[-1], 1 / metrics_gazebo.POSITION_DEVIATION_SAMPLES_PER_POINT)
+    samples_distance = np.max(np.hypot(np.diff(spline_x(samples_t)), np.diff(spline_y(samples_t))))
+    return distances, samples_distance
+
+
+def test_spline_samples_distances_match_optimization():
+    checkpoints, x, y = make_lap()
+
+    distances, samples_distance = deviation_distances(
+        metrics_gazebo.get_position_deviation_distances_spline_samples, checkpoints, x, y)
+    expected, _ = deviation_distances(metrics_gazebo.get_position_deviation_distances_optimization, checkpoints, x, y)
+
+    assert len(distances) == len(expected)
+    # Close points are matched to a sample at most half the sampling step away from the closest point of the spline,
+    # far ones are refined on the continuous spline
+    far = expected > metrics_gazebo.POSITION_DEVIATION_REFINE_DISTANCE
+    assert far.any()
+    np.testing.assert_allclose(distances[~far], expected[~far], atol=samples_distance / 2)
+    np.testing.assert_allclose(distances[far], expected[far], atol=1e-6)
+
+
+def test_position_deviation_score_matches_optimization():
+    checkpoints, x, y = make_lap(seed=1)
+
+    metrics = metrics_gazebo.get_robot_position_deviation_score(checkpoints, x, y, {})
+    expected = metrics_gazebo.get_robot_position_deviation_score(checkpoints, x, y, {}, global_optimization=True)
+
+    np.testing.assert_allclose(metrics['position_deviation_mae'], expected['position_deviation_mae'], rtol=0.01)
+    np.testing.assert_allclose(metrics['position_deviation_total_err'], expected['position_deviation_total_err'],
+                               rtol=0.01)
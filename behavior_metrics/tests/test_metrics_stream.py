@@ -0,0 +1,94 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utils import metrics_carla
+from utils.metrics_stream import (CarlaMetricsStream, ODOMETRY_TOPIC, SPEEDOMETER_TOPIC, VEHICLE_STATUS_TOPIC,
+                                  COLLISION_TOPIC, LANE_INVASION_TOPIC, CLOCK_TOPIC)
+from utils.waypoint_index import WaypointIndex
+
+COMPARED_METRICS = (
+    'completed_distance', 'average_speed', 'collisions', 'lane_invasions', 'experiment_total_simulated_time',
+    'effective_completed_distance', 'position_deviation_mean', 'position_deviation_total_err',
+    'position_deviation_mean_per_km', 'collisions_per_km', 'lane_invasions_per_km',
+    'suddenness_distance_control_commands', 'suddenness_distance_control_command_per_km',
+    'suddenness_distance_speed',
+)
+
+
+def make_map_waypoints():
+    """Straight road with a waypoint every 0.5 m, with the attributes `metrics_carla` uses from `MapWaypoints`."""
+    x = np.arange(-50, 400, 0.5)
+    y = np.zeros_like(x)
+    return SimpleNamespace(x=x, y=y, index=WaypointIndex(x, y))
+
+
+def make_topics(carla_map, map_waypoints, seed=0):
+    """Recorded columns of a noisy drive along the road, as returned by `MetricsRecorder.stop`."""
+    rng = np.random.default_rng(seed)
+    n = 3000
+    t = np.sort(rng.uniform(0, 300, n))
+    t[100] = t[99]
+    x = np.cumsum(rng.uniform(0, 0.2, n))
+    y = rng.normal(0, 0.6, n)
+    # Recorded in the simulator frame, so the transformation to the map frame lands on the road
+    if carla_map == 'Carla/Maps/Town04':
+        x = -x
+    elif carla_map == 'Carla/Maps/Town02':
+        x = (map_waypoints.x.max() + map_waypoints.x.min()) - x
+    # The maps match the speeds to the odometry by message order, both are published at the same rate
+    speedometer_t = np.sort(t + rng.uniform(0, 0.01, n))
+    vehicle_status_t = np.sort(rng.uniform(0, 300, 500))
+    collision_t = np.sort(rng.uniform(0, 320, 40))
+    lane_invasion_t = np.sort(np.concatenate([rng.uniform(0, 320, 60), [collision_t[3] + 0.1]]))
+    return {
+        ODOMETRY_TOPIC: {'Time': t, 'pose.pose.position.x': x, 'pose.pose.position.y': y},
+        SPEEDOMETER_TOPIC: {'Time': speedometer_t, 'data': rng.uniform(0, 10, n)},
+        VEHICLE_STATUS_TOPIC: {
+            'Time': vehicle_status_t,
+            'control.throttle': rng.uniform(0, 1, 500),
+            'control.steer': rng.uniform(-1, 1, 500),
+            'control.brake': rng.uniform(0, 1, 500),
+        },
+        COLLISION_TOPIC: {'Time': collision_t, 'other_actor_id': rng.integers(1, 9, 40)},
+        LANE_INVASION_TOPIC: {'Time': lane_invasion_t},
+        CLOCK_TOPIC: {'Time': np.arange(0, 300.0), 'clock.secs': np.arange(10, 310)},
+    }
+
+
+def stream_topics(stream, topics):
+    """Feed the recorded messages to the stream in receive order, taking intermediate snapshots on the way."""
+    messages = []
+    for topic_order, (topic, columns) in enumerate(topics.items()):
+        fields = [field for field in columns if field != 'Time']
+        for i, timestamp in enumerate(columns['Time']):
+            messages.append((timestamp, topic_order, topic, {field: columns[field][i] for field in fields}))
+    messages.sort(key=lambda message: message[:2])
+    for i, (timestamp, topic_order, topic, row) in enumerate(messages):
+        stream.update(topic, timestamp, row)
+        if i % 1000 == 0:
+            stream.snapshot()
+    return stream.snapshot(final=True)
+
+
+@pytest.mark.parametrize('carla_map', ['Carla/Maps/Town02', 'Carla/Maps/Town04', 'Carla/Maps/Town05'])
+def test_final_snapshot_equals_batch_metrics(carla_map, tmp_path):
+    map_waypoints = make_map_waypoints()
+    topics = make_topics(carla_map, map_waypoints)
+
+    live_metrics = stream_topics(CarlaMetricsStream(map_waypoints, carla_map), topics)
+    experiment_metrics = {'carla_map': carla_map, 'experiment_model': 'model.h5'}
+    batch_metrics = metrics_carla.get_metrics(experiment_metrics, None, map_waypoints, str(tmp_path / 'experiment'),
+                                              SimpleNamespace(task='follow_lane'), topics=topics)
+
+    assert live_metrics['collisions'] > 0 and live_metrics['lane_invasions'] > 0
+    for key in COMPARED_METRICS:
+        assert math.isclose(live_metrics[key], batch_metrics[key], rel_tol=1e-12, abs_tol=1e-12), key
+    assert live_metrics['collision_actor_ids'] == batch_metrics['collision_actor_ids']
+    for key in live_metrics.keys() & batch_metrics.keys():
+        if isinstance(live_metrics[key], list):
+            assert live_metrics[key] == batch_metrics[key], key
+        else:
+            assert math.isclose(live_metrics[key], batch_metrics[key], rel_tol=1e-12, abs_tol=1e-12), key
@@ -0,0 +1,165 @@
+import glob
+import os
+import pickle
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from utils.waypoint_index import MapWaypoints, WaypointIndex
+
+WAYPOINTS_RESOLUTION = 0.5
+
+
+def make_waypoints(seed=0):
+    """Road-like waypoints every 0.5 m along three lanes, with duplicated waypoints, in shuffled order."""
+    rng = np.random.default_rng(seed)
+    s = np.arange(0, 200, WAYPOINTS_RESOLUTION)
+    x = np.concatenate([s, s, 100 + 30 * np.cos(s / 30)])
+    y = np.concatenate([np.zeros(len(s)), np.full(len(s), 3.5), 50 + 30 * np.sin(s / 30)])
+    duplicated = rng.choice(len(x), 50, replace=False)
+    x = np.concatenate([x, x[duplicated]])
+    y = np.concatenate([y, y[duplicated]])
+    order = rng.permutation(len(x))
+    return x[order], y[order]
+
+
+def make_trajectory(seed=0):
+    """Noisy drive along the first lane and the curve, plus points exactly between waypoints and far away."""
+    rng = np.random.default_rng(seed)
+    s = np.linspace(0, 190, 150)
+    x = np.concatenate([s, 100 + 30 * np.cos(s / 30)]) + rng.normal(0, 0.3, 2 * len(s))
+    y = np.concatenate([np.zeros(len(s)), 50 + 30 * np.sin(s / 30)]) + rng.normal(0, 0.3, 2 * len(s))
+    # Ties: equidistant to two waypoints of a lane, to the two lanes, to four waypoints and on a waypoint
+    ties_x = np.array([10.25, 10.0, 10.25, 20.0, 0.0])
+    ties_y = np.array([0.0, 1.75, 1.75, 0.0, 0.0])
+    far_x = np.array([1000.0, -500.0])
+    far_y = np.array([1000.0, 20.0])
+    return np.concatenate([x, ties_x, far_x]), np.concatenate([y, ties_y, far_y])
+
+
+def brute_force_nearest(waypoints_x, waypoints_y, points_x, points_y):
+    """Linear scan with the distance expression of the original loop, keeping the first waypoint on ties."""
+    indices = []
+    distances = []
+    for point_x, point_y in zip(points_x, points_y):
+        point_distances = np.sqrt((waypoints_x - point_x) ** 2 + (waypoints_y - point_y) ** 2)
+        index = int(np.argmin(point_distances))
+        indices.append(index)
+        distances.append(point_distances[index])
+    return np.array(indices), np.array(distances)
+
+
+def original_match(waypoints_x, waypoints_y, points_x, points_y):
+    """Copy of the original point-by-point loop of `get_position_deviation_and_effective_completed_distance`."""
+    map_waypoints_tuples = list(zip(waypoints_x.tolist(), waypoints_y.tolist()))
+    checkpoints_tuples = list(zip(points_x.tolist(), points_y.tolist()))
+    min_dists = []
+    best_checkpoint_points_x = []
+    best_checkpoint_points_y = []
+
+    covered_checkpoints = []
+    for error_counter, checkpoint in enumerate(checkpoints_tuples):
+        min_dist = 100
+        for x, perfect_checkpoint in enumerate(map_waypoints_tuples):
+            point_1 = np.array([checkpoint[0], checkpoint[1]])
+            point_2 = np.array([perfect_checkpoint[0], perfect_checkpoint[1]])
+            dist = (point_2 - point_1) ** 2
+            dist = np.sum(dist, axis=0)
+            dist = np.sqrt(dist)
+            if dist < min_dist:
+                min_dist = dist
+                best_checkpoint = x
+                best_checkpoint_point_x = point_2[0]
+                best_checkpoint_point_y = point_2[1]
+        best_checkpoint_points_x.append(best_checkpoint_point_x)
+        best_checkpoint_points_y.append(best_checkpoint_point_y)
+        if min_dist < 100:
+            min_dists.append(min_dist)
+            if len(covered_checkpoints) == 0 or (len(covered_checkpoints) > 0 and covered_checkpoints[len(covered_checkpoints)-1][0] != best_checkpoint_point_x and covered_checkpoints[len(covered_checkpoints)-1][1] != best_checkpoint_point_y):
+                if min_dist < 1:
+                    covered_checkpoints.append((best_checkpoint_point_x, best_checkpoint_point_y))
+    return min_dists, best_checkpoint_points_x, best_checkpoint_points_y, covered_checkpoints
+
+
+def test_nearest_matches_brute_force():
+    waypoints_x, waypoints_y = make_waypoints()
+    points_x, points_y = make_trajectory()
+
+    indices, distances = WaypointIndex(waypoints_x, waypoints_y).nearest(points_x, points_y)
+    expected_indices, expected_distances = brute_force_nearest(waypoints_x, waypoints_y, points_x, points_y)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_array_equal(distances, expected_distances)
+
+
+def test_nearest_breaks_ties_towards_the_lowest_index():
+    waypoints_x = np.array([1.0, -1.0, 0.0, 1.0, 0.0])
+    waypoints_y = np.array([0.0, 0.0, 1.0, 0.0, -1.0])
+
+    indices, distances = WaypointIndex(waypoints_x, waypoints_y).nearest([0.0, 1.0], [0.0, 0.0])
+
+    np.testing.assert_array_equal(indices, [0, 0])
+    np.testing.assert_array_equal(distances, [1.0, 0.0])
+
+
+def test_nearest_without_points():
+    indices, distances = WaypointIndex(*make_waypoints()).nearest([], [])
+
+    assert len(indices) == 0 and len(distances) == 0
+
+
+def test_match_equals_original_loop():
+    waypoints_x, waypoints_y = make_waypoints()
+    points_x, points_y = make_trajectory()
+
+    min_dists, best_x, best_y, covered = WaypointIndex(waypoints_x, waypoints_y).match(points_x, points_y)
+    expected_min_dists, expected_best_x, expected_best_y, expected_covered = original_match(
+        waypoints_x, waypoints_y, points_x, points_y)
+
+    assert min_dists == expected_min_dists
+    np.testing.assert_array_equal(best_x, expected_best_x)
+    np.testing.assert_array_equal(best_y, expected_best_y)
+    assert covered == expected_covered
+    # Position deviation and effective completed distance, as computed from the matches
+    assert sum(min_dists) / len(min_dists) == sum(expected_min_dists) / len(expected_min_dists)
+    assert len(covered) * 0.5 == len(expected_covered) * 0.5
+    assert len(covered) > 0 and len(min_dists) < len(points_x)
+
+
+def cached_map_waypoints(cache_dir, waypoints_x, waypoints_y):
+    """`MapWaypoints` of a map whose waypoints are already in the cache."""
+    map_waypoints = MapWaypoints('Carla/Maps/Town04', WAYPOINTS_RESOLUTION, cache_dir=cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(map_waypoints.waypoints_filename, np.stack((waypoints_x, waypoints_y)))
+    return map_waypoints
+
+
+def test_map_waypoints_index_is_cached_per_waypoints(tmp_path):
+    cache_dir = str(tmp_path)
+    waypoints_x, waypoints_y = make_waypoints()
+
+    index = cached_map_waypoints(cache_dir, waypoints_x, waypoints_y).index
+    index_filenames = glob.glob(os.path.join(cache_dir, '*_index.pkl'))
+    cached_index = MapWaypoints('Carla/Maps/Town04', WAYPOINTS_RESOLUTION, cache_dir=cache_dir).index
+    # Same number of waypoints, different positions
+    moved_index = cached_map_waypoints(cache_dir, waypoints_x + 1, waypoints_y).index
+
+    assert len(index_filenames) == 1
+    np.testing.assert_array_equal(cached_index.tree.data, index.tree.data)
+    assert len(glob.glob(os.path.join(cache_dir, '*_index.pkl'))) == 2
+    np.testing.assert_array_equal(moved_index.tree.data, np.column_stack((waypoints_x + 1, waypoints_y)))
+
+
+def test_map_waypoints_rebuilds_an_index_of_other_waypoints(tmp_path):
+    cache_dir = str(tmp_path)
+    waypoints_x, waypoints_y = make_waypoints()
+    cached_map_waypoints(cache_dir, waypoints_x, waypoints_y).index
+    index_filename, = glob.glob(os.path.join(cache_dir, '*_index.pkl'))
+    with open(index_filename, 'wb') as f:
+        pickle.dump(cKDTree(np.column_stack((waypoints_y, waypoints_x))), f)
+
+    index = MapWaypoints('Carla/Maps/Town04', WAYPOINTS_RESOLUTION, cache_dir=cache_dir).index
+
+    np.testing.assert_array_equal(index.tree.data, np.column_stack((waypoints_x, waypoints_y)))
+    with open(index_filename, 'rb') as f:
+        np.testing.assert_array_equal(pickle.load(f).data, np.column_stack((waypoints_x, waypoints_y)))
@@ -274,7 +274,7 @@ class ClickableQFrame(QGroupBox):
 
     confirm = pyqtSignal()
 
-    def __init__(self, frame_id, data='rgbimage', parent=None):
+    def __init__(self, frame_id, data='rgbimage', parent=None, refresh_rate=None):
         """Constructor of the class
 
         Arguments:
@@ -283,6 +283,7 @@ class ClickableQFrame(QGroupBox):
         Keyword Arguments:
             data {str} -- Identificator of the data type (could be 'depthimage, laser and pose) (default: {'rgbimage'})
             parent {ui.gui.views.main_view.MainView} -- Parent of this widget (default: {None})
+            refresh_rate {float} -- Maximum redraws per second of the frame (default: {None}, the widget default)
         """
 
         QGroupBox.__init__(self)
@@ -297,6 +298,7 @@ class ClickableQFrame(QGroupBox):
         self.confirm.connect(self.create_widget)
         self.widget = None
         self.keep_ratio = False
+        self.refresh_rate = refresh_rate
 
         self.lay = QHBoxLayout()
         self.frame_config = FrameConfig(self)
@@ -315,12 +317,14 @@ class ClickableQFrame(QGroupBox):
         and so on.
         """
         self.scroll.hide()
+        widget_kwargs = {'refresh_rate': self.refresh_rate} if self.refresh_rate else {}
         if self.data_type == 'rgbimage':
-            self.widget = CameraWidget(self.objectName(), self.width(), self.height(), self.keep_ratio, self.parent)
+            self.widget = CameraWidget(self.objectName(), self.width(), self.height(), self.keep_ratio, self.parent,
+                                       **widget_kwargs)
         elif self.data_type == 'depthimage':
             pass
         elif self.data_type == 'laser':
-            self.widget = LaserWidgetPro(self.objectName(), self.width(), self.height(), self.parent)
+            self.widget = LaserWidgetPro(self.objectName(), self.width(), self.height(), self.parent, **widget_kwargs)
         elif self.data_type == 'pose':
             # TODO: implement pose3D widget
             pass
@@ -377,7 +381,8 @@ class LayoutMatrix(QWidget):
         else:
             layout = configuration.layout
             for frame in layout:
-                sensor_frame = ClickableQFrame(frame, data=layout[frame][1], parent=self.parent)
+                sensor_frame = ClickableQFrame(frame, data=layout[frame][1], parent=self.parent,
+                                               refresh_rate=configuration.layout_refresh_rates.get(frame))
                 c = layout[frame][0]
                 self.main_layout.addWidget(sensor_frame, c[0], c[1], c[2], c[3])
 
@@ -439,7 +444,7 @@ class MainView(QWidget):
         return self.matrix.findChild(ClickableQFrame, frame_id)
 
     def update_gui(self):
-        """Update GUI with the GUI's refresh loop"""
+        """Update GUI with the GUI's refresh timer, only the frames with new data are redrawn"""
         self.matrix.update()
 
     def change_frame_name(self, old, new):
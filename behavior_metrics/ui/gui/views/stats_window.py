@@ -1,5 +1,22 @@
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import (QLabel, QVBoxLayout, QWidget, QMainWindow)
 
+# The live metrics are refreshed from the GUI thread at 2 Hz, the pilot thread never waits for them
+LIVE_STATS_REFRESH_MS = 500
+LIVE_STATS_METRICS = [
+    ('completed_distance', 'Completed distance', ' m'),
+    ('effective_completed_distance', 'Effective completed distance', ' m'),
+    ('experiment_total_simulated_time', 'Experiment total simulated time', ' s'),
+    ('average_speed', 'Average speed', ' km/h'),
+    ('max_speed', 'Max speed', ' km/h'),
+    ('collisions', 'Collisions', ''),
+    ('lane_invasions', 'Lane invasions', ''),
+    ('position_deviation_mean', 'Position deviation mean', ' m'),
+    ('position_deviation_max', 'Position deviation max', ' m'),
+    ('suddenness_distance_control_commands', 'Suddenness distance control commands', ''),
+    ('suddenness_distance_speed', 'Suddenness distance speed', ''),
+]
+
 
 class StatsWindow(QMainWindow):
     def __init__(self, parent=None, controller=None):
@@ -138,4 +155,38 @@ class CARLAStatsWindow(QMainWindow):
             self.great_distance_pct_km = QLabel("Percentage of great distance per km -> " + str(self.controller.experiment_metrics['great_distance_pct_km']))
             self.layout.addWidget(self.great_distance_pct_km)
 
-        wid.setLayout(self.layout)
\ No newline at end of file
+        wid.setLayout(self.layout)
+
+
+class CARLALiveStatsWindow(QMainWindow):
+    """Metrics of the CARLA experiment being recorded, refreshed periodically from `controller.get_live_metrics`."""
+
+    def __init__(self, parent=None, controller=None):
+        super(CARLALiveStatsWindow, self).__init__(parent)
+
+        self.controller = controller
+        self.setWindowTitle("Live metrics")
+        wid = QWidget(self)
+        self.setCentralWidget(wid)
+
+        self.layout = QVBoxLayout()
+        self.metric_labels = {}
+        for key, title, unit in LIVE_STATS_METRICS:
+            self.metric_labels[key] = QLabel()
+            self.layout.addWidget(self.metric_labels[key])
+        wid.setLayout(self.layout)
+        self.update_metrics()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_metrics)
+        self.timer.start(LIVE_STATS_REFRESH_MS)
+
+    def update_metrics(self):
+        metrics = self.controller.get_live_metrics() or {}
+        for key, title, unit in LIVE_STATS_METRICS:
+            value = '{:.2f}'.format(metrics[key]) + unit if key in metrics else '-'
+            self.metric_labels[key].setText(title + " -> " + value)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super(CARLALiveStatsWindow, self).closeEvent(event)
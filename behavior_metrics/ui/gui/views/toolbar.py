@@ -25,7 +25,7 @@ from PyQt5.QtWidgets import (QButtonGroup, QCheckBox, QComboBox, QFileDialog,
                              QPushButton, QScrollArea, QSpacerItem,
                              QVBoxLayout, QWidget)
 
-from ui.gui.views.stats_window import StatsWindow, CARLAStatsWindow
+from ui.gui.views.stats_window import StatsWindow, CARLAStatsWindow, CARLALiveStatsWindow
 from ui.gui.views.logo import Logo
 from ui.gui.views.social import SocialMedia
 from utils import constants, environment, controller_carla
@@ -281,6 +281,7 @@ class Toolbar(QWidget):
         self.configuration = configuration
         self.controller = controller
         self.parent = parent
+        self.live_stats_window = None
         self.setFixedSize(self.windowsize)
         self.initUI()
 
@@ -599,7 +600,9 @@ class Toolbar(QWidget):
             self.recording_stats_label.show()
             self.recording_stats_animation_label.show()
             if type(self.controller) == controller_carla.ControllerCarla:
-                self.controller.record_metrics(dirname)
+                self.controller.record_metrics(dirname, live_metrics=True)
+                self.live_stats_window = CARLALiveStatsWindow(self, self.controller)
+                self.live_stats_window.show()
             else:
                 self.controller.record_metrics(filename, dirname)
         else:
@@ -613,6 +616,9 @@ class Toolbar(QWidget):
         self.recording_stats_animation_label.stop_animation()
         self.recording_stats_animation_label.hide()
         self.recording_stats_label.hide()
+        if self.live_stats_window is not None:
+            self.live_stats_window.close()
+            self.live_stats_window = None
         self.controller.stop_recording_metrics()
 
         if type(self.controller) == controller_carla.ControllerCarla:
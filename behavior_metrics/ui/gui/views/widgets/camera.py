@@ -12,8 +12,11 @@ You should have received a copy of the GNU General Public License along with
 this program. If not, see <http://www.gnu.org/licenses/>.
 """
 
+import time
 from threading import Lock
 
+import cv2
+import numpy as np
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget
@@ -22,13 +25,21 @@ __author__ = 'fqez'
 __contributors__ = []
 __license__ = 'GPLv3'
 
+# Maximum redraws per second of a camera frame
+DEFAULT_REFRESH_RATE = 15
+
 
 class CameraWidget(QWidget):
-    """Class that defines a Qt widget to show an image in a frame."""
+    """Class that defines a Qt widget to show an image in a frame.
+
+    The image is only redrawn when a new one arrives, at most `refresh_rate` times per second. It is downscaled to the
+    frame size with OpenCV, into a buffer reused between redraws, before building the QImage.
+    """
 
     signal_update = pyqtSignal()
 
-    def __init__(self, frame_id, parent_width, parent_height, keep_ratio, parent=None):
+    def __init__(self, frame_id, parent_width, parent_height, keep_ratio, parent=None,
+                 refresh_rate=DEFAULT_REFRESH_RATE):
         """Constructor of the class
 
         Arguments:
@@ -39,6 +50,7 @@ class CameraWidget(QWidget):
 
         Keyword Arguments:
             parent {ui.gui.views.main_view.MainView} -- Parent of this widget (default: {None})
+            refresh_rate {float} -- Maximum redraws per second (default: {DEFAULT_REFRESH_RATE})
         """
         QWidget.__init__(self, parent)
         self.parent = parent
@@ -49,6 +61,10 @@ class CameraWidget(QWidget):
         self.parent_width = parent_width
         self.parent_height = parent_height
         self.lock_update = Lock()
+        self.refresh_period = 1 / refresh_rate
+        self.next_refresh = 0
+        self.shown_seq = 0
+        self.buffer = None
         self.initUI()
 
     def initUI(self):
@@ -66,18 +82,29 @@ class CameraWidget(QWidget):
         self.main_layout.addWidget(self.image_label)
         self.setLayout(self.main_layout)
 
+    def scaled_size(self, width, height):
+        """Size of the image drawn in the frame, never bigger than the image itself (the label scales it up)."""
+        if self.keep_ratio:
+            scale = min(self.parent_width / width, self.parent_height / height, 1)
+            return max(int(width * scale), 1), max(int(height * scale), 1)
+        return min(self.parent_width, width), min(self.parent_height, height)
+
     def update(self):
         """Update the widget with the GUI loop"""
 
-        image = self.parent.controller.get_data(self.id)
-        if image is not None:
-            with self.lock_update:
-                im = QImage(image.data, image.shape[1], image.shape[0], QImage.Format_RGB888)
-                pixmap = QPixmap.fromImage(im)
-                scale_width = self.parent_width
-                scale_height = self.parent_height
-                if self.keep_ratio:
-                    pixmap = pixmap.scaled(scale_width, scale_height, Qt.KeepAspectRatio)
-                else:
-                    pixmap = pixmap.scaled(scale_width, scale_height)
-                self.image_label.setPixmap(pixmap)
+        now = time.perf_counter()
+        if now < self.next_refresh:
+            return
+        seq, image = self.parent.controller.get_frame(self.id)
+        if image is None or seq == self.shown_seq:
+            return
+        self.shown_seq = seq
+        self.next_refresh = now + self.refresh_period
+        with self.lock_update:
+            width, height = self.scaled_size(image.shape[1], image.shape[0])
+            if self.buffer is None or self.buffer.shape[:2] != (height, width):
+                self.buffer = np.empty((height, width, 3), dtype=np.uint8)
+            cv2.resize(image, (width, height), dst=self.buffer, interpolation=cv2.INTER_AREA)
+            im = QImage(self.buffer.data, width, height, 3 * width, QImage.Format_RGB888)
+            # fromImage copies the pixels, so the buffer can be reused for the next image
+            self.image_label.setPixmap(QPixmap.fromImage(im))
@@ -13,6 +13,7 @@ this program. If not, see <http://www.gnu.org/licenses/>.
 """
 
 import math
+import time
 
 from PyQt5.QtCore import QPointF, Qt
 from PyQt5.QtGui import QPainter, QPen
@@ -22,11 +23,14 @@ __author__ = 'fqez'
 __contributors__ = []
 __license__ = 'GPLv3'
 
+# Maximum redraws per second of a laser frame
+DEFAULT_REFRESH_RATE = 10
+
 
 class LaserWidgetPro(QFrame):
     """Class that defines a Qt widget to show laser data in a frame."""
 
-    def __init__(self, frame_id, parent_width, parent_height, parent=None):
+    def __init__(self, frame_id, parent_width, parent_height, parent=None, refresh_rate=DEFAULT_REFRESH_RATE):
         """Constructor of the class
 
         Arguments:
@@ -36,9 +40,13 @@ class LaserWidgetPro(QFrame):
 
         Keyword Arguments:
             parent {ui.gui.views.main_view.MainView} -- Parent of this widget (default: {None})
+            refresh_rate {float} -- Maximum redraws per second (default: {DEFAULT_REFRESH_RATE})
         """
         QFrame.__init__(self)
         self.laser_data = None
+        self.refresh_period = 1 / refresh_rate
+        self.next_refresh = 0
+        self.shown_seq = 0
         self.id = frame_id
         self._width = parent_width
         self._height = parent_height
@@ -46,10 +54,22 @@ class LaserWidgetPro(QFrame):
         self.setStyleSheet('background-color: rgb(51,51,51)')
         self.resize(self._width, self._height)
 
+    def update(self):
+        """Schedule a repaint with the GUI loop when new laser data arrives, at most refresh_rate times per second"""
+        now = time.perf_counter()
+        if now < self.next_refresh:
+            return
+        seq, laser_data = self.parent.controller.get_frame(self.id)
+        if seq == self.shown_seq:
+            return
+        self.shown_seq = seq
+        self.laser_data = laser_data
+        self.next_refresh = now + self.refresh_period
+        QFrame.update(self)
+
     def paintEvent(self, event):
-        """Update the frame with all the new laser information. Updated with the GUI loop"""
+        """Update the frame with all the new laser information."""
 
-        self.laser_data = self.parent.controller.get_data(self.id)
         _width = self.width()
         _height = self.height()
 
@@ -17,7 +17,6 @@ this program. If not, see <http://www.gnu.org/licenses/>.
 
 import datetime
 import sys
-import time
 
 from PyQt5.QtCore import QPropertyAnimation, QSize, QTimer, pyqtSignal
 # from PyQt5.QtGui import QMovie
@@ -25,7 +24,6 @@ from PyQt5.QtWidgets import (QApplication, QDesktopWidget, QFrame,
                              QGraphicsOpacityEffect, QLabel, QMainWindow,
                              QVBoxLayout, QWidget)
 
-from ui.gui.threadGUI import ThreadGUI
 from ui.gui.views.layout_selection import LayoutSelection
 from ui.gui.views.main_view import MainView
 from ui.gui.views.title import TitleWindow
@@ -36,6 +34,10 @@ __license__ = 'GPLv3'
 
 WIDTH = 1500
 HEIGHT = 1000
+# Period of the timer that refreshes the frames, each frame caps its own redraw rate
+REFRESH_TICK_MS = 20
+# Period of the status bar clock
+CLOCK_TICK_MS = 500
 
 
 class VLine(QFrame):
@@ -76,7 +78,7 @@ class ParentWindow(QMainWindow):
         self.init_statusbar()
 
         self.timer = QTimer()
-        self.timer.setInterval(100)
+        self.timer.setInterval(CLOCK_TICK_MS)
         self.timer.timeout.connect(self.recurring_timer)
         self.timer.start()
 
@@ -119,7 +121,6 @@ class ParentWindow(QMainWindow):
     def closeEvent(self, event):
         """Helper function to safe kill the application without segments violation"""
         self.closing = True
-        time.sleep(0.2)
         event.accept()
 
 
@@ -150,8 +151,10 @@ class ViewsController(QMainWindow):
         self.controller = controller
         self.configuration = configuration
         self.main_view = None
-        self.thread_gui = ThreadGUI(self)
-        self.thread_gui.daemon = True
+        # The frames are refreshed from the Qt event loop, so the widgets are only touched from the GUI thread
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_TICK_MS)
+        self.refresh_timer.timeout.connect(self.update_gui)
 
     def show_title(self):
         """Shows the title view"""
@@ -210,11 +213,11 @@ class ViewsController(QMainWindow):
         self.main_view = MainView(layout_configuration, self.configuration, self.controller, self.parent)
         self.parent.main_layout.addWidget(self.main_view)
         self.fadein_animation()
-        self.start_thread()
+        self.start_refresh()
 
-    def start_thread(self):
-        """Start the GUI refresing loop"""
-        self.thread_gui.start()
+    def start_refresh(self):
+        """Start the GUI refresing timer"""
+        self.refresh_timer.start()
 
     def fadein_animation(self):
         """Start a fadein animation for views transitions"""
@@ -242,11 +245,11 @@ class ViewsController(QMainWindow):
         del self.animation
 
     def update_gui(self):
-        """Update the GUI. Called from the refresing loop thread"""
-        while not self.parent.closing:
-            if self.main_view:
-                self.main_view.update_gui()
-            time.sleep(0.1)
+        """Update the GUI. Called by the refresing timer"""
+        if self.parent.closing:
+            self.refresh_timer.stop()
+        elif self.main_view:
+            self.main_view.update_gui()
 
 
 def delete_widgets_from(layout):
@@ -272,8 +275,4 @@ if __name__ == '__main__':
     views_controller = ViewsController(main_window)
     views_controller.show_title()
 
-    # th = ThreadGUI(main_window)
-    # th.daemon = True
-    # th.start()
-
     sys.exit(app.exec_())
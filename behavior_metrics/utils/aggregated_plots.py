@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+"""This module renders the aggregated experiments figures.
+
+Figures are independent of each other, so they are rendered in a process pool. Every worker draws with the Agg
+backend on a single figure that is cleared between plots instead of creating a new one each time.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import pandas as pd
+import matplotlib.pyplot as plt
+import matplotlib.patches as mpatches
+
+from concurrent.futures import ProcessPoolExecutor
+from utils.logger import logger
+
+# Kinds of aggregated figures: one bar plot per metric with all the experiments, one bar plot per metric and model
+# and one boxplot per metric grouped by model and map
+PLOT_KINDS = ('experiments', 'models', 'boxplot')
+FIGURE_SIZE = (40, 10)
+
+MAPS_COLORS = {
+    'Carla/Maps/Town01': 'red',
+    'Carla/Maps/Town02': 'green',
+    'Carla/Maps/Town03': 'blue',
+    'Carla/Maps/Town04': 'grey',
+    'Carla/Maps/Town05': 'black',
+    'Carla/Maps/Town06': 'pink',
+    'Carla/Maps/Town07': 'orange',
+}
+
+_figure = None
+
+
+def get_color_handles():
+    return [mpatches.Patch(color=color, label='Map0' + carla_map[-1]) for carla_map, color in MAPS_COLORS.items()]
+
+
+def _init_worker():
+    plt.switch_backend('Agg')
+
+
+def _get_figure():
+    # One figure per process, cleared for every plot
+    global _figure
+    if _figure is None:
+        _figure = plt.figure(figsize=FIGURE_SIZE)
+    _figure.clf()
+    _figure.set_size_inches(FIGURE_SIZE)
+    return _figure
+
+
+def plot_bar(values, colors, title, filename):
+    """Bar plot of a metric, one bar per experiment colored by map."""
+    fig = _get_figure()
+    ax = fig.add_subplot()
+    values.plot.bar(ax=ax, color=colors)
+    ax.set_title(title)
+    fig.tight_layout()
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.legend(handles=get_color_handles())
+    fig.savefig(filename)
+
+
+def plot_boxplot(experiments, metric, title, filename):
+    """Boxplot of a metric for every model and map.
+
+    Arguments:
+        experiments {pd.DataFrame} -- `experiment_model`, `carla_map` and `metric` columns of the experiments
+    """
+    fig = _get_figure()
+    ax = fig.add_subplot()
+    dataframes = []
+    max_value = 0
+    for model_name in experiments['experiment_model'].unique():
+        for carla_map in experiments['carla_map'].unique():
+            com_dict = {
+                'model_name': model_name,
+                model_name + '-' + carla_map: experiments.loc[(experiments['experiment_model'] == model_name) & (experiments['carla_map'] == carla_map)][metric].tolist(),
+                'carla_map': carla_map
+            }
+            df = pd.DataFrame(data=com_dict)
+            dataframes.append(df)
+            if df[model_name + '-' + carla_map].max() > max_value:
+                max_value = df[model_name + '-' + carla_map].max()
+
+    full_list = []
+    colors = []
+    for carla_map in experiments['carla_map'].unique().tolist():
+        for experiment_model in experiments['experiment_model'].unique().tolist():
+            full_list.append(experiment_model + '-' + carla_map)
+            colors.append(MAPS_COLORS[carla_map])
+
+    result_by_experiment_model = pd.concat(dataframes)
+    ax, props = result_by_experiment_model.boxplot(column=full_list, ax=ax, showfliers=True, sym='k.',
+                                                   return_type='both', patch_artist=True)
+    ax.set_title(title)
+    for patch, color in zip(props['boxes'], colors):
+        patch.set_facecolor(color)
+    ax.legend(handles=get_color_handles())
+    ax.tick_params(axis='x', labelrotation=90)
+    if max_value > 0:
+        ax.set_ylim(0, max_value + max_value * 0.1)
+    fig.savefig(filename, bbox_inches='tight')
+
+
+def _render(task):
+    function, args = task
+    try:
+        function(*args)
+    except Exception as ex:
+        logger.info('Could not render {}: {}'.format(args[-1], ex))
+        return False
+    return True
+
+
+def get_plot_tasks(result, output_dir, experiments_metrics_and_titles, kinds=PLOT_KINDS):
+    """List the figures to render as (function, arguments) tuples.
+
+    Metrics that are not in `result` are skipped.
+    """
+    tasks = []
+    metrics_and_titles = []
+    for experiment_metric_and_title in experiments_metrics_and_titles:
+        if experiment_metric_and_title['metric'] in result.columns:
+            metrics_and_titles.append(experiment_metric_and_title)
+        else:
+            logger.info('Metric {} not found in the experiments, skipping its plots'.format(experiment_metric_and_title['metric']))
+
+    if 'experiments' in kinds:
+        colors = [MAPS_COLORS[carla_map] for carla_map in result['carla_map']]
+        for experiment_metric_and_title in metrics_and_titles:
+            metric = experiment_metric_and_title['metric']
+            tasks.append((plot_bar, (result[metric], colors, experiment_metric_and_title['title'],
+                                     os.path.join(output_dir, metric + '.png'))))
+
+    if 'models' in kinds:
+        for experiment_model in result['experiment_model'].unique():
+            model_experiments = result.loc[result['experiment_model'].eq(experiment_model)]
+            colors = [MAPS_COLORS[carla_map] for carla_map in model_experiments['carla_map']]
+            model_name = experiment_model.split('/')[-1]
+            for experiment_metric_and_title in metrics_and_titles:
+                metric = experiment_metric_and_title['metric']
+                tasks.append((plot_bar, (model_experiments[metric], colors,
+                                         experiment_metric_and_title['title'] + ' with ' + experiment_model,
+                                         os.path.join(output_dir, model_name + '_' + metric + '.png'))))
+
+    if 'boxplot' in kinds:
+        for experiment_metric_and_title in metrics_and_titles:
+            metric = experiment_metric_and_title['metric']
+            tasks.append((plot_boxplot, (result[['experiment_model', 'carla_map', metric]], metric,
+                                         experiment_metric_and_title['title'] + ' boxplot',
+                                         os.path.join(output_dir, metric + '_boxplot.png'))))
+    return tasks
+
+
+def render_aggregated_metrics(result, output_dir, experiments_metrics_and_titles, kinds=PLOT_KINDS, jobs=None):
+    """Render the aggregated experiments figures.
+
+    Arguments:
+        result {pd.DataFrame} -- Aggregated metrics, one row per experiment
+        output_dir {str} -- Directory where the figures are saved
+        experiments_metrics_and_titles {list} -- `metric` and `title` of every metric to plot
+        kinds {iterable} -- Kinds of figures to render, see `PLOT_KINDS`
+        jobs {int} -- Number of worker processes (number of CPUs by default). With 1 the figures are rendered in
+        the calling process.
+
+    Returns:
+        int -- Number of figures rendered
+    """
+    tasks = get_plot_tasks(result, output_dir, experiments_metrics_and_titles, kinds)
+    if not tasks:
+        return 0
+    if jobs == 1:
+        backend = plt.get_backend()
+        _init_worker()
+        try:
+            rendered = [_render(task) for task in tasks]
+        finally:
+            global _figure
+            if _figure is not None:
+                plt.close(_figure)
+                _figure = None
+            plt.switch_backend(backend)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+            rendered = list(executor.map(_render, tasks, chunksize=max(1, len(tasks) // (4 * (jobs or os.cpu_count() or 1)))))
+    logger.info('Rendered {} of {} aggregated figures in {}'.format(sum(rendered), len(tasks), output_dir))
+    return sum(rendered)
@@ -20,6 +20,8 @@ import yaml
 
 from utils.colors import Colors
 from utils.constants import ROOT_PATH
+from utils.frame_sink import DEFAULT_VIDEO_RATE
+from utils.pilot_scheduler import DEFAULT_PILOT_EVENT_SENSOR, DEFAULT_PILOT_SCHEDULER
 
 __author__ = 'fqez'
 __contributors__ = []
@@ -76,11 +78,16 @@ class Config:
 
         self.current_world = None
         self.layout = {}
+        self.layout_refresh_rates = {}
 
         self.dataset_in = None
         self.dataset_out = None
 
         self.stats_out = None
+        self.stats_aggregated_metrics = None
+        self.stats_aggregated_plots = None
+        self.stats_plots_jobs = None
+        self.stats_metrics_workers = 0
 
         self.experiment_timeouts = None
 
@@ -130,17 +137,34 @@ class Config:
             self.real_time_update_rate = 1000
         if 'AsyncMode' in robot:
             self.async_mode = robot['AsyncMode']
+        self.pilot_scheduler = robot.get('PilotScheduler', DEFAULT_PILOT_SCHEDULER)
+        self.pilot_event_sensor = robot.get('PilotEventSensor', DEFAULT_PILOT_EVENT_SENSOR)
 
         self.actuators = robot['Actuators']
         self.sensors = robot['Sensors']
 
         self.layout = self.create_layout_from_cfg(config_data['Behaviors']['Layout'])
+        # Maximum redraws per second of each GUI frame, the frames without one use the default of their widget
+        self.layout_refresh_rates = {frame['Name']: frame['RefreshRate']
+                                     for frame in config_data['Behaviors']['Layout'].values() if 'RefreshRate' in frame}
 
         self.dataset_in = config_data['Behaviors']['Dataset']['In']
         self.dataset_out = config_data['Behaviors']['Dataset']['Out']
 
         self.stats_out = config_data['Behaviors']['Stats']['Out']
         self.stats_perfect_lap = config_data['Behaviors']['Stats']['PerfectLap']
+        # Aggregated experiments figures: metrics and kinds of plots to render (all by default) and plotting processes
+        self.stats_aggregated_metrics = config_data['Behaviors']['Stats'].get('AggregatedMetrics', None)
+        self.stats_aggregated_plots = config_data['Behaviors']['Stats'].get('AggregatedPlots', None)
+        self.stats_plots_jobs = config_data['Behaviors']['Stats'].get('PlotsJobs', None)
+        # Processes computing the metrics of the finished experiments while the next ones run (opt-in, by default
+        # they are computed at the end of each experiment)
+        self.stats_metrics_workers = config_data['Behaviors']['Stats'].get('MetricsWorkers', 0)
+        # The metrics are recorded in memory, the bag of the metrics topics is only written for archival
+        self.stats_record_bag = config_data['Behaviors']['Stats'].get('RecordBag', True)
+        # In script mode the frames are not shown, one of them can be recorded to a low rate video instead
+        self.stats_frames_video = config_data['Behaviors']['Stats'].get('FramesVideo', None)
+        self.stats_frames_video_rate = config_data['Behaviors']['Stats'].get('FramesVideoRate', DEFAULT_VIDEO_RATE)
 
         self.brain_kwargs = {}
 
@@ -251,3 +275,5 @@ class Config:
             new {str} -- New name for the frame
         """
         self.layout[new] = self.layout.pop(old)
+        if old in self.layout_refresh_rates:
+            self.layout_refresh_rates[new] = self.layout_refresh_rates.pop(old)
@@ -149,4 +149,5 @@ CARLA_INFRACTION_PENALTIES = {
     'wrong_turn': 0.7,
     'time_out': 0.7,
     'red_light': 0.7
-}
\ No newline at end of file
+}
+CARLA_MAPS_WAYPOINTS_CACHE_DIR = ROOT_PATH + '/carla_maps_waypoints/cache/'
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+"""This module contains the speed and control command smoothness statistics.
+
+The same statistics are available as a batch computation over whole recordings (used by the metrics) and as an
+incremental accumulator that can be fed sample by sample from a live stream. Both produce the same values.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+import numpy as np
+
+
+def _mean(values):
+    # Accumulated in order, like the incremental version, so both give the same result
+    return sum(values.tolist()) / len(values)
+
+
+def speed_smoothness(speeds):
+    """Speed statistics of a recording.
+
+    Arguments:
+        speeds {array_like} -- Speed samples in km/h
+
+    Returns:
+        dict -- `average_speed`, `suddenness_distance_speed`, `max_speed` and `min_speed`
+    """
+    speeds = np.asarray(speeds, dtype=np.float64)
+    suddenness = np.abs(np.diff(speeds, prepend=0))
+    return {
+        'average_speed': _mean(speeds),
+        'suddenness_distance_speed': _mean(suddenness),
+        'max_speed': float(np.max(speeds)),
+        'min_speed': float(np.min(speeds)),
+    }
+
+
+def control_smoothness(throttle, steer, brake):
+    """Suddenness of the control commands of a recording.
+
+    The suddenness of a command is the mean absolute change between consecutive samples (the first one is compared
+    with 0). The joint suddenness uses the L2 norm of the change of the three commands.
+
+    Arguments:
+        throttle {array_like} -- Throttle commands
+        steer {array_like} -- Steer commands
+        brake {array_like} -- Brake commands
+
+    Returns:
+        dict -- `suddenness_distance_control_commands`, `suddenness_distance_throttle`,
+        `suddenness_distance_steer` and `suddenness_distance_brake_command`
+    """
+    commands = np.vstack((throttle, steer, brake)).astype(np.float64)
+    differences = np.diff(commands, axis=1, prepend=0)
+    suddenness = np.abs(differences)
+    return {
+        'suddenness_distance_control_commands': _mean(np.sqrt(np.sum(differences ** 2, axis=0))),
+        'suddenness_distance_throttle': _mean(suddenness[0]),
+        'suddenness_distance_steer': _mean(suddenness[1]),
+        'suddenness_distance_brake_command': _mean(suddenness[2]),
+    }
+
+
+class ControlSmoothnessStream:
+    """Incremental version of `speed_smoothness` and `control_smoothness`.
+
+    Every update is O(1), so it can be fed from a live stream and queried at any time.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.speed_samples = 0
+        self.speed_sum = 0
+        self.speed_suddenness_sum = 0
+        self.max_speed = -math.inf
+        self.min_speed = math.inf
+        self.previous_speed = 0.0
+
+        self.control_samples = 0
+        self.control_suddenness_sums = [0, 0, 0, 0]
+        self.previous_control = (0.0, 0.0, 0.0)
+
+    def update_speed(self, speed):
+        """Add a speed sample in km/h."""
+        speed = float(speed)
+        self.speed_samples += 1
+        self.speed_sum += speed
+        self.speed_suddenness_sum += abs(speed - self.previous_speed)
+        self.max_speed = max(self.max_speed, speed)
+        self.min_speed = min(self.min_speed, speed)
+        self.previous_speed = speed
+
+    def update_control(self, throttle, steer, brake):
+        """Add a control command sample."""
+        control = (float(throttle), float(steer), float(brake))
+        differences = [current - previous for current, previous in zip(control, self.previous_control)]
+        self.control_samples += 1
+        self.control_suddenness_sums[0] += math.sqrt(sum(difference * difference for difference in differences))
+        for i, difference in enumerate(differences):
+            self.control_suddenness_sums[i + 1] += abs(difference)
+        self.previous_control = control
+
+    def speed_summary(self):
+        """Same result as `speed_smoothness` over all the speed samples received so far."""
+        if not self.speed_samples:
+            return {}
+        return {
+            'average_speed': self.speed_sum / self.speed_samples,
+            'suddenness_distance_speed': self.speed_suddenness_sum / self.speed_samples,
+            'max_speed': self.max_speed,
+            'min_speed': self.min_speed,
+        }
+
+    def control_summary(self):
+        """Same result as `control_smoothness` over all the control samples received so far."""
+        if not self.control_samples:
+            return {}
+        joint, throttle, steer, brake = (value / self.control_samples for value in self.control_suddenness_sums)
+        return {
+            'suddenness_distance_control_commands': joint,
+            'suddenness_distance_throttle': throttle,
+            'suddenness_distance_steer': steer,
+            'suddenness_distance_brake_command': brake,
+        }
@@ -23,10 +23,11 @@ import cv2
 import rospy
 import os
 import time
-import rosbag
 import json
 import math
+import numpy as np
 from utils.logger import logger
+from utils.frame_sink import GUIFrameSink
 try:
     import carla
 except ModuleNotFoundError as ex:
@@ -35,12 +36,18 @@ from std_srvs.srv import Empty
 from sensor_msgs.msg import Image
 from cv_bridge import CvBridge
 from datetime import datetime
-from std_msgs.msg import String
+from std_msgs.msg import String, Float32
+from nav_msgs.msg import Odometry
+from rosgraph_msgs.msg import Clock
 from utils import metrics_carla
-from utils.constants import CARLA_INFRACTION_PENALTIES
+from utils import metrics_postprocessing
+from utils import waypoint_index
+from utils.metrics_recorder import MetricsRecorder, save_columns
+from utils.metrics_stream import CarlaMetricsStream
 try:
     from carla_msgs.msg import CarlaLaneInvasionEvent
     from carla_msgs.msg import CarlaCollisionEvent
+    from carla_msgs.msg import CarlaEgoVehicleStatus
 except ModuleNotFoundError as ex:
     logger.error('CARLA is not supported')
 from PIL import Image
@@ -54,18 +61,22 @@ class ControllerCarla:
     and the user interface (view).
 
     Attributes:
-        data {dict} -- Data to be sent to the view. The key is a frame_if of the view and the value is the data to be
-        displayed. Depending on the type of data the frame handles (images, laser, etc)
+        frame_sink {object} -- Receives the data to be sent to the view for each frame id of the view. Depending on
+        the type of data the frame handles (images, laser, etc)
         pose3D_data -- Pose data to be sent to the view
         recording {bool} -- Flag to determine if a rosbag is being recorded
     """
 
-    def __init__(self):
-        """ Constructor of the class. """
+    def __init__(self, frame_sink=None):
+        """ Constructor of the class.
+
+        Keyword Arguments:
+            frame_sink {object} -- Where the frames of the brains go, see `utils.frame_sink` (default: {None}, a
+            `GUIFrameSink`)
+        """
         pass
-        self.__data_loc = threading.Lock()
         self.__pose_loc = threading.Lock()
-        self.data = {}
+        self.frame_sink = frame_sink if frame_sink is not None else GUIFrameSink(letterbox=True)
         self.pose3D_data = None
         self.recording = False
         self.cvbridge = CvBridge()
@@ -88,8 +99,9 @@ class ControllerCarla:
             if self.ego_vehicle is None:
                 logger.info("Waiting for vehicle with role_name 'ego_vehicle'")
                 time.sleep(1)  # sleep for 1 second before checking again
-        self.map_waypoints = self.carla_map.generate_waypoints(0.5)
+        self.map_waypoints = waypoint_index.get_map_waypoints(self.carla_map.name, 0.5, carla_map=self.carla_map)
         self.weather = self.world.get_weather()
+        self.metrics_stream = None
         
     # GUI update
     def update_frame(self, frame_id, data):
@@ -102,8 +114,7 @@ class ControllerCarla:
             data {dict} -- Data to be shown
         """
         try:
-            with self.__data_loc:
-                self.data[frame_id] = data
+            self.frame_sink.update_frame(frame_id, data)
         except Exception as e:
             logger.info(e)
 
@@ -118,14 +129,21 @@ class ControllerCarla:
         Returns:
             data -- Depending on the caller frame could be image data, laser data, etc.
         """
+        data = None
         try:
-            with self.__data_loc:
-                data = self.data.get(frame_id, None)
+            data = self.frame_sink.get_data(frame_id)
         except Exception:
             pass
 
         return data
 
+    def get_frame(self, frame_id):
+        """Sequence number and data of the last frame of `frame_id`, see `GUIFrameSink.get_frame`.
+
+        The sequence number only changes when new data arrives, so the view can skip redrawing unchanged frames.
+        """
+        return self.frame_sink.get_frame(frame_id)
+
     def update_pose3d(self, data):
         """Update the pose3D data retrieved from the robot
 
@@ -223,10 +241,21 @@ class ControllerCarla:
         self.pilot.initialize_robot()
 
 
-    def record_metrics(self, metrics_record_dir_path, world_counter=None, brain_counter=None, repetition_counter=None):
-        logger.info("Recording metrics bag at: {}".format(metrics_record_dir_path))
+    def record_metrics(self, metrics_record_dir_path, world_counter=None, brain_counter=None, repetition_counter=None,
+                       live_metrics=False):
+        """Start recording the metrics topics of an experiment.
+
+        Arguments:
+            metrics_record_dir_path {str} -- Directory where the experiment folder is created
+
+        Keyword Arguments:
+            live_metrics {bool} -- Also update the metrics with every recorded message, for `get_live_metrics`
+            (default: {False})
+        """
+        logger.info("Recording metrics at: {}".format(metrics_record_dir_path))
 
         self.pilot.brain_iterations_real_time = []
+        self.pilot.scheduler.reset()
         self.time_str = time.strftime("%Y%m%d-%H%M%S")       
         if world_counter is not None:
             current_world_head, current_world_tail = os.path.split(self.pilot.configuration.current_world[world_counter])
@@ -282,24 +311,43 @@ class ControllerCarla:
         os.mkdir(self.metrics_record_dir_path + self.time_str)
         self.experiment_metrics_bag_filename = self.metrics_record_dir_path + self.time_str + '/' + self.time_str + '.bag'
 
-        topics = [
-            '/carla/npc_vehicle_1/odometry',
-            '/carla/ego_vehicle/odometry',
-            '/carla/ego_vehicle/collision',
-            '/carla/ego_vehicle/lane_invasion',
-            '/carla/ego_vehicle/speedometer',
-            '/carla/ego_vehicle/vehicle_status',
-            '/clock',
-            ]
-
-        command = "rosbag record -O " + self.experiment_metrics_bag_filename + " " + " ".join(topics) + " __name:=behav_metrics_bag"
-        command = shlex.split(command)
-        with open("logs/.roslaunch_stdout.log", "w") as out, open("logs/.roslaunch_stderr.log", "w") as err:
-            self.proc = subprocess.Popen(command, stdout=out, stderr=err)
-
-    def stop_recording_metrics(self, termination_code=None, route_length=None):
-        logger.info("Stopping metrics bag recording")
+        topics_types = {
+            '/carla/npc_vehicle_1/odometry': Odometry,
+            '/carla/ego_vehicle/odometry': Odometry,
+            '/carla/ego_vehicle/collision': CarlaCollisionEvent,
+            '/carla/ego_vehicle/lane_invasion': CarlaLaneInvasionEvent,
+            '/carla/ego_vehicle/speedometer': Float32,
+            '/carla/ego_vehicle/vehicle_status': CarlaEgoVehicleStatus,
+            '/clock': Clock,
+        }
+        topics = {topic: (topics_types[topic], fields) for topic, fields in metrics_carla.METRICS_TOPICS_FIELDS.items()}
+        bag_filename = self.experiment_metrics_bag_filename if self.pilot.configuration.stats_record_bag else None
+        listeners = []
+        if live_metrics:
+            self.metrics_stream = CarlaMetricsStream(self.map_waypoints, self.carla_map.name)
+            listeners.append(self.metrics_stream.update)
+        self.metrics_recorder = MetricsRecorder(topics, bag_filename, listeners=listeners)
+        self.metrics_recorder.start()
+
+    def get_live_metrics(self):
+        """Metrics of the experiment being recorded so far (see `CarlaMetricsStream.snapshot`), None if there is none."""
+        if self.metrics_stream is None:
+            return None
+        return self.metrics_stream.snapshot()
+
+    def stop_recording_metrics(self, termination_code=None, route_length=None, deferred=False):
+        """Stop recording the metrics and compute the experiment metrics.
+
+        Arguments:
+            termination_code {int} -- Termination cause of a route experiment
+            route_length {float} -- Length of the route of a route experiment
+            deferred {bool} -- Only save the recorded topics and write a post-processing manifest, the metrics are
+            computed later by a `MetricsPostprocessingQueue`
+        """
+        logger.info("Stopping metrics recording")
         end_time = time.time()
+        self.metrics_topics = self.metrics_recorder.stop()
+        self.metrics_stream = None
 
         mean_brain_iterations_real_time = sum(self.pilot.brain_iterations_real_time) / len(self.pilot.brain_iterations_real_time)
         brain_iterations_frequency_real_time = 1 / mean_brain_iterations_real_time
@@ -316,20 +364,14 @@ class ControllerCarla:
             first_images = []
             last_images = []
 
-        command = "rosnode kill /behav_metrics_bag"
-        command = shlex.split(command)
-        with open("logs/.roslaunch_stdout.log", "w") as out, open("logs/.roslaunch_stderr.log", "w") as err:
-            subprocess.Popen(command, stdout=out, stderr=err)
 
-        # Wait for rosbag file to be closed. Otherwise it causes error
-        while os.path.isfile(self.experiment_metrics_bag_filename + '.active'):
-            pass
-        
         if hasattr(self.pilot.brains.active_brain, 'inference_times'):
             self.pilot.brains.active_brain.inference_times = self.pilot.brains.active_brain.inference_times[10:-10]
             self.experiment_metrics['gpu_mean_inference_time'] = sum(self.pilot.brains.active_brain.inference_times) / len(self.pilot.brains.active_brain.inference_times)
             self.experiment_metrics['gpu_inference_frequency'] = 1 / self.experiment_metrics['gpu_mean_inference_time']
             self.experiment_metrics['gpu_inference'] = self.pilot.brains.active_brain.gpu_inference
+            if hasattr(self.pilot.brains.active_brain, 'inference_engine'):
+                self.experiment_metrics.update(self.pilot.brains.active_brain.inference_engine.latencies.summary())
         else:
             self.experiment_metrics['gpu_mean_inference_time'] = 0
             self.experiment_metrics['gpu_inference_frequency'] = 0
@@ -344,6 +386,15 @@ class ControllerCarla:
             self.experiment_metrics['bird_eye_view_unique_images'] = 0
             self.experiment_metrics['bird_eye_view_unique_images_percentage'] = 0
 
+        for camera_name, camera in (self.pilot.sensors.cameras or {}).items():
+            for counter, frames in camera.getFrameCounters().items():
+                self.experiment_metrics['{}_{}'.format(camera_name, counter)] = frames
+
+        if hasattr(self.pilot.brains.active_brain, 'keras_inference_mode'):
+            self.experiment_metrics['keras_inference_mode'] = self.pilot.brains.active_brain.keras_inference_mode
+
+        self.experiment_metrics.update(self.pilot.scheduler.summary())
+
         self.experiment_metrics['brain_iterations_simulated_time'] = len(self.pilot.brain_iterations_simulated_time)
         self.experiment_metrics['mean_brain_iterations_real_time'] = mean_brain_iterations_real_time
         self.experiment_metrics['brain_iterations_frequency_real_time'] = brain_iterations_frequency_real_time
@@ -352,66 +403,55 @@ class ControllerCarla:
         self.experiment_metrics['brain_iterations_frequency_simulated_time'] = brain_iterations_frequency_simulated_time
         self.experiment_metrics['experiment_total_real_time'] = end_time - self.pilot.pilot_start_time
 
-        experiment_metrics_filename = self.metrics_record_dir_path + self.time_str + '/' + self.time_str
-        self.experiment_metrics = metrics_carla.get_metrics(self.experiment_metrics, self.experiment_metrics_bag_filename, self.map_waypoints, experiment_metrics_filename, self.pilot.configuration)
-        self.experiment_metrics['collisions_vehicle'] = 0
-        self.experiment_metrics['collisions_walker'] = 0
-        self.experiment_metrics['collisions_static'] = 0
-
-        collision_actor_ids = self.experiment_metrics['collision_actor_ids']
-        for actor_id in collision_actor_ids:
-            actor = self.world.get_actor(actor_id)
-            if actor:
-                actor_type = actor.type_id.split('.')[0]
-                if actor_type == 'vehicle':
-                    self.experiment_metrics['collisions_vehicle'] += 1
-                elif actor_type == 'walker':
-                    self.experiment_metrics['collisions_walker'] += 1
-                else:
-                    self.experiment_metrics['collisions_static'] += 1
-            else:
-                print(f"No actor found with ID {actor_id}")
-
         if hasattr(self.pilot.brains.active_brain, 'red_light_counter'):
             self.experiment_metrics['traffic_light_infractions'] = self.pilot.brains.active_brain.red_light_counter
-            self.experiment_metrics['traffic_light_infractions_per_km'] = self.experiment_metrics['traffic_light_infractions'] / (self.experiment_metrics['effective_completed_distance']/1000)
 
-        if route_length is not None:
-            self.experiment_metrics['route_completion'] = self.experiment_metrics['effective_completed_distance'] / route_length
-        
-        wrong_turn_counter = 0
-        time_out_counter = 0
-        if termination_code is not None:
-            if termination_code == 1:
-                self.experiment_metrics['termination cause'] = 'success'
-            elif termination_code == 2:
-                wrong_turn_counter += 1
-                self.experiment_metrics['termination cause'] = 'wrong turn'
-            elif termination_code == 3:
-                time_out_counter += 1
-                self.experiment_metrics['termination cause'] = 'time out'
-        
-        if 'route_completion' in self.experiment_metrics.keys() and 'traffic_light_infractions' in self.experiment_metrics.keys() and termination_code is not None:
-            self.experiment_metrics['driving score'] = self.experiment_metrics['route_completion'] * \
-                                                    CARLA_INFRACTION_PENALTIES['collision_vehicle']**self.experiment_metrics['collisions_vehicle'] * \
-                                                    CARLA_INFRACTION_PENALTIES['collision_static']**self.experiment_metrics['collisions_static'] * \
-                                                    CARLA_INFRACTION_PENALTIES['collision_walker']**self.experiment_metrics['collisions_walker'] * \
-                                                    CARLA_INFRACTION_PENALTIES['red_light']**self.experiment_metrics['traffic_light_infractions'] * \
-                                                    CARLA_INFRACTION_PENALTIES['wrong_turn']**wrong_turn_counter * \
-                                                    CARLA_INFRACTION_PENALTIES['time_out']**time_out_counter
+        experiment_metrics_filename = self.metrics_record_dir_path + self.time_str + '/' + self.time_str
+        collision_actor_types = self.get_collision_actor_types()
+        if deferred:
+            # Make sure the map waypoints are cached on disk for the post-processing workers
+            self.map_waypoints.index
+            self.save_images(first_images, last_images)
+            save_columns(experiment_metrics_filename + '.npz', self.metrics_topics)
+            metrics_postprocessing.write_manifest(experiment_metrics_filename, {
+                'experiment_metrics': self.experiment_metrics,
+                'experiment_metrics_bag_filename': self.experiment_metrics_bag_filename,
+                'experiment_metrics_columns_filename': experiment_metrics_filename + '.npz',
+                'carla_map': self.map_waypoints.carla_map_name,
+                'waypoints_resolution': self.map_waypoints.resolution,
+                'task': self.pilot.configuration.task,
+                'collision_actor_types': collision_actor_types,
+                'termination_code': termination_code,
+                'route_length': route_length,
+            })
+            logger.info("Stopped metrics recording")
+            return
+
+        self.experiment_metrics = metrics_postprocessing.complete_metrics(self.experiment_metrics, self.experiment_metrics_bag_filename, self.map_waypoints, experiment_metrics_filename, self.pilot.configuration.task, collision_actor_types, termination_code, route_length, self.metrics_topics)
         self.save_metrics(first_images, last_images)
 
         for key, value in self.experiment_metrics.items():
             logger.info('* ' + str(key) + ' ---> ' + str(value))
 
-        logger.info("Stopped metrics bag recording")
+        logger.info("Stopped metrics recording")
 
 
+    def get_collision_actor_types(self):
+        """Type of every actor the ego vehicle collided with, looked up while the simulator is up."""
+        collision_actor_types = {}
+        for actor_id in set(self.metrics_topics['/carla/ego_vehicle/collision']['other_actor_id'].tolist()):
+            actor = self.world.get_actor(actor_id)
+            if actor:
+                collision_actor_types[str(actor_id)] = actor.type_id.split('.')[0]
+        return collision_actor_types
+
     def save_metrics(self, first_images, last_images):        
         with open(self.metrics_record_dir_path + self.time_str + '/' + self.time_str + '.json', 'w') as f:
             json.dump(self.experiment_metrics, f)
         logger.info("Metrics stored in JSON file")
+        self.save_images(first_images, last_images)
 
+    def save_images(self, first_images, last_images):
         for counter, image in enumerate(first_images):
             im = Image.fromarray(image)
             im.save(self.metrics_record_dir_path + self.time_str + '/' + self.time_str + "_first_image_" + str(counter) + ".jpeg")
@@ -31,9 +31,13 @@ from sensor_msgs.msg import Image
 from cv_bridge import CvBridge
 from datetime import datetime
 from utils.logger import logger
+from utils.frame_sink import GUIFrameSink
 from utils.constants import CIRCUITS_TIMEOUTS
 from std_msgs.msg import String
+from nav_msgs.msg import Odometry
+from rosgraph_msgs.msg import Clock
 from utils import metrics_gazebo
+from utils.metrics_recorder import MetricsRecorder
 
 __author__ = 'fqez'
 __contributors__ = []
@@ -45,18 +49,22 @@ class ControllerGazebo:
     and the user interface (view).
 
     Attributes:
-        data {dict} -- Data to be sent to the view. The key is a frame_if of the view and the value is the data to be
-        displayed. Depending on the type of data the frame handles (images, laser, etc)
+        frame_sink {object} -- Receives the data to be sent to the view for each frame id of the view. Depending on
+        the type of data the frame handles (images, laser, etc)
         pose3D_data -- Pose data to be sent to the view
         recording {bool} -- Flag to determine if a rosbag is being recorded
     """
 
-    def __init__(self):
-        """ Constructor of the class. """
+    def __init__(self, frame_sink=None):
+        """ Constructor of the class.
+
+        Keyword Arguments:
+            frame_sink {object} -- Where the frames of the brains go, see `utils.frame_sink` (default: {None}, a
+            `GUIFrameSink`)
+        """
         pass
-        self.__data_loc = threading.Lock()
         self.__pose_loc = threading.Lock()
-        self.data = {}
+        self.frame_sink = frame_sink if frame_sink is not None else GUIFrameSink()
         self.pose3D_data = None
         self.recording = False
         self.cvbridge = CvBridge()
@@ -72,8 +80,7 @@ class ControllerGazebo:
             data {dict} -- Data to be shown
         """
         try:
-            with self.__data_loc:
-                self.data[frame_id] = data
+            self.frame_sink.update_frame(frame_id, data)
         except Exception as e:
             logger.info(e)
 
@@ -88,14 +95,21 @@ class ControllerGazebo:
         Returns:
             data -- Depending on the caller frame could be image data, laser data, etc.
         """
+        data = None
         try:
-            with self.__data_loc:
-                data = self.data.get(frame_id, None)
+            data = self.frame_sink.get_data(frame_id)
         except Exception:
             pass
 
         return data
 
+    def get_frame(self, frame_id):
+        """Sequence number and data of the last frame of `frame_id`, see `GUIFrameSink.get_frame`.
+
+        The sequence number only changes when new data arrives, so the view can skip redrawing unchanged frames.
+        """
+        return self.frame_sink.get_frame(frame_id)
+
     def update_pose3d(self, data):
         """Update the pose3D data retrieved from the robot
 
@@ -175,7 +189,7 @@ class ControllerGazebo:
             logger.info("No bag recording")
 
     def record_metrics(self, perfect_lap_filename, metrics_record_dir_path, world_counter=None, brain_counter=None, repetition_counter=None):
-        logger.info("Recording metrics bag at: {}".format(metrics_record_dir_path))
+        logger.info("Recording metrics at: {}".format(metrics_record_dir_path))
         self.start_time = datetime.now()
         current_world_head, current_world_tail = os.path.split(self.pilot.configuration.current_world)
         if brain_counter is not None:
@@ -205,34 +219,27 @@ class ControllerGazebo:
         self.metrics_record_dir_path = metrics_record_dir_path
         time_str = time.strftime("%Y%m%d-%H%M%S")
         self.experiment_metrics_filename = time_str + '.bag'
-        topics = ['/F1ROS/odom', '/clock']
-        command = "rosbag record -O " + self.experiment_metrics_filename + " " + " ".join(topics) + " __name:=behav_metrics_bag"
-        command = shlex.split(command)
-        with open("logs/.roslaunch_stdout.log", "w") as out, open("logs/.roslaunch_stderr.log", "w") as err:
-            self.proc = subprocess.Popen(command, stdout=out, stderr=err)
+        topics_types = {'/F1ROS/odom': Odometry, '/clock': Clock}
+        topics = {topic: (topics_types[topic], fields) for topic, fields in metrics_gazebo.METRICS_TOPICS_FIELDS.items()}
+        bag_filename = self.experiment_metrics_filename if self.pilot.configuration.stats_record_bag else None
+        self.metrics_recorder = MetricsRecorder(topics, bag_filename)
+        self.metrics_recorder.start()
 
     def stop_recording_metrics(self, pitch_error=False):
-        logger.info("Stopping metrics bag recording")
+        logger.info("Stopping metrics recording")
         end_time = time.time()
-
-        command = "rosnode kill /behav_metrics_bag"
-        command = shlex.split(command)
-        with open("logs/.roslaunch_stdout.log", "w") as out, open("logs/.roslaunch_stderr.log", "w") as err:
-            subprocess.Popen(command, stdout=out, stderr=err)
-
-        # Wait for rosbag file to be closed. Otherwise it causes error
-        while os.path.isfile(self.experiment_metrics_filename + '.active'):
-            pass
+        metrics_topics = self.metrics_recorder.stop()
 
         perfect_lap_checkpoints, circuit_diameter = metrics_gazebo.read_perfect_lap_rosbag(self.perfect_lap_filename)
         if not pitch_error:
-            self.experiment_metrics = metrics_gazebo.get_metrics(self.experiment_metrics_filename, perfect_lap_checkpoints, circuit_diameter)
+            self.experiment_metrics = metrics_gazebo.get_metrics(self.experiment_metrics_filename, perfect_lap_checkpoints, circuit_diameter, metrics_topics)
             self.experiment_metrics, first_image = self.pilot.calculate_metrics(self.experiment_metrics)
 
-            try:
-                self.save_metrics(first_image)
-            except rosbag.bag.ROSBagException:
-                logger.info("Bag was empty, Try Again")
+            if self.metrics_recorder.bag_filename is not None:
+                try:
+                    self.save_metrics(first_image)
+                except rosbag.bag.ROSBagException:
+                    logger.info("Bag was empty, Try Again")
 
 
         else:
@@ -249,7 +256,7 @@ class ControllerGazebo:
             json.dump(self.experiment_metrics, f)
         logger.info("Metrics stored in JSON file")
 
-        logger.info("Stopping metrics bag recording")
+        logger.info("Stopped metrics recording")
 
     def save_metrics(self, first_image):
         experiment_metadata_str = json.dumps(self.experiment_metadata)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""This module reads the Gazebo experiment bags used by the analysis tools.
+
+The odometry positions are read straight from the message attributes into NumPy arrays, the `/metadata` and
+`/experiment_metrics` JSON strings are decoded once and several bags are read in parallel in a process pool.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import rosbag
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from utils import rosbag_reader
+
+ODOMETRY_TOPIC = '/F1ROS/odom'
+METADATA_TOPIC = '/metadata'
+EXPERIMENT_METRICS_TOPIC = '/experiment_metrics'
+FIRST_IMAGE_TOPIC = '/first_image'
+
+_bridge = None
+
+
+def _imgmsg_to_cv2(msg):
+    global _bridge
+    if _bridge is None:
+        from cv_bridge import CvBridge
+        _bridge = CvBridge()
+    return _bridge.imgmsg_to_cv2(msg, desired_encoding='passthrough')
+
+
+def read_experiment_bag(bag_filename):
+    """Read the path, metadata, metrics and first image of an experiment bag.
+
+    Arguments:
+        bag_filename {str} -- Path of the experiment bag
+
+    Returns:
+        dict -- `bag`, `x` and `y` (odometry positions), `metadata` and `experiment_metrics` (decoded JSON, None if
+        missing) and `first_image` (a 1x1 black image if missing)
+    """
+    # The last message of each topic is kept
+    last_messages = {}
+
+    def keep_last_message(topic, msg, t):
+        last_messages[topic] = msg
+
+    with rosbag.Bag(bag_filename, 'r') as bag:
+        odometry = rosbag_reader.read_bag_topics(bag, {ODOMETRY_TOPIC: rosbag_reader.ODOMETRY_FIELDS},
+                                                 other_topics=[METADATA_TOPIC, EXPERIMENT_METRICS_TOPIC,
+                                                               FIRST_IMAGE_TOPIC],
+                                                 callback=keep_last_message)[ODOMETRY_TOPIC]
+    experiment = {
+        'bag': bag_filename,
+        'x': odometry['pose.pose.position.x'],
+        'y': odometry['pose.pose.position.y'],
+        'metadata': None,
+        'experiment_metrics': None,
+        'first_image': np.zeros((1, 1)),
+    }
+    if METADATA_TOPIC in last_messages:
+        experiment['metadata'] = json.loads(last_messages[METADATA_TOPIC].data)
+    if EXPERIMENT_METRICS_TOPIC in last_messages:
+        experiment['experiment_metrics'] = json.loads(last_messages[EXPERIMENT_METRICS_TOPIC].data)
+    if FIRST_IMAGE_TOPIC in last_messages:
+        experiment['first_image'] = _imgmsg_to_cv2(last_messages[FIRST_IMAGE_TOPIC])
+    return experiment
+
+
+def _read_experiment_bag(bag_filename):
+    print('Reading bag: ' + bag_filename)
+    try:
+        return read_experiment_bag(bag_filename)
+    except Exception as excep:
+        print(excep)
+        print('Error in bag: ' + bag_filename)
+        return None
+
+
+def read_experiment_bags(bag_filenames, jobs=None):
+    """Read several experiment bags in a process pool.
+
+    Arguments:
+        bag_filenames {list} -- Paths of the experiment bags
+        jobs {int} -- Number of worker processes (number of CPUs by default). With 1 the bags are read in the
+        calling process.
+
+    Returns:
+        list -- `read_experiment_bag` result for each bag, in the same order, None for the bags that could not be read
+    """
+    if jobs == 1 or len(bag_filenames) < 2:
+        return [_read_experiment_bag(bag_filename) for bag_filename in bag_filenames]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_read_experiment_bag, bag_filenames))
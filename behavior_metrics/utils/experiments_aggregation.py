@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+"""This module aggregates the metrics of the experiments stored in a directory.
+
+Every experiment is a folder named after its starting time (e.g. `20230101-120000`) that contains the experiment
+metrics JSON. The metrics of all the experiments are combined in a Parquet table stored in the root directory
+together with an index of the experiments already ingested, so later runs only read new or updated experiments.
+Experiments whose metrics can not be read are moved to a quarantine folder.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import json
+import shutil
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from utils.logger import logger
+
+AGGREGATED_METRICS_FILENAME = 'aggregated_metrics.parquet'
+AGGREGATED_METRICS_INDEX_FILENAME = 'aggregated_metrics_index.json'
+QUARANTINE_FOLDER = 'broken_experiments'
+EXPERIMENT_FOLDER_COLUMN = 'experiment_folder'
+EXPERIMENT_MTIME_COLUMN = 'experiment_mtime'
+
+EXPERIMENT_FOLDER_PATTERN = re.compile(r'\d{8}-\d{6}')
+
+
+def scan_experiments(root):
+    """Find the experiment folders directly under `root`.
+
+    Arguments:
+        root {str} -- Directory that contains the experiment folders
+
+    Returns:
+        dict -- For each experiment folder name, the path of its metrics JSON and its modification time.
+        Folders without a JSON file are not included.
+    """
+    experiments = {}
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.is_dir() or not EXPERIMENT_FOLDER_PATTERN.fullmatch(entry.name):
+                continue
+            with os.scandir(entry.path) as files:
+                json_files = sorted(file.name for file in files if file.name.endswith('.json') and file.is_file())
+            if not json_files:
+                continue
+            # The controller names the metrics file after the folder
+            json_filename = entry.name + '.json' if entry.name + '.json' in json_files else json_files[0]
+            json_path = os.path.join(entry.path, json_filename)
+            experiments[entry.name] = (json_path, os.stat(json_path).st_mtime)
+    return experiments
+
+
+def load_experiment(json_path):
+    """Read the metrics of an experiment.
+
+    Lists and dicts (e.g. the ids of the collided actors) are kept as JSON strings so the metrics form a flat row.
+
+    Returns:
+        dict -- Metrics of the experiment (empty if the experiment recorded none), or None if they can not be read
+    """
+    try:
+        with open(json_path) as f:
+            metrics = json.load(f)
+    except (OSError, ValueError) as ex:
+        logger.warning('Broken experiment metrics {}: {}'.format(json_path, ex))
+        return None
+    if not isinstance(metrics, dict):
+        logger.warning('Broken experiment metrics {}: not a JSON object'.format(json_path))
+        return None
+    return {key: json.dumps(value) if isinstance(value, (list, dict)) else value for key, value in metrics.items()}
+
+
+def quarantine_experiment(root, folder):
+    """Move a broken experiment folder to the quarantine folder of `root`."""
+    quarantine_path = os.path.join(root, QUARANTINE_FOLDER)
+    os.makedirs(quarantine_path, exist_ok=True)
+    destination = os.path.join(quarantine_path, folder)
+    suffix = 1
+    while os.path.exists(destination):
+        destination = os.path.join(quarantine_path, '{}_{}'.format(folder, suffix))
+        suffix += 1
+    shutil.move(os.path.join(root, folder), destination)
+    logger.warning('Broken experiment: {} moved to {}'.format(folder, destination))
+
+
+def normalize_columns(table):
+    """Give every column a single type so the table can be stored as Parquet.
+
+    Columns that mix numbers and booleans become floats and columns that mix numbers and strings become strings.
+    """
+    for column in table.columns[table.dtypes == object]:
+        values = table[column].dropna()
+        if values.map(lambda value: isinstance(value, str)).all():
+            continue
+        if values.map(lambda value: isinstance(value, (bool, int, float))).all():
+            table[column] = table[column].astype(float)
+        else:
+            table[column] = table[column].map(lambda value: value if value is None else str(value))
+    return table
+
+
+def read_aggregated_metrics(root, output=None):
+    """Read the stored aggregated metrics table and its index.
+
+    Returns:
+        (pd.DataFrame, dict) -- Table (None if there is none) and the modification time of each ingested experiment
+    """
+    output = output or os.path.join(root, AGGREGATED_METRICS_FILENAME)
+    index_filename = os.path.join(os.path.dirname(output), AGGREGATED_METRICS_INDEX_FILENAME)
+    if not os.path.isfile(output) or not os.path.isfile(index_filename):
+        return None, {}
+    try:
+        with open(index_filename) as f:
+            index = json.load(f)
+        table = pd.read_parquet(output)
+    except Exception as ex:
+        logger.info('Rebuilding aggregated metrics {}: {}'.format(output, ex))
+        return None, {}
+    return table, index
+
+
+def write_aggregated_metrics(table, index, root, output=None):
+    output = output or os.path.join(root, AGGREGATED_METRICS_FILENAME)
+    index_filename = os.path.join(os.path.dirname(output), AGGREGATED_METRICS_INDEX_FILENAME)
+    # Written aside and renamed, the index last, so an interrupted run never leaves a table that the index
+    # does not describe
+    tmp_output = '{}.{}.tmp'.format(output, os.getpid())
+    table.to_parquet(tmp_output, index=False)
+    os.replace(tmp_output, output)
+    tmp_index_filename = '{}.{}.tmp'.format(index_filename, os.getpid())
+    with open(tmp_index_filename, 'w') as f:
+        json.dump(index, f, indent=4, sort_keys=True)
+    os.replace(tmp_index_filename, index_filename)
+
+
+def aggregate_experiments(root, output=None, jobs=None):
+    """Aggregate the metrics of all the experiments under `root`.
+
+    Only experiments that are not in the stored table yet, or whose metrics changed, are read. They are read in
+    a process pool. Broken experiments are quarantined.
+
+    Arguments:
+        root {str} -- Directory that contains the experiment folders
+        output {str} -- Parquet file of the aggregated metrics (`root`/aggregated_metrics.parquet by default)
+        jobs {int} -- Number of worker processes (number of CPUs by default)
+
+    Returns:
+        pd.DataFrame -- One row per experiment, with the `experiment_folder` and `experiment_mtime` columns
+    """
+    table, index = read_aggregated_metrics(root, output)
+    experiments = scan_experiments(root)
+
+    # Experiments that disappeared from the root are dropped, new or updated ones are read
+    if table is not None:
+        table = table[table[EXPERIMENT_FOLDER_COLUMN].isin(experiments)]
+    index = {folder: mtime for folder, mtime in index.items() if folder in experiments}
+    pending = sorted(folder for folder, (_, mtime) in experiments.items() if index.get(folder) != mtime)
+    logger.info('Aggregating {} new experiments out of {} in {}'.format(len(pending), len(experiments), root))
+
+    rows = []
+    if pending:
+        json_paths = [experiments[folder][0] for folder in pending]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            loaded = list(executor.map(load_experiment, json_paths, chunksize=max(1, len(json_paths) // 64)))
+        for folder, metrics in zip(pending, loaded):
+            if metrics is None:
+                quarantine_experiment(root, folder)
+                continue
+            metrics[EXPERIMENT_FOLDER_COLUMN] = folder
+            metrics[EXPERIMENT_MTIME_COLUMN] = experiments[folder][1]
+            rows.append(metrics)
+            index[folder] = experiments[folder][1]
+
+    if rows:
+        new_table = pd.DataFrame.from_records(rows)
+        if table is not None:
+            table = pd.concat([table[~table[EXPERIMENT_FOLDER_COLUMN].isin(new_table[EXPERIMENT_FOLDER_COLUMN])],
+                               new_table], ignore_index=True)
+        else:
+            table = new_table
+    elif table is None:
+        table = pd.DataFrame(columns=[EXPERIMENT_FOLDER_COLUMN, EXPERIMENT_MTIME_COLUMN])
+
+    table = normalize_columns(table.sort_values(EXPERIMENT_FOLDER_COLUMN).reset_index(drop=True))
+    write_aggregated_metrics(table, index, root, output)
+    return table
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+"""This module contains the sinks of the frames the brains send to the view.
+
+The brains send their frames (camera images, laser data, ...) through the controller every iteration. Where they end
+depends on how the application runs: the GUI shows the last frame of each frame id, a headless run (script mode)
+drops them, and a video sink can record one of them at a low rate. Any per-frame display work (e.g. letterboxing)
+is done by the sink when the frame is read, so it is only paid for the frames actually shown.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+from utils.logger import logger
+
+DEFAULT_VIDEO_FRAME_ID = 'frame_0'
+DEFAULT_VIDEO_RATE = 5
+VIDEO_CODEC = 'MJPG'
+# Seconds `VideoFrameSink.close` waits for the pending frame to be written
+VIDEO_CLOSE_TIMEOUT = 10
+
+
+def letterbox(data):
+    """Pad an image with black bands to make it square, centered (as the GUI frames show it).
+
+    Any data that is not a non-square image is returned as is.
+    """
+    if not isinstance(data, np.ndarray) or data.ndim != 3 or data.shape[0] == data.shape[1]:
+        return data
+    if data.shape[0] > data.shape[1]:
+        extra = int((data.shape[0] - data.shape[1]) / 2)
+        padding = ((0, 0), (extra, extra), (0, 0))
+    else:
+        extra = int((data.shape[1] - data.shape[0]) / 2)
+        padding = ((extra, extra), (0, 0), (0, 0))
+    return np.pad(data, padding, mode='constant', constant_values=0)
+
+
+class HeadlessFrameSink:
+    """Drops every frame, nobody shows them."""
+
+    def update_frame(self, frame_id, data):
+        pass
+
+    def get_data(self, frame_id):
+        return None
+
+    def get_frame(self, frame_id):
+        return 0, None
+
+    def close(self):
+        pass
+
+
+class GUIFrameSink:
+    """Keeps the last frame of each frame id for the GUI.
+
+    The frames are stored as they are sent (no copy) and letterboxed, if enabled, when the GUI reads them; the result
+    is cached until a new frame arrives, so a frame shown several times is only padded once. Every frame id has a
+    sequence number, increased with each new frame, so the GUI only redraws the frames that changed.
+
+    Keyword Arguments:
+        letterbox {bool} -- Pad the images to a square when they are read (default: {False})
+    """
+
+    def __init__(self, letterbox=False):
+        self.letterbox = letterbox
+        self.lock = threading.Lock()
+        self.data = {}
+        self.seqs = {}
+        self.shown = {}
+
+    def update_frame(self, frame_id, data):
+        with self.lock:
+            self.data[frame_id] = data
+            self.seqs[frame_id] = self.seqs.get(frame_id, 0) + 1
+            self.shown.pop(frame_id, None)
+
+    def get_data(self, frame_id):
+        return self.get_frame(frame_id)[1]
+
+    def get_frame(self, frame_id):
+        """Sequence number (0 before the first frame) and data of the last frame of `frame_id`."""
+        with self.lock:
+            data = self.data.get(frame_id, None)
+            seq = self.seqs.get(frame_id, 0)
+            if not self.letterbox or data is None:
+                return seq, data
+            shown = self.shown.get(frame_id)
+            if shown is not None and shown[0] is data:
+                return seq, shown[1]
+        boxed = letterbox(data)
+        with self.lock:
+            # The frame could have been replaced while padding, then this one is not cached
+            if self.data.get(frame_id) is data:
+                self.shown[frame_id] = (data, boxed)
+        return seq, boxed
+
+    def close(self):
+        pass
+
+
+class VideoFrameSink:
+    """Records the frames of one frame id to a video file at a low rate, from a background thread.
+
+    The frames arriving faster than the rate are dropped in `update_frame`, and so is a frame arriving while the
+    previous one is still being encoded, so the brain never waits for the video. The video size is the one of the
+    first (letterboxed) frame. A frame that can not be written is logged and skipped.
+
+    Arguments:
+        filename {str} -- Path of the video file
+
+    Keyword Arguments:
+        frame_id {str} -- Frame to record (default: {DEFAULT_VIDEO_FRAME_ID})
+        rate {float} -- Frames per second recorded, also the frame rate of the video (default: {DEFAULT_VIDEO_RATE})
+    """
+
+    def __init__(self, filename, frame_id=DEFAULT_VIDEO_FRAME_ID, rate=DEFAULT_VIDEO_RATE):
+        self.filename = filename
+        self.frame_id = frame_id
+        self.rate = rate
+        self.period = 1 / rate
+        self.next_time = 0
+        self.frames = queue.Queue(maxsize=1)
+        self.recorded_frames = 0
+        self.writer = None
+        self.thread = threading.Thread(target=self.__write, daemon=True)
+        self.thread.start()
+
+    def update_frame(self, frame_id, data):
+        if frame_id != self.frame_id:
+            return
+        now = time.perf_counter()
+        if now < self.next_time:
+            return
+        try:
+            self.frames.put_nowait(np.array(data, copy=True))
+        except queue.Full:
+            return
+        self.next_time = now + self.period
+
+    def get_data(self, frame_id):
+        return None
+
+    def get_frame(self, frame_id):
+        return 0, None
+
+    def __write(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            try:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR if frame.ndim == 2 else cv2.COLOR_RGB2BGR)
+                frame = letterbox(frame)
+                if self.writer is None:
+                    fourcc = cv2.VideoWriter_fourcc(*VIDEO_CODEC)
+                    self.writer = cv2.VideoWriter(self.filename, fourcc, self.rate, (frame.shape[1], frame.shape[0]))
+                self.writer.write(frame)
+                self.recorded_frames += 1
+            except Exception as err:
+                logger.warning('Video of {}: frame not recorded: {}'.format(self.frame_id, err))
+
+    def close(self):
+        """Stop recording, waiting for the pending frame to be written (at most `VIDEO_CLOSE_TIMEOUT` seconds)."""
+        if self.thread.is_alive():
+            try:
+                self.frames.put(None, timeout=VIDEO_CLOSE_TIMEOUT)
+                self.thread.join(timeout=VIDEO_CLOSE_TIMEOUT)
+            except queue.Full:
+                pass
+            if self.thread.is_alive():
+                # The writer is still in use by the thread, it is left open
+                logger.warning('Video of {}: writer did not finish, the video may be incomplete'.format(self.frame_id))
+                return
+        if self.writer is not None:
+            self.writer.release()
+            logger.info("Video of {} stored at: {} ({} frames)".format(self.frame_id, self.filename,
+                                                                         self.recorded_frames))
+
+
+def get_script_frame_sink(configuration):
+    """Sink of the frames when the application runs as a script: the frames video if it is configured, otherwise
+    none at all."""
+    if not configuration.stats_frames_video:
+        return HeadlessFrameSink()
+    filename = os.path.join(configuration.stats_out,
+                            time.strftime("%Y%m%d-%H%M%S") + '_' + configuration.stats_frames_video + '.avi')
+    return VideoFrameSink(filename, configuration.stats_frames_video, configuration.stats_frames_video_rate)
@@ -1,7 +1,10 @@
 from tensorflow.keras.models import Model
 from tensorflow.keras.layers import Conv2D
+from utils.logger import logger
 import tensorflow as tf
 import numpy as np
+import threading
+import time
 import cv2
 
 
@@ -18,6 +21,17 @@ class GradCAM:
         if self.layerName is None:
             self.layerName = self.find_target_layer()
 
+        # construct our gradient model by supplying (1) the inputs
+        # to our pre-trained model, (2) the output of the (presumably)
+        # final 4D layer in the network, and (3) the output of the
+        # softmax activations from the model. It is built once, and the
+        # heatmap computation is compiled into a single graph call
+        self.grad_model = Model(
+            inputs=[self.model.inputs],
+            outputs=[self.model.get_layer(self.layerName).output,
+                     self.model.output])
+        self.compute_cam = tf.function(self._compute_cam)
+
     def find_target_layer(self):
         # attempt to find the final convolutional layer in the network
         # by looping over the layers of the network in reverse order
@@ -30,23 +44,12 @@ class GradCAM:
         # algorithm cannot be applied
         raise ValueError("Could not find 4D layer. Cannot apply GradCAM.")
 
-    def compute_heatmap(self, image, eps=1e-8):
-        # construct our gradient model by supplying (1) the inputs
-        # to our pre-trained model, (2) the output of the (presumably)
-        # final 4D layer in the network, and (3) the output of the
-        # softmax activations from the model
-        grad_model = Model(
-            inputs=[self.model.inputs],
-            outputs=[self.model.get_layer(self.layerName).output,
-                     self.model.output])
-
+    def _compute_cam(self, inputs):
         # record operations for automatic differentiation
         with tf.GradientTape() as tape:
-            # cast the image tensor to a float-32 data type, pass the
-            # image through the gradient model, and grab the loss
+            # pass the image through the gradient model, and grab the loss
             # associated with the specific class index
-            inputs = tf.cast(image, tf.float32)
-            (conv_outputs, predictions) = grad_model(inputs)
+            (conv_outputs, predictions) = self.grad_model(inputs)
             #loss = predictions[:, self.class_idx]
             loss = predictions[:, 1]
         # use automatic differentiation to compute the gradients
@@ -66,7 +69,12 @@ class GradCAM:
         # as weights, compute the ponderation of the filters with
         # respect to the weights
         weights = tf.reduce_mean(guided_grads, axis=(0, 1))
-        cam = tf.reduce_sum(tf.multiply(weights, conv_outputs), axis=-1)
+        return tf.reduce_sum(tf.multiply(weights, conv_outputs), axis=-1)
+
+    def compute_heatmap(self, image, eps=1e-8):
+        # cast the image tensor to a float-32 data type and compute the
+        # class activation map
+        cam = self.compute_cam(tf.cast(image, tf.float32))
 
         # grab the spatial dimensions of the input image and resize
         # the output class activation map to match the input image
@@ -91,4 +99,101 @@ class GradCAM:
         output = cv2.addWeighted(image, alpha, heatmap, 1 - alpha, 0)
         # return a 2-tuple of the color mapped heatmap and the output,
         # overlaid image
-        return heatmap, output
\ No newline at end of file
+        return heatmap, output
+
+
+class AsyncGradCAM:
+    """GradCAM overlay computed on a background thread, so it never blocks the brain.
+
+    The gradient model is built once, when the object is created. `submit` only hands a copy of the frame to the
+    worker thread, at most every `every_n_frames` frames and `rate` times per second; a frame submitted while the
+    previous one is still being processed replaces it. `callback` receives the overlaid image when it is ready.
+
+    Arguments:
+        model {tf.keras.Model} -- Keras model of the brain
+        callback {function} -- Function called (from the worker thread) with each overlaid image
+
+    Keyword Arguments:
+        every_n_frames {int} -- Compute the heatmap of one of every n submitted frames (default: {1})
+        rate {float} -- Maximum heatmaps per second, None for no limit (default: {None})
+        alpha {float} -- Weight of the image in the overlay (default: {0.5})
+        layer_name {str} -- Layer of the heatmap, the last convolution if None (default: {None})
+    """
+
+    def __init__(self, model, callback, every_n_frames=1, rate=None, alpha=0.5, layer_name=None):
+        self.cam = GradCAM(model, None, layer_name)
+        self.callback = callback
+        self.every_n_frames = max(int(every_n_frames), 1)
+        self.min_interval = 1.0 / rate if rate else 0
+        self.alpha = alpha
+        self.frames = 0
+        self.computed_frames = 0
+        self.last_submit_time = None
+        self.pending = None
+        self.running = True
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def from_config(cls, model, callback, config):
+        """GradCAM of a brain from its `GradCAM` (default True), `GradCAMEveryN` and `GradCAMRate` options.
+
+        Returns:
+            AsyncGradCAM -- None if it is disabled or the model has no convolutional layer
+        """
+        config = config or {}
+        if not config.get('GradCAM', True):
+            return None
+        try:
+            return cls(model, callback, every_n_frames=config.get('GradCAMEveryN', 1),
+                       rate=config.get('GradCAMRate'))
+        except ValueError as err:
+            logger.warning(err)
+            return None
+
+    def submit(self, image, orig):
+        """Hand a frame to the worker, without waiting for its heatmap.
+
+        Arguments:
+            image {np.ndarray} -- Network input batch
+            orig {np.ndarray} -- Image the heatmap is overlaid on, with the size of the network input
+
+        Returns:
+            bool -- Whether the frame was handed to the worker
+        """
+        self.frames += 1
+        if (self.frames - 1) % self.every_n_frames:
+            return False
+        now = time.perf_counter()
+        if self.last_submit_time is not None and now - self.last_submit_time < self.min_interval:
+            return False
+        self.last_submit_time = now
+        # the brain buffers are reused by the next frames
+        frame = (np.array(image), np.array(orig))
+        with self.condition:
+            self.pending = frame
+            self.condition.notify()
+        return True
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or not self.running)
+                if not self.running:
+                    return
+                (image, orig) = self.pending
+                self.pending = None
+            try:
+                heatmap = self.cam.compute_heatmap(image)
+                (heatmap, output) = self.cam.overlay_heatmap(heatmap, orig, alpha=self.alpha)
+            except Exception as err:
+                logger.warning('GradCAM: {}'.format(err))
+                continue
+            self.computed_frames += 1
+            self.callback(output)
@@ -16,333 +16,175 @@ this program. If not, see <http://www.gnu.org/licenses/>.
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import shutil
 import time
 import os
-import rosbag
-import re
 
-from bagpy import bagreader
 from utils.logger import logger
+from utils import rosbag_reader
+from utils import aggregated_plots
+from utils import control_smoothness
+from utils import experiments_aggregation
+from utils.trajectory import Trajectory
 
 import pandas as pd
 import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-
-
-def circuit_distance_completed(checkpoints, lap_point):
-    previous_point = []
-    diameter = 0
-    for i, point in enumerate(checkpoints):
-        current_point = np.array([point['pose.pose.position.x'], point['pose.pose.position.y']])
-        if i != 0:
-            dist = (previous_point - current_point) ** 2
-            dist = np.sum(dist, axis=0)
-            dist = np.sqrt(dist)
-            diameter += dist
-        if point is lap_point:
-            break
-        previous_point = current_point
-    return diameter
-
-
-def get_metrics(experiment_metrics, experiment_metrics_bag_filename, map_waypoints, experiment_metrics_filename, config):
-    
-    time_counter = 5
-    while not os.path.exists(experiment_metrics_bag_filename):
-        time.sleep(1)
-        time_counter -= 1
-        if time_counter <= 0:
-            ValueError(f"{experiment_metrics_bag_filename} isn't a file!")
+
+METRICS_TOPICS_FIELDS = {
+    '/carla/ego_vehicle/odometry': rosbag_reader.POSE_FIELDS,
+    '/carla/npc_vehicle_1/odometry': rosbag_reader.POSE_FIELDS,
+    '/clock': rosbag_reader.CLOCK_FIELDS,
+    '/carla/ego_vehicle/collision': {'other_actor_id': np.int64},
+    '/carla/ego_vehicle/lane_invasion': {},
+    '/carla/ego_vehicle/speedometer': {'data': np.float64},
+    '/carla/ego_vehicle/vehicle_status': {
+        'control.throttle': np.float64,
+        'control.steer': np.float64,
+        'control.brake': np.float64,
+    },
+}
+
+def circuit_distance_completed(trajectory, lap_index=None):
+    if lap_index is None:
+        lap_index = len(trajectory) - 1
+    # Summed in order so the result matches the accumulated point-by-point distance
+    return sum(trajectory.step_distances()[:lap_index].tolist())
+
+
+def get_metrics(experiment_metrics, experiment_metrics_bag_filename, map_waypoints, experiment_metrics_filename, config,
+                topics=None):
+    """Metrics of an experiment, from the columns recorded in memory (`topics`) or read from its bag."""
+    if topics is None:
+        import rosbag
+
+        time_counter = 5
+        while not os.path.exists(experiment_metrics_bag_filename):
+            time.sleep(1)
+            time_counter -= 1
+            if time_counter <= 0:
+                ValueError(f"{experiment_metrics_bag_filename} isn't a file!")
+                return {}
+
+        try:
+            topics = rosbag_reader.read_topics(experiment_metrics_bag_filename, METRICS_TOPICS_FIELDS)
+        except rosbag.bag.ROSBagException:
             return {}
 
-    try:
-        bag_reader = bagreader(experiment_metrics_bag_filename)
-    except rosbag.bag.ROSBagException:
-        return {}
+    speedometer = topics['/carla/ego_vehicle/speedometer']
+    vehicle_status = topics['/carla/ego_vehicle/vehicle_status']
+    trajectory = Trajectory.from_columns(topics['/carla/ego_vehicle/odometry'], speedometer, vehicle_status)
+    if config.task == 'follow_lane_traffic':
+        trajectory_2 = Trajectory.from_columns(topics['/carla/npc_vehicle_1/odometry'])
 
-    csv_files = []
-    for topic in bag_reader.topics:
-        data = bag_reader.message_by_topic(topic)
-        csv_files.append(data)
+    clock_secs = topics['/clock']['clock.secs']
+    seconds_start = float(clock_secs[0])
+    seconds_end = float(clock_secs[-1])
 
-    data_file = experiment_metrics_bag_filename.split('.bag')[0] + '/carla-ego_vehicle-odometry.csv'
-    dataframe_pose = pd.read_csv(data_file)
-    checkpoints = []
-    for index, row in dataframe_pose.iterrows():
-        checkpoints.append(row)
+    collision_points = topics['/carla/ego_vehicle/collision']
+    lane_invasion_points = topics['/carla/ego_vehicle/lane_invasion']
 
-    if config.task == 'follow_lane_traffic':
-        data_file = experiment_metrics_bag_filename.split('.bag')[0] + '/carla-npc_vehicle_1-odometry.csv'
-        dataframe_pose = pd.read_csv(data_file)
-        checkpoints_2 = []
-        for index, row in dataframe_pose.iterrows():
-            checkpoints_2.append(row)
-
-    data_file = experiment_metrics_bag_filename.split('.bag')[0] + '/clock.csv'
-    dataframe_clock = pd.read_csv(data_file)
-    clock_points = []
-    for index, row in dataframe_clock.iterrows():
-        clock_points.append(row)
-    start_clock = clock_points[0]
-    seconds_start = start_clock['clock.secs']
-    seconds_end = clock_points[len(clock_points) - 1]['clock.secs']
-
-    collision_points = []
-    if '/carla/ego_vehicle/collision' in bag_reader.topics:
-        data_file = experiment_metrics_bag_filename.split('.bag')[0] + '/carla-ego_vehicle-collision.csv'
-        dataframe_collision = pd.read_csv(data_file)
-        for index, row in dataframe_collision.iterrows():
-            collision_points.append(row)
-
-    lane_invasion_points = []
-    if '/carla/ego_vehicle/lane_invasion' in bag_reader.topics:
-        data_file = experiment_metrics_bag_filename.split('.bag')[0] + '/carla-ego_vehicle-lane_invasion.csv'
-        dataframe_lane_invasion = pd.read_csv(data_file, on_bad_lines='skip')
-        for index, row in dataframe_lane_invasion.iterrows():
-            lane_invasion_points.append(row)
-
-    data_file = experiment_metrics_bag_filename.split('.bag')[0] + '/carla-ego_vehicle-speedometer.csv'
-    dataframe_speedometer = pd.read_csv(data_file)
-    speedometer_points = []
-    for index, row in dataframe_speedometer.iterrows():
-        speedometer_points.append(row)
-
-    data_file = experiment_metrics_bag_filename.split('.bag')[0] + '/carla-ego_vehicle-vehicle_status.csv'
-    dataframe_vehicle_status = pd.read_csv(data_file)
-    vehicle_status_points = []
-    for index, row in dataframe_vehicle_status.iterrows():
-        vehicle_status_points.append(row)
-
-    if len(checkpoints) > 1:
-        starting_point = checkpoints[0]
-        starting_point = (starting_point['pose.pose.position.x'], starting_point['pose.pose.position.y'])
+    if len(trajectory) > 1:
+        starting_point = (float(trajectory.x[0]), float(trajectory.y[0]))
         experiment_metrics['starting_point'] = starting_point
-        experiment_metrics = get_distance_completed(experiment_metrics, checkpoints)
-        experiment_metrics = get_average_speed(experiment_metrics, speedometer_points)
-        experiment_metrics = get_suddenness_control_commands(experiment_metrics, vehicle_status_points)
-        experiment_metrics, collisions_checkpoints = get_collisions(experiment_metrics, collision_points, dataframe_pose)
-        experiment_metrics, lane_invasion_checkpoints = get_lane_invasions(experiment_metrics, lane_invasion_points, dataframe_pose)
+        experiment_metrics = get_distance_completed(experiment_metrics, trajectory)
+        experiment_metrics = get_average_speed(experiment_metrics, speedometer)
+        experiment_metrics = get_suddenness_control_commands(experiment_metrics, vehicle_status)
+        experiment_metrics, collisions_checkpoints = get_collisions(experiment_metrics, collision_points, trajectory)
+        experiment_metrics, lane_invasion_checkpoints = get_lane_invasions(experiment_metrics, lane_invasion_points, trajectory)
         experiment_metrics['experiment_total_simulated_time'] = seconds_end - seconds_start
         if config.task == 'follow_lane_traffic':
-            experiment_metrics = get_distance_other_vehicle(experiment_metrics, checkpoints, checkpoints_2)
+            experiment_metrics = get_distance_other_vehicle(experiment_metrics, trajectory, trajectory_2)
 
         if 'bird_eye_view_images' in experiment_metrics:
             experiment_metrics['bird_eye_view_images_per_second'] = experiment_metrics['bird_eye_view_images'] / experiment_metrics['experiment_total_simulated_time']
             experiment_metrics['bird_eye_view_unique_images_per_second'] = experiment_metrics['bird_eye_view_unique_images'] / experiment_metrics['experiment_total_simulated_time']
 
-        experiment_metrics = get_position_deviation_and_effective_completed_distance(experiment_metrics, checkpoints, map_waypoints, experiment_metrics_filename, speedometer_points, collisions_checkpoints, lane_invasion_checkpoints)
-        experiment_metrics['completed_laps'] = get_completed_laps(checkpoints, starting_point)
-        shutil.rmtree(experiment_metrics_bag_filename.split('.bag')[0])
+        experiment_metrics = get_position_deviation_and_effective_completed_distance(experiment_metrics, trajectory, map_waypoints, experiment_metrics_filename, speedometer, collisions_checkpoints, lane_invasion_checkpoints)
+        experiment_metrics['completed_laps'] = get_completed_laps(trajectory, starting_point)
         return experiment_metrics
     else:
         return {}
 
-def get_completed_laps(checkpoints, starting_point):
+def get_completed_laps(trajectory, starting_point):
     points_to_start_count = 50
+    dist = np.sqrt((starting_point[0] - trajectory.x) ** 2 + (starting_point[1] - trajectory.y) ** 2)
     completed_laps = 0
-    for x, checkpoint in enumerate(checkpoints):
-        if points_to_start_count > 0:
-            points_to_start_count -= 1
-        else:
-            point_1 = np.array([checkpoint['pose.pose.position.x'], checkpoint['pose.pose.position.y']])
-            point_2 = np.array([starting_point[0], starting_point[1]])
-            dist = (point_2 - point_1) ** 2
-            dist = np.sum(dist, axis=0)
-            dist = np.sqrt(dist)
-            if dist < 0.5:
-                completed_laps += 1
-                points_to_start_count = 50
+    # After each lap the next 50 points are ignored, so only the close points need to be walked
+    next_index = points_to_start_count
+    for index in np.flatnonzero(dist < 0.5):
+        if index >= next_index:
+            completed_laps += 1
+            next_index = index + points_to_start_count + 1
     
     return completed_laps
 
-def get_distance_completed(experiment_metrics, checkpoints):
-    end_point = checkpoints[len(checkpoints) - 1]
-    experiment_metrics['completed_distance'] = circuit_distance_completed(checkpoints, end_point)
+def get_distance_completed(experiment_metrics, trajectory):
+    experiment_metrics['completed_distance'] = circuit_distance_completed(trajectory)
     return experiment_metrics
 
 
 def get_average_speed(experiment_metrics, speedometer_points):
-    previous_speed = 0
-    speedometer_points_sum = 0
-    suddenness_distance_speeds = []
-    speed_points = []
-    for point in speedometer_points:
-        speed_point = point.data*3.6
-        speedometer_points_sum += speed_point
-        a = np.array(speed_point)
-        b = np.array(previous_speed)
-        suddenness_distance_speed = np.linalg.norm(a - b)
-        suddenness_distance_speeds.append(suddenness_distance_speed)
-        previous_speed = speed_point
-        speed_points.append(speed_point)
-
-    experiment_metrics['average_speed'] = (speedometer_points_sum/len(speedometer_points))
-    suddenness_distance_speed = sum(suddenness_distance_speeds) / len(suddenness_distance_speeds)
-    experiment_metrics['suddenness_distance_speed'] = suddenness_distance_speed
-    experiment_metrics['max_speed'] = max(speed_points)
-    experiment_metrics['min_speed'] = min(speed_points)
+    experiment_metrics.update(control_smoothness.speed_smoothness(speedometer_points['data']*3.6))
     return experiment_metrics
 
 
 def get_suddenness_control_commands(experiment_metrics, vehicle_status_points):
-    previous_commanded_throttle = 0
-    previous_commanded_steer = 0
-    previous_commanded_brake = 0
-    suddenness_distance_control_commands = []
-    suddenness_distance_throttle = []
-    suddenness_distance_steer = []
-    suddenness_distance_brake_command = []
-
-    for point in vehicle_status_points:
-        throttle = point['control.throttle']
-        steer = point['control.steer']
-        brake_command = point['control.brake']
-
-        a = np.array((throttle, steer, brake_command))
-        b = np.array((previous_commanded_throttle, previous_commanded_steer, previous_commanded_brake))
-        distance = np.linalg.norm(a - b)
-        suddenness_distance_control_commands.append(distance)
-
-        a = np.array((throttle))
-        b = np.array((previous_commanded_throttle))
-        distance_throttle = np.linalg.norm(a - b)
-        suddenness_distance_throttle.append(distance_throttle)
-
-        a = np.array((steer))
-        b = np.array((previous_commanded_steer))
-        distance_steer = np.linalg.norm(a - b)
-        suddenness_distance_steer.append(distance_steer)
-
-        a = np.array((brake_command))
-        b = np.array((previous_commanded_brake))
-        distance_brake_command = np.linalg.norm(a - b)
-        suddenness_distance_brake_command.append(distance_brake_command)
-
-        previous_commanded_throttle = throttle
-        previous_commanded_steer = steer
-        previous_commanded_brake = brake_command
-
-    experiment_metrics['suddenness_distance_control_commands'] = sum(suddenness_distance_control_commands) / len(suddenness_distance_control_commands)
-    experiment_metrics['suddenness_distance_throttle'] = sum(suddenness_distance_throttle) / len(suddenness_distance_throttle)
-    experiment_metrics['suddenness_distance_steer'] = sum(suddenness_distance_steer) / len(suddenness_distance_steer)
-    experiment_metrics['suddenness_distance_brake_command'] = sum(suddenness_distance_brake_command) / len(suddenness_distance_brake_command)
+    experiment_metrics.update(control_smoothness.control_smoothness(
+        vehicle_status_points['control.throttle'],
+        vehicle_status_points['control.steer'],
+        vehicle_status_points['control.brake']
+    ))
     return experiment_metrics
 
 
-def get_collisions(experiment_metrics, collision_points, df_checkpoints):
-    collisions_checkpoints = []
-    collisions_checkpoints_different = []
-    collisions_actors_different = []
-    previous_collisions_checkpoints_x, previous_collisions_checkpoints_y = 0, 0
-    for point in collision_points:
-        idx = (df_checkpoints['Time'] - point['Time']).abs().idxmin()
-        collision_point = df_checkpoints.iloc[idx]
-        collisions_checkpoints.append(collision_point)
-        point_1 = np.array([collision_point['pose.pose.position.x'], collision_point['pose.pose.position.y']])
-        point_2 = np.array([previous_collisions_checkpoints_x, previous_collisions_checkpoints_y])
-        dist = (point_2 - point_1) ** 2
-        dist = np.sum(dist, axis=0)
-        dist = np.sqrt(dist)
-        if dist > 1:
-            collisions_checkpoints_different.append(collision_point)
-            collisions_actors_different.append(point['other_actor_id'])
-        previous_collisions_checkpoints_x, previous_collisions_checkpoints_y = collision_point['pose.pose.position.x'], collision_point['pose.pose.position.y']
-
-    experiment_metrics['collisions'] = len(collisions_checkpoints_different)
-    experiment_metrics['collision_actor_ids'] = collisions_actors_different
+def get_collisions(experiment_metrics, collision_points, trajectory):
+    collisions_checkpoints = trajectory.take(trajectory.nearest_time_indices(collision_points['Time']))
+    previous_x = np.concatenate(([0], collisions_checkpoints.x[:-1]))
+    previous_y = np.concatenate(([0], collisions_checkpoints.y[:-1]))
+    dist = np.sqrt((previous_x - collisions_checkpoints.x) ** 2 + (previous_y - collisions_checkpoints.y) ** 2)
+    collisions_different = dist > 1
+
+    experiment_metrics['collisions'] = int(np.count_nonzero(collisions_different))
+    experiment_metrics['collision_actor_ids'] = collision_points['other_actor_id'][collisions_different].tolist()
     return experiment_metrics, collisions_checkpoints
 
-def get_lane_invasions(experiment_metrics, lane_invasion_points, df_checkpoints):
-    lane_invasion_checkpoints = []
-    lane_invasion_checkpoints_different = []
-    previous_lane_invasion_checkpoints_x, previous_lane_invasion_checkpoints_y = 0, 0
-    previous_time = 0
-    for point in lane_invasion_points:
-        idx = (df_checkpoints['Time'] - point['Time']).abs().idxmin()
-        lane_invasion_point = df_checkpoints.iloc[idx]
-
-        lane_invasion_checkpoints.append(lane_invasion_point)
-        point_1 = np.array([lane_invasion_point['pose.pose.position.x'], lane_invasion_point['pose.pose.position.y']])
-        point_2 = np.array([previous_lane_invasion_checkpoints_x, previous_lane_invasion_checkpoints_y])
-        dist = (point_2 - point_1) ** 2
-        dist = np.sum(dist, axis=0)
-        dist = np.sqrt(dist)
-        if dist > 1 and point['Time'] - previous_time > 0.5:
-            lane_invasion_checkpoints_different.append(lane_invasion_point)
-        previous_time = point['Time']
-        previous_lane_invasion_checkpoints_x, previous_lane_invasion_checkpoints_y = lane_invasion_point['pose.pose.position.x'], lane_invasion_point['pose.pose.position.y']
-
-    experiment_metrics['lane_invasions'] = len(lane_invasion_checkpoints_different)
+def get_lane_invasions(experiment_metrics, lane_invasion_points, trajectory):
+    lane_invasion_times = lane_invasion_points['Time']
+    lane_invasion_checkpoints = trajectory.take(trajectory.nearest_time_indices(lane_invasion_times))
+    previous_x = np.concatenate(([0], lane_invasion_checkpoints.x[:-1]))
+    previous_y = np.concatenate(([0], lane_invasion_checkpoints.y[:-1]))
+    previous_time = np.concatenate(([0], lane_invasion_times[:-1]))
+    dist = np.sqrt((previous_x - lane_invasion_checkpoints.x) ** 2 + (previous_y - lane_invasion_checkpoints.y) ** 2)
+    lane_invasions_different = (dist > 1) & (lane_invasion_times - previous_time > 0.5)
+
+    experiment_metrics['lane_invasions'] = int(np.count_nonzero(lane_invasions_different))
     return experiment_metrics, lane_invasion_checkpoints
 
-def get_position_deviation_and_effective_completed_distance(experiment_metrics, checkpoints, map_waypoints, experiment_metrics_filename, speedometer, collision_points, lane_invasion_checkpoints):
-    map_waypoints_tuples = []
-    map_waypoints_tuples_x = []
-    map_waypoints_tuples_y = []
-    for waypoint in map_waypoints:
-        if (experiment_metrics['carla_map'] == 'Carla/Maps/Town04' or experiment_metrics['carla_map'] == 'Carla/Maps/Town04_Opt'):
-            map_waypoints_tuples_x.append(-waypoint.transform.location.x)
-            map_waypoints_tuples_y.append(waypoint.transform.location.y)
-            map_waypoints_tuples.append((-waypoint.transform.location.x, waypoint.transform.location.y))
-        elif (experiment_metrics['carla_map'] == 'Carla/Maps/Town06' or experiment_metrics['carla_map'] == 'Carla/Maps/Town06_Opt'):
-            map_waypoints_tuples_x.append(waypoint.transform.location.x)
-            map_waypoints_tuples_y.append(-waypoint.transform.location.y)
-            map_waypoints_tuples.append((waypoint.transform.location.x, -waypoint.transform.location.y))
-        else:
-            map_waypoints_tuples_x.append(waypoint.transform.location.x)
-            map_waypoints_tuples_y.append(waypoint.transform.location.y)
-            map_waypoints_tuples.append((waypoint.transform.location.x, waypoint.transform.location.y))
-            
-    checkpoints_tuples = []
-    checkpoints_tuples_x = []
-    checkpoints_tuples_y = []
-    checkpoints_speeds = []
-    for i, point in enumerate(checkpoints):
-        current_checkpoint = np.array([point['pose.pose.position.x'], point['pose.pose.position.y'], speedometer[i]['data']*3.6])
-        if (experiment_metrics['carla_map'] == 'Carla/Maps/Town01' or experiment_metrics['carla_map'] == 'Carla/Maps/Town02' or \
-            experiment_metrics['carla_map'] == 'Carla/Maps/Town01_Opt' or experiment_metrics['carla_map'] == 'Carla/Maps/Town02_Opt'):
-            checkpoint_x = (max(map_waypoints_tuples_x) + min(map_waypoints_tuples_x))-current_checkpoint[0]
-            checkpoint_y = -point['pose.pose.position.y']
-        elif (experiment_metrics['carla_map'] == 'Carla/Maps/Town03' or experiment_metrics['carla_map'] == 'Carla/Maps/Town07' or \
-            experiment_metrics['carla_map'] == 'Carla/Maps/Town03_Opt' or experiment_metrics['carla_map'] == 'Carla/Maps/Town07_Opt'):
-            checkpoint_x = current_checkpoint[0]
-            checkpoint_y = -current_checkpoint[1]
-        elif (experiment_metrics['carla_map'] == 'Carla/Maps/Town04' or experiment_metrics['carla_map'] == 'Carla/Maps/Town04_Opt'):
-            checkpoint_x = -current_checkpoint[0]
-            checkpoint_y = -current_checkpoint[1]
-        else:
-            checkpoint_x = current_checkpoint[0]
-            checkpoint_y = current_checkpoint[1]
-        checkpoints_tuples_x.append(checkpoint_x)
-        checkpoints_tuples_y.append(checkpoint_y)
-        checkpoints_speeds.append(current_checkpoint[2])
-        checkpoints_tuples.append((checkpoint_x, checkpoint_y, current_checkpoint[2]))
-    min_dists = []
-    best_checkpoint_points_x = []
-    best_checkpoint_points_y = []
-
-    covered_checkpoints = []
-    for error_counter, checkpoint in enumerate(checkpoints_tuples):
-        min_dist = 100
-        for x, perfect_checkpoint in enumerate(map_waypoints_tuples):
-            point_1 = np.array([checkpoint[0], checkpoint[1]])
-            point_2 = np.array([perfect_checkpoint[0], perfect_checkpoint[1]])
-            dist = (point_2 - point_1) ** 2
-            dist = np.sum(dist, axis=0)
-            dist = np.sqrt(dist)
-            if dist < min_dist:
-                min_dist = dist
-                best_checkpoint = x
-                best_checkpoint_point_x = point_2[0]
-                best_checkpoint_point_y = point_2[1]
-        best_checkpoint_points_x.append(best_checkpoint_point_x)
-        best_checkpoint_points_y.append(best_checkpoint_point_y)
-        if min_dist < 100:
-            min_dists.append(min_dist)
-            if len(covered_checkpoints) == 0 or (len(covered_checkpoints) > 0 and covered_checkpoints[len(covered_checkpoints)-1][0] != best_checkpoint_point_x and covered_checkpoints[len(covered_checkpoints)-1][1] != best_checkpoint_point_y):
-                if min_dist < 1:
-                    covered_checkpoints.append((best_checkpoint_point_x, best_checkpoint_point_y))
+def transform_checkpoints_to_map(carla_map, checkpoints_x, checkpoints_y, map_waypoints_x):
+    checkpoints_x = np.asarray(checkpoints_x, dtype=np.float64)
+    checkpoints_y = np.asarray(checkpoints_y, dtype=np.float64)
+    if (carla_map == 'Carla/Maps/Town01' or carla_map == 'Carla/Maps/Town02' or \
+        carla_map == 'Carla/Maps/Town01_Opt' or carla_map == 'Carla/Maps/Town02_Opt'):
+        return (np.max(map_waypoints_x) + np.min(map_waypoints_x)) - checkpoints_x, -checkpoints_y
+    elif (carla_map == 'Carla/Maps/Town03' or carla_map == 'Carla/Maps/Town07' or \
+        carla_map == 'Carla/Maps/Town03_Opt' or carla_map == 'Carla/Maps/Town07_Opt'):
+        return checkpoints_x, -checkpoints_y
+    elif (carla_map == 'Carla/Maps/Town04' or carla_map == 'Carla/Maps/Town04_Opt'):
+        return -checkpoints_x, -checkpoints_y
+    return checkpoints_x, checkpoints_y
+
+
+def get_position_deviation_and_effective_completed_distance(experiment_metrics, trajectory, map_waypoints, experiment_metrics_filename, speedometer, collision_points, lane_invasion_checkpoints):
+    carla_map = experiment_metrics['carla_map']
+    map_waypoints_tuples_x, map_waypoints_tuples_y = map_waypoints.x, map_waypoints.y
+    waypoint_index = map_waypoints.index
+
+    checkpoints_tuples_x, checkpoints_tuples_y = transform_checkpoints_to_map(carla_map, trajectory.x, trajectory.y, map_waypoints_tuples_x)
+    # Speeds are matched to the odometry by message order
+    checkpoints_speeds = speedometer['data'][:len(trajectory)]*3.6
+
+    # All the nearest waypoint queries are answered at once by the spatial index
+    min_dists, best_checkpoint_points_x, best_checkpoint_points_y, covered_checkpoints = waypoint_index.match(
+        checkpoints_tuples_x, checkpoints_tuples_y)
 
     experiment_metrics['effective_completed_distance'] = len(covered_checkpoints)*0.5
     experiment_metrics['position_deviation_mean'] = sum(min_dists) / len(min_dists)  
@@ -417,27 +259,9 @@ def create_experiment_maps(experiment_metrics, experiment_metrics_filename, map_
 
 
 def create_collisions_map(experiment_metrics, experiment_metrics_filename, map_waypoints_tuples_x, map_waypoints_tuples_y, checkpoints_tuples_x, checkpoints_tuples_y, checkpoints_speeds, starting_point_landmark, finish_point_landmark, collision_points):
-    collision_checkpoints_tuples_x = []
-    collision_checkpoints_tuples_y = []
-    for i, point in enumerate(collision_points):
-        current_checkpoint = np.array([point['pose.pose.position.x'], point['pose.pose.position.y']])
-        if (experiment_metrics['carla_map'] == 'Carla/Maps/Town01' or experiment_metrics['carla_map'] == 'Carla/Maps/Town02' or \
-            experiment_metrics['carla_map'] == 'Carla/Maps/Town01_Opt' or experiment_metrics['carla_map'] == 'Carla/Maps/Town02_Opt'):
-            checkpoint_x = (max(map_waypoints_tuples_x) + min(map_waypoints_tuples_x))-current_checkpoint[0]
-            checkpoint_y = -point['pose.pose.position.y']
-        elif (experiment_metrics['carla_map'] == 'Carla/Maps/Town03' or experiment_metrics['carla_map'] == 'Carla/Maps/Town07' or \
-            experiment_metrics['carla_map'] == 'Carla/Maps/Town03_Opt' or experiment_metrics['carla_map'] == 'Carla/Maps/Town07_Opt'):
-            checkpoint_x = current_checkpoint[0]
-            checkpoint_y = -current_checkpoint[1]
-        elif (experiment_metrics['carla_map'] == 'Carla/Maps/Town04' or experiment_metrics['carla_map'] == 'Carla/Maps/Town04_Opt'):
-            checkpoint_x = -current_checkpoint[0]
-            checkpoint_y = -current_checkpoint[1]
-        else:
-            checkpoint_x = current_checkpoint[0]
-            checkpoint_y = current_checkpoint[1]
-        collision_checkpoints_tuples_x.append(checkpoint_x)
-        collision_checkpoints_tuples_y.append(checkpoint_y)
-
+    collision_checkpoints_tuples_x, collision_checkpoints_tuples_y = transform_checkpoints_to_map(
+        experiment_metrics['carla_map'], collision_points.x, collision_points.y, map_waypoints_tuples_x
+    )
 
     fig = plt.figure(figsize=(30,30))
     ax = fig.add_subplot()
@@ -458,27 +282,9 @@ def create_collisions_map(experiment_metrics, experiment_metrics_filename, map_w
 
 
 def create_lane_invasions_map(experiment_metrics, experiment_metrics_filename, map_waypoints_tuples_x, map_waypoints_tuples_y, checkpoints_tuples_x, checkpoints_tuples_y, checkpoints_speeds, starting_point_landmark, finish_point_landmark, lane_invasion_checkpoints):
-    lane_invasion_checkpoints_tuples_x = []
-    lane_invasion_checkpoints_tuples_y = []
-    for i, point in enumerate(lane_invasion_checkpoints):
-        current_checkpoint = np.array([point['pose.pose.position.x'], point['pose.pose.position.y']])
-        if (experiment_metrics['carla_map'] == 'Carla/Maps/Town01' or experiment_metrics['carla_map'] == 'Carla/Maps/Town02' or \
-            experiment_metrics['carla_map'] == 'Carla/Maps/Town01_Opt' or experiment_metrics['carla_map'] == 'Carla/Maps/Town02_Opt'):
-            checkpoint_x = (max(map_waypoints_tuples_x) + min(map_waypoints_tuples_x))-current_checkpoint[0]
-            checkpoint_y = -point['pose.pose.position.y']
-        elif (experiment_metrics['carla_map'] == 'Carla/Maps/Town03' or experiment_metrics['carla_map'] == 'Carla/Maps/Town07' or \
-            experiment_metrics['carla_map'] == 'Carla/Maps/Town03_Opt' or experiment_metrics['carla_map'] == 'Carla/Maps/Town07_Opt'):
-            checkpoint_x = current_checkpoint[0]
-            checkpoint_y = -current_checkpoint[1]
-        elif (experiment_metrics['carla_map'] == 'Carla/Maps/Town04' or experiment_metrics['carla_map'] == 'Carla/Maps/Town04_Opt'):
-            checkpoint_x = -current_checkpoint[0]
-            checkpoint_y = -current_checkpoint[1]
-        else:
-            checkpoint_x = current_checkpoint[0]
-            checkpoint_y = current_checkpoint[1]
-        lane_invasion_checkpoints_tuples_x.append(checkpoint_x)
-        lane_invasion_checkpoints_tuples_y.append(checkpoint_y)
-
+    lane_invasion_checkpoints_tuples_x, lane_invasion_checkpoints_tuples_y = transform_checkpoints_to_map(
+        experiment_metrics['carla_map'], lane_invasion_checkpoints.x, lane_invasion_checkpoints.y, map_waypoints_tuples_x
+    )
 
     fig = plt.figure(figsize=(30,30))
     ax = fig.add_subplot()
@@ -498,27 +304,13 @@ def create_lane_invasions_map(experiment_metrics, experiment_metrics_filename, m
     fig.savefig(experiment_metrics_filename + '_lane_invasion.png', dpi=fig.dpi)
 
 
-def get_aggregated_experiments_list(experiments_starting_time):
-    current_experiment_folders = []
-    root = './'
-    folders = list(os.walk(root))[1:]
-    for folder in folders:
-        if len(folder[0].split('/')) == 2 and folder[2] and experiments_starting_time < os.stat(folder[0]).st_mtime and re.search("\./[0-9]+-[0-9]+", folder[0]):
-            current_experiment_folders.append(folder)
-    current_experiment_folders.sort()
+def get_aggregated_experiments_list(experiments_starting_time, root='./', jobs=None):
+    # Experiments of this run are the ones whose metrics were written after it started
+    result = experiments_aggregation.aggregate_experiments(root, jobs=jobs)
+    result = result.loc[result[experiments_aggregation.EXPERIMENT_MTIME_COLUMN] > experiments_starting_time]
+    result = result.drop(columns=[experiments_aggregation.EXPERIMENT_FOLDER_COLUMN,
+                                  experiments_aggregation.EXPERIMENT_MTIME_COLUMN])
 
-    dataframes = []
-    for folder in current_experiment_folders:
-        try:
-            r = re.compile(".*\.json")
-            json_list = list(filter(r.match, folder[2])) # Read Note below
-            df = pd.read_json(folder[0] + '/' + json_list[0], orient='index').T
-            dataframes.append(df)
-        except:
-            print('Broken experiment: ' + folder[0])
-            shutil.rmtree(folder[0])
-
-    result = pd.concat(dataframes)
     result.index = result['timestamp'].values.tolist()
     result.loc[result['collisions'] > 0, 'position_deviation_mean'] = float("nan")
     result.loc[result['collisions'] > 0, 'effective_completed_distance'] = float("nan")
@@ -539,149 +331,30 @@ def get_aggregated_experiments_list(experiments_starting_time):
 
     return result
 
-def get_maps_colors():
-    maps_colors = {
-        'Carla/Maps/Town01': 'red', 
-        'Carla/Maps/Town02': 'green', 
-        'Carla/Maps/Town03': 'blue', 
-        'Carla/Maps/Town04': 'grey', 
-        'Carla/Maps/Town05': 'black', 
-        'Carla/Maps/Town06': 'pink', 
-        'Carla/Maps/Town07': 'orange', 
-    }
-    return maps_colors
-
-def get_color_handles():
-    red_patch = mpatches.Patch(color='red', label='Map01')
-    green_patch = mpatches.Patch(color='green', label='Map02')
-    blue_patch = mpatches.Patch(color='blue',  label='Map03')
-    grey_patch = mpatches.Patch(color='grey',  label='Map04')
-    black_patch = mpatches.Patch(color='black',  label='Map05')
-    pink_patch = mpatches.Patch(color='pink',  label='Map06')
-    orange_patch = mpatches.Patch(color='orange',  label='Map07')
-    color_handles = [red_patch, green_patch, blue_patch, grey_patch, black_patch, pink_patch, orange_patch]
-
-    return color_handles
-
-
-def get_all_experiments_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles):
-    maps_colors = get_maps_colors()
-    color_handles = get_color_handles()
-    colors = []
-    for i in result['carla_map']:
-        colors.append(maps_colors[i])
-
-    for experiment_metric_and_title in experiments_metrics_and_titles:
-        fig = plt.figure(figsize=(40,10))
-        result[experiment_metric_and_title['metric']].plot.bar(color=colors)
-        plt.title(experiment_metric_and_title['title'])
-        fig.tight_layout()
-        plt.xticks(rotation=90)
-        plt.legend(handles=color_handles)
-        plt.savefig(experiments_starting_time_str + '/' + experiment_metric_and_title['metric'] + '.png')
-        plt.close()
-
-def get_per_model_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles):
-    maps_colors = get_maps_colors()
-    color_handles = get_color_handles()
-    unique_experiment_models = result['experiment_model'].unique()
-            
-    for unique_experiment_model in unique_experiment_models:
-        unique_model_experiments = result.loc[result['experiment_model'].eq(unique_experiment_model)]
-        colors = []
-        for i in unique_model_experiments['carla_map']:
-            colors.append(maps_colors[i])
-
-        for experiment_metric_and_title in experiments_metrics_and_titles:
-            fig = plt.figure(figsize=(40,10))
-            unique_model_experiments[experiment_metric_and_title['metric']].plot.bar(color=colors)
-            plt.title(experiment_metric_and_title['title'] + ' with ' + unique_experiment_model)
-            fig.tight_layout()
-            plt.xticks(rotation=90)
-            plt.legend(handles=color_handles)
-            if len(unique_experiment_model.split('/')) > 1:
-                unique_experiment_model = unique_experiment_model.split('/')[-1]
-            plt.savefig(experiments_starting_time_str + '/' + unique_experiment_model + '_' + experiment_metric_and_title['metric'] + '.png')
-            plt.close()
-
-def get_all_experiments_aggregated_metrics_boxplot(result, experiments_starting_time_str, experiments_metrics_and_titles):
-    maps_colors = get_maps_colors()
-    color_handles = get_color_handles()
-    for experiment_metric_and_title in experiments_metrics_and_titles:
-        fig = plt.figure(figsize=(40,10))
-        dataframes = []
-        max_value = 0
-        for x, model_name in enumerate(result['experiment_model'].unique()):
-            for y, carla_map in enumerate(result['carla_map'].unique()):
-                com_dict = {
-                    'model_name': model_name,
-                    model_name+'-'+carla_map: result.loc[(result['experiment_model']==model_name) & (result['carla_map']==carla_map)][experiment_metric_and_title['metric']].tolist(),
-                    'carla_map': carla_map
-                }
-                df = pd.DataFrame(data=com_dict)
-                dataframes.append(df)
-                if df[model_name+'-'+carla_map].max()> max_value:
-                    max_value = df[model_name+'-'+carla_map].max()
-
-        full_list = []
-        colors = []
-        for carla_map in result['carla_map'].unique().tolist():
-            for experiment_model in result['experiment_model'].unique().tolist():
-                full_list.append(experiment_model+'-'+carla_map)
-                colors.append(maps_colors[carla_map])
-
-        result_by_experiment_model = pd.concat(dataframes)
-        ax,props = result_by_experiment_model.boxplot(column=full_list, showfliers=True, sym='k.', return_type='both', patch_artist=True)
-
-        plt.title(experiment_metric_and_title['title'] + ' boxplot')
-
-        for patch,color in zip(props['boxes'],colors):
-            patch.set_facecolor(color)
-
-        plt.legend(handles=color_handles)
-        
-        plt.xticks(rotation=90)
-        if max_value > 0:
-            plt.ylim(0, max_value+max_value*0.1)
-        plt.savefig(experiments_starting_time_str + '/' + experiment_metric_and_title['metric'] + '_boxplot.png', bbox_inches='tight')
-        plt.close()
-
-def get_distance_other_vehicle(experiment_metrics, checkpoints, checkpoints_2):
-    dangerous_distance = 0  
-    close_distance = 0
-    medium_distance = 0
-    great_distance = 0
-    total_distance = 0
-    
-    dangerous_distance_pct_km = 0  
-    close_distance_pct_km = 0
-    medium_distance_pct_km = 0
-    great_distance_pct_km = 0
-    total_distance_pct_km = 0
-
-    for i, (point, point_2) in enumerate(zip(checkpoints, checkpoints_2)):
-        current_checkpoint = np.array([point['pose.pose.position.x'], point['pose.pose.position.y']])
-        current_checkpoint_2 = np.array([point_2['pose.pose.position.x'], point_2['pose.pose.position.y']])
-        
-        if i != 0:
-            distance_front = np.linalg.norm(current_checkpoint - current_checkpoint_2)
-            distance = np.linalg.norm(previous_point - current_checkpoint)
-
-            # Analyzing
-            if 20 < distance_front < 50:
-                great_distance += distance
-                total_distance += distance
-            elif 15 < distance_front <= 20:
-                medium_distance += distance
-                total_distance += distance
-            elif 6 < distance_front <= 15:
-                close_distance += distance
-                total_distance += distance
-            elif distance_front <= 6:
-                dangerous_distance += distance
-                total_distance += distance
-                
-        previous_point = current_checkpoint
+def get_all_experiments_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles, jobs=None):
+    aggregated_plots.render_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles,
+                                               kinds=['experiments'], jobs=jobs)
+
+def get_per_model_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles, jobs=None):
+    aggregated_plots.render_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles,
+                                               kinds=['models'], jobs=jobs)
+
+def get_all_experiments_aggregated_metrics_boxplot(result, experiments_starting_time_str, experiments_metrics_and_titles, jobs=None):
+    aggregated_plots.render_aggregated_metrics(result, experiments_starting_time_str, experiments_metrics_and_titles,
+                                               kinds=['boxplot'], jobs=jobs)
+
+def get_distance_other_vehicle(experiment_metrics, trajectory, trajectory_2):
+    length = min(len(trajectory), len(trajectory_2))
+    x, y = trajectory.x[:length], trajectory.y[:length]
+    distance_front = np.sqrt((x - trajectory_2.x[:length]) ** 2 + (y - trajectory_2.y[:length]) ** 2)[1:]
+    distance = trajectory.take(np.arange(length)).step_distances()
+
+    # Distances travelled are summed in order so the totals match the accumulated ones
+    great_distance = sum(distance[(20 < distance_front) & (distance_front < 50)].tolist())
+    medium_distance = sum(distance[(15 < distance_front) & (distance_front <= 20)].tolist())
+    close_distance = sum(distance[(6 < distance_front) & (distance_front <= 15)].tolist())
+    dangerous_distance = sum(distance[distance_front <= 6].tolist())
+    total_distance = sum(distance[distance_front < 50].tolist())
             
     experiment_metrics['dangerous_distance_km'] = dangerous_distance
     experiment_metrics['close_distance_km'] = close_distance
@@ -694,4 +367,4 @@ def get_distance_other_vehicle(experiment_metrics, checkpoints, checkpoints_2):
     experiment_metrics['medium_distance_pct_km'] = (total_distance and medium_distance / total_distance or 0) * 100
     experiment_metrics['great_distance_pct_km'] = (total_distance and great_distance / total_distance or 0) * 100
     
-    return experiment_metrics
\ No newline at end of file
+    return experiment_metrics
@@ -13,24 +13,38 @@ You should have received a copy of the GNU General Public License along with
 this program. If not, see <http://www.gnu.org/licenses/>.
 """
 
-import pandas as pd
 import numpy as np
-import shutil
 import time
 import os
-import rosbag
 
 from datetime import datetime
-from bagpy import bagreader
 from utils.logger import logger
+from utils import rosbag_reader
+from utils import perfect_lap
 
 from scipy.optimize import fmin, dual_annealing
 from scipy.interpolate import CubicSpline
+from scipy.spatial import cKDTree
 
 MIN_COMPLETED_DISTANCE_EXPERIMENT = 10
 MIN_PERCENTAGE_COMPLETED_EXPERIMENT = 0
 MIN_EXPERIMENT_TIME = 25
 LAP_COMPLETED_PERCENTAGE = 100
+# Maximum distance in meters to the perfect lap, and along it between two positions, to count as progress
+PERCENTAGE_COMPLETED_MAX_DISTANCE = 5
+# Spline samples per experiment point, nearest samples queried per perfect lap point, search window ahead of the
+# previous match (in experiment points), distance in meters above which the closest sample is refined and Newton
+# steps used to refine it
+POSITION_DEVIATION_SAMPLES_PER_POINT = 10
+POSITION_DEVIATION_NEAREST_SAMPLES = 16
+POSITION_DEVIATION_SEARCH_WINDOW = 100
+POSITION_DEVIATION_REFINE_DISTANCE = 1
+POSITION_DEVIATION_REFINE_ITERATIONS = 4
+
+METRICS_TOPICS_FIELDS = {
+    '/F1ROS/odom': rosbag_reader.ODOMETRY_FIELDS,
+    '/clock': rosbag_reader.CLOCK_FIELDS,
+}
 
 
 def is_finish_line(point, start_point):
@@ -50,50 +64,22 @@ def is_finish_line(point, start_point):
     return False
 
 
-def circuit_distance_completed(checkpoints, lap_point):
-    previous_point = []
-    diameter = 0
-    for i, point in enumerate(checkpoints):
-        current_point = np.array([point['pose.pose.position.x'], point['pose.pose.position.y']])
-        if i != 0:
-            dist = (previous_point - current_point) ** 2
-            dist = np.sum(dist, axis=0)
-            dist = np.sqrt(dist)
-            diameter += dist
-        if point is lap_point:
-            break
-        previous_point = current_point
-    return diameter
-
-
 def read_perfect_lap_rosbag(ground_truth_lap_file):
-    bag_reader = bagreader(ground_truth_lap_file)
-    csv_files = []
-    for topic in bag_reader.topics:
-        data = bag_reader.message_by_topic(topic)
-        csv_files.append(data)
-
-    ground_truth_file_split = ground_truth_lap_file.split('.bag')[0]
-    data_file = ground_truth_file_split + '/F1ROS-odom.csv'
-    dataframe_pose = pd.read_csv(data_file)
-    perfect_lap_checkpoints = []
-    for index, row in dataframe_pose.iterrows():
-        perfect_lap_checkpoints.append(row)
-
-    start_point = perfect_lap_checkpoints[0]
-    lap_point = 0
-    for ckp_iter, point in enumerate(perfect_lap_checkpoints):
-        if ckp_iter > 100 and is_finish_line(point, start_point):
-            if type(lap_point) == int:
-                lap_point = point
-                break
+    """Perfect lap checkpoints and circuit diameter of a circuit, read from the perfect lap cache."""
+    ground_truth = perfect_lap.get_perfect_lap(ground_truth_lap_file)
+    return ground_truth.checkpoints, ground_truth.circuit_diameter
 
-    circuit_diameter = circuit_distance_completed(perfect_lap_checkpoints, lap_point)
-    shutil.rmtree(ground_truth_lap_file.split('.bag')[0])
-    return perfect_lap_checkpoints, circuit_diameter
 
+def get_checkpoints_positions(checkpoints):
+    if isinstance(checkpoints, perfect_lap.Checkpoints):
+        return checkpoints.x, checkpoints.y
+    x = np.array([checkpoint['pose.pose.position.x'] for checkpoint in checkpoints], dtype=np.float64)
+    y = np.array([checkpoint['pose.pose.position.y'] for checkpoint in checkpoints], dtype=np.float64)
+    return x, y
 
-def get_metrics(stats_filename, perfect_lap_checkpoints, circuit_diameter):
+
+def get_metrics(stats_filename, perfect_lap_checkpoints, circuit_diameter, topics=None):
+    """Metrics of an experiment, from the columns recorded in memory (`topics`) or read from its bag."""
     empty_metrics = {
         "completed_distance": 0, 
         "average_speed": 0, 
@@ -115,58 +101,47 @@ def get_metrics(stats_filename, perfect_lap_checkpoints, circuit_diameter):
         "experiment_total_real_time": 0
     }
     experiment_metrics = {}
-    
-    time_counter = 5
-    while not os.path.exists(stats_filename):
-        time.sleep(1)
-        time_counter -= 1
-        if time_counter <= 0:
-            ValueError(f"{stats_filename} isn't a file!")
+
+    if topics is None:
+        import rosbag
+
+        time_counter = 5
+        while not os.path.exists(stats_filename):
+            time.sleep(1)
+            time_counter -= 1
+            if time_counter <= 0:
+                ValueError(f"{stats_filename} isn't a file!")
+                return empty_metrics
+
+        try:
+            topics = rosbag_reader.read_topics(stats_filename, METRICS_TOPICS_FIELDS)
+        except rosbag.bag.ROSBagException:
             return empty_metrics
 
-    try:
-        bag_reader = bagreader(stats_filename)
-    except rosbag.bag.ROSBagException:
-        return empty_metrics
+    x = np.asarray(topics['/F1ROS/odom']['pose.pose.position.x'], dtype=np.float64)
+    y = np.asarray(topics['/F1ROS/odom']['pose.pose.position.y'], dtype=np.float64)
+    clock_secs = np.asarray(topics['/clock']['clock.secs'], dtype=np.float64)
+    seconds_start = float(clock_secs[0])
+    seconds_end = float(clock_secs[-1])
 
-    csv_files = []
-    for topic in bag_reader.topics:
-        data = bag_reader.message_by_topic(topic)
-        csv_files.append(data)
-
-    data_file = stats_filename.split('.bag')[0] + '/F1ROS-odom.csv'
-    dataframe_pose = pd.read_csv(data_file)
-    checkpoints = []
-    for index, row in dataframe_pose.iterrows():
-        checkpoints.append(row)
-
-    data_file = stats_filename.split('.bag')[0] + '/clock.csv'
-    dataframe_pose = pd.read_csv(data_file)
-    clock_points = []
-    for index, row in dataframe_pose.iterrows():
-        clock_points.append(row)
-    start_clock = clock_points[0]
-    seconds_start = start_clock['clock.secs']
-    seconds_end = clock_points[len(clock_points) - 1]['clock.secs']
-
-    if len(checkpoints) > 1:
-        experiment_metrics = get_distance_completed(experiment_metrics, checkpoints)
+    if len(x) > 1:
+        experiment_metrics = get_distance_completed(experiment_metrics, x, y)
         experiment_metrics = get_average_speed(experiment_metrics, seconds_start, seconds_end)
-        experiment_metrics, lap_checkpoint = get_percentage_completed(experiment_metrics, checkpoints,
+        experiment_metrics, lap_checkpoint = get_percentage_completed(experiment_metrics, x, y,
                                                                     perfect_lap_checkpoints)
         experiment_metrics = get_lap_completed_stats(experiment_metrics, circuit_diameter, lap_checkpoint,
-                                                    start_clock, clock_points, checkpoints)
+                                                    clock_secs, len(x))
         experiment_metrics['experiment_total_simulated_time'] = seconds_end - seconds_start
         logger.info('* Experiment total simulated time ---> ' + str(experiment_metrics['experiment_total_simulated_time']))
-        shutil.rmtree(stats_filename.split('.bag')[0])
         return experiment_metrics
     else:
         return empty_metrics
 
 
-def get_distance_completed(experiment_metrics, checkpoints):
-    end_point = checkpoints[len(checkpoints) - 1]
-    experiment_metrics['completed_distance'] = circuit_distance_completed(checkpoints, end_point)
+def get_distance_completed(experiment_metrics, x, y):
+    # Summed in order so the result matches the accumulated point-by-point distance
+    step_distances = np.sqrt(np.diff(x) ** 2 + np.diff(y) ** 2)
+    experiment_metrics['completed_distance'] = sum(step_distances.tolist())
     logger.info('* Completed distance ---> ' + str(experiment_metrics['completed_distance']))
     return experiment_metrics
 
@@ -180,104 +155,200 @@ def get_average_speed(experiment_metrics, seconds_start, seconds_end):
     return experiment_metrics
 
 
-def get_percentage_completed(experiment_metrics, checkpoints, perfect_lap_checkpoints):
-    # Find starting position to calculate percentage
-    first_checkpoint = np.array([checkpoints[0]['pose.pose.position.x'], checkpoints[0]['pose.pose.position.y']])
-    perfect_point_iterator = 0
-    min_dist = 100
-    for position, perfect_checkpoint in enumerate(perfect_lap_checkpoints):
-        perfect_checkpoint = np.array(
-            [perfect_checkpoint['pose.pose.position.x'], perfect_checkpoint['pose.pose.position.y']])
-        dist = (perfect_checkpoint - first_checkpoint) ** 2
-        dist = np.sum(dist, axis=0)
-        dist = np.sqrt(dist)
-        if dist < min_dist:
-            min_dist = dist
-            perfect_point_iterator = position
+def project_on_lap(perfect_x, perfect_y, x, y):
+    """Project points on the closed polyline of the perfect lap.
+
+    Arguments:
+        perfect_x {np.ndarray} -- X coordinate of the perfect lap points
+        perfect_y {np.ndarray} -- Y coordinate of the perfect lap points
+        x {np.ndarray} -- X coordinate of the points to project
+        y {np.ndarray} -- Y coordinate of the points to project
+
+    Returns:
+        (np.ndarray, np.ndarray, float) -- Arc length along the lap of each projection, distance from each point to
+        the lap and length of the lap
+    """
+    segment_x = np.roll(perfect_x, -1) - perfect_x
+    segment_y = np.roll(perfect_y, -1) - perfect_y
+    segment_length_2 = segment_x ** 2 + segment_y ** 2
+    segment_length = np.sqrt(segment_length_2)
+    segment_start = np.concatenate(([0], np.cumsum(segment_length)[:-1]))
+    lap_length = segment_start[-1] + segment_length[-1]
+
+    # The closest segment starts or ends at the closest perfect lap point
+    _, nearest = cKDTree(np.column_stack((perfect_x, perfect_y))).query(np.column_stack((x, y)))
+    arc_length = np.empty(len(x))
+    distance = np.full(len(x), np.inf)
+    for segment in (nearest, (nearest - 1) % len(perfect_x)):
+        offset = (x - perfect_x[segment]) * segment_x[segment] + (y - perfect_y[segment]) * segment_y[segment]
+        u = np.clip(np.divide(offset, segment_length_2[segment], out=np.zeros(len(x)),
+                              where=segment_length_2[segment] > 0), 0, 1)
+        segment_distance = np.sqrt((x - perfect_x[segment] - u * segment_x[segment]) ** 2 +
+                                   (y - perfect_y[segment] - u * segment_y[segment]) ** 2)
+        closer = segment_distance < distance
+        distance[closer] = segment_distance[closer]
+        arc_length[closer] = segment_start[segment][closer] + u[closer] * segment_length[segment][closer]
+    return arc_length, distance, lap_length
+
+
+def get_percentage_completed(experiment_metrics, x, y, perfect_lap_checkpoints):
+    perfect_x, perfect_y = get_checkpoints_positions(perfect_lap_checkpoints)
+
+    # Progress along the perfect lap between consecutive positions on the track, wrapped around the start line.
+    # Positions away from the track and jumps along it do not count.
+    arc_length, distance, lap_length = project_on_lap(perfect_x, perfect_y, x, y)
+    on_track = np.flatnonzero(distance < PERCENTAGE_COMPLETED_MAX_DISTANCE)
+    progress_steps = np.diff(arc_length[on_track])
+    progress_steps = (progress_steps + lap_length / 2) % lap_length - lap_length / 2
+    progress_steps[np.abs(progress_steps) > PERCENTAGE_COMPLETED_MAX_DISTANCE] = 0
+    progress = np.concatenate(([0], np.cumsum(progress_steps)))
+
+    # The direction of travel is the one with the most progress
+    direction = 1 if progress.max(initial=0) >= -progress.min(initial=0) else -1
+    progress = direction * progress
+    experiment_metrics['percentage_completed'] = float(progress.max(initial=0) / lap_length * 100)
 
     lap_checkpoint = 0
-    # Direction 1
-    checkpoints_reached_dir_1 = 1
-    checkpoint_iterator = 1
-    perfect_point_iterator_dir_1 = perfect_point_iterator + 1
-    while checkpoint_iterator < len(checkpoints):
-        current_checkpoint = np.array([checkpoints[checkpoint_iterator]['pose.pose.position.x'], checkpoints[checkpoint_iterator]['pose.pose.position.y']])
-        perfect_checkpoint = np.array([perfect_lap_checkpoints[perfect_point_iterator_dir_1]['pose.pose.position.x'],
-                                       perfect_lap_checkpoints[perfect_point_iterator_dir_1]['pose.pose.position.y']])
-        dist = (perfect_checkpoint - current_checkpoint) ** 2
-        dist = np.sum(dist, axis=0)
-        dist = np.sqrt(dist)
-        if dist < 5:
-            checkpoints_reached_dir_1 += 1
-            perfect_point_iterator_dir_1 += 1
-            if checkpoints_reached_dir_1 / len(perfect_lap_checkpoints) == 1:
-                lap_checkpoint = checkpoint_iterator
-            if perfect_point_iterator_dir_1 >= len(perfect_lap_checkpoints):
-                perfect_point_iterator_dir_1 = 0
-        else:
-            checkpoint_iterator += 1
-    percentage_completed_dir_1 = (checkpoints_reached_dir_1 / len(perfect_lap_checkpoints)) * 100
-
-    # Direction 2
-    checkpoints_reached_dir_2 = 1
-    checkpoint_iterator = 1
-    perfect_point_iterator_dir_2 = perfect_point_iterator - 1
-    while checkpoint_iterator < len(checkpoints):
-        current_checkpoint = np.array([checkpoints[checkpoint_iterator]['pose.pose.position.x'], checkpoints[checkpoint_iterator]['pose.pose.position.y']])
-        perfect_checkpoint = np.array([perfect_lap_checkpoints[perfect_point_iterator_dir_2]['pose.pose.position.x'],
-                                       perfect_lap_checkpoints[perfect_point_iterator_dir_2]['pose.pose.position.y']])
-        dist = (perfect_checkpoint - current_checkpoint) ** 2
-        dist = np.sum(dist, axis=0)
-        dist = np.sqrt(dist)
-        if dist < 5:
-            checkpoints_reached_dir_2 += 1
-            perfect_point_iterator_dir_2 -= 1
-            if checkpoints_reached_dir_2 / len(perfect_lap_checkpoints) == 1:
-                lap_checkpoint = checkpoint_iterator
-            if perfect_point_iterator_dir_2 <= 0:
-                perfect_point_iterator_dir_2 = len(perfect_lap_checkpoints) - 1
-        else:
-            checkpoint_iterator += 1
-    percentage_completed_dir_2 = (checkpoints_reached_dir_2 / len(perfect_lap_checkpoints)) * 100
-    experiment_metrics['percentage_completed'] = percentage_completed_dir_1 if percentage_completed_dir_1 > percentage_completed_dir_2 else percentage_completed_dir_2
-    experiment_metrics = get_robot_position_deviation_score(perfect_lap_checkpoints, checkpoints, experiment_metrics)
+    lap_completed = np.flatnonzero(progress >= lap_length)
+    if len(lap_completed):
+        lap_checkpoint = int(on_track[lap_completed[0]])
+
+    experiment_metrics = get_robot_position_deviation_score(perfect_lap_checkpoints, x, y, experiment_metrics)
     return experiment_metrics, lap_checkpoint
 
 
-def get_robot_position_deviation_score(perfect_lap_checkpoints, checkpoints, experiment_metrics):
-    min_dists = []
+def get_robot_position_deviation_score(perfect_lap_checkpoints, point_x, point_y, experiment_metrics,
+                                       global_optimization=False):
+    """Position deviation of the experiment against the perfect lap.
 
-    # Get list of points
-    point_x = []
-    point_y = []
-    point_t = []
-    for x, checkpoint in enumerate(checkpoints):
-        point_x.append(checkpoint['pose.pose.position.x'])
-        point_y.append(checkpoint['pose.pose.position.y'])
-        point_t.append(x)
+    A natural spline is fitted to the experiment positions and, for every perfect lap point (in order, starting at the
+    one closest to the experiment start), the closest point on the spline ahead of the previous match is found.
+
+    Arguments:
+        point_x {np.ndarray} -- X coordinate of the experiment positions
+        point_y {np.ndarray} -- Y coordinate of the experiment positions
+        global_optimization {bool} -- Use the original per point `fmin`/`dual_annealing` search instead of the
+        sampled spline. Much slower, kept for comparison.
+    """
+    point_t = np.arange(len(point_x))
 
     # Generate a natural spline from points
     spline_x = CubicSpline(point_t, point_x, bc_type='natural')
     spline_y = CubicSpline(point_t, point_y, bc_type='natural')
 
     # Rotate the x and y to start according to checkpoints
-    min_dist = 100
-    index_t = -1
-    perfect_x = []
-    perfect_y = []
-    for i, checkpoint in enumerate(perfect_lap_checkpoints):
-        x = checkpoint['pose.pose.position.x']
-        y = checkpoint['pose.pose.position.y']
-        perfect_x.append(x)
-        perfect_y.append(y)
-
-        dist = np.sqrt((point_x[0] - x) ** 2 + (point_y[0] - y) ** 2)
-        if min_dist > dist:
-            min_dist = dist
-            index_t = i
-
-    perfect_x = perfect_x[index_t:] + perfect_x[:index_t]
-    perfect_y = perfect_y[index_t:] + perfect_y[:index_t]
+    perfect_x, perfect_y = get_checkpoints_positions(perfect_lap_checkpoints)
+    start_dists = np.sqrt((point_x[0] - perfect_x) ** 2 + (point_y[0] - perfect_y) ** 2)
+    index_t = int(np.argmin(start_dists)) if start_dists.min() < 100 else -1
+    perfect_x = np.roll(perfect_x, -index_t)
+    perfect_y = np.roll(perfect_y, -index_t)
+
+    if global_optimization:
+        min_dists = get_position_deviation_distances_optimization(spline_x, spline_y, point_t[-1], perfect_x, perfect_y)
+    else:
+        min_dists = get_position_deviation_distances_spline_samples(spline_x, spline_y, point_t[-1], perfect_x, perfect_y)
+
+    if len(min_dists):
+        experiment_metrics['position_deviation_mae'] = sum(min_dists) / len(min_dists)
+    else:
+        experiment_metrics['position_deviation_mae'] = 0
+        
+    experiment_metrics['position_deviation_total_err'] = sum(min_dists)
+    logger.info('* Position deviation MAE ---> ' + str(experiment_metrics['position_deviation_mae']))
+    logger.info('* Position deviation total error ---> ' + str(experiment_metrics['position_deviation_total_err']))
+    return experiment_metrics
+
+
+def get_position_deviation_distances_spline_samples(spline_x, spline_y, last_t, perfect_x, perfect_y):
+    # Sample the spline densely once and index the samples
+    step = 1 / POSITION_DEVIATION_SAMPLES_PER_POINT
+    samples_t = np.arange(int(last_t * POSITION_DEVIATION_SAMPLES_PER_POINT) + 1) * step
+    samples_x = spline_x(samples_t)
+    samples_y = spline_y(samples_t)
+    candidates_number = min(POSITION_DEVIATION_NEAREST_SAMPLES, len(samples_t))
+    _, candidates = cKDTree(np.column_stack((samples_x, samples_y))).query(np.column_stack((perfect_x, perfect_y)), k=candidates_number)
+    candidates = np.asarray(candidates).reshape(len(perfect_x), candidates_number)
+    window = POSITION_DEVIATION_SEARCH_WINDOW * POSITION_DEVIATION_SAMPLES_PER_POINT
+
+    # Match every perfect lap point with the closest sample ahead of the previous match
+    min_dists = []
+    previous_t = 0
+    previous_sample = 0
+    perfect_index = 0
+    count_same_t = 0
+    while True:
+        x = perfect_x[perfect_index]
+        y = perfect_y[perfect_index]
+
+        # The candidates are sorted by distance, so the first one inside the search window is the closest.
+        # Otherwise the window is scanned.
+        last_sample = previous_sample + window
+        point_candidates = candidates[perfect_index]
+        in_window = point_candidates[(point_candidates >= previous_sample) & (point_candidates <= last_sample)]
+        if len(in_window):
+            sample = int(in_window[0])
+        else:
+            window_x = samples_x[previous_sample:last_sample + 1]
+            window_y = samples_y[previous_sample:last_sample + 1]
+            sample = previous_sample + int(np.argmin((window_x - x) ** 2 + (window_y - y) ** 2))
+        current_t = float(samples_t[sample])
+        min_dist = float(np.sqrt((x - samples_x[sample]) ** 2 + (y - samples_y[sample]) ** 2))
+
+        # Refine on the continuous spline if minimum distance is greater than expected
+        if min_dist > POSITION_DEVIATION_REFINE_DISTANCE:
+            refined_t, refined_dist = refine_spline_distance(spline_x, spline_y, x, y, current_t,
+                                                             max(current_t - step, previous_t),
+                                                             min(current_t + step, last_t))
+            if refined_dist < min_dist:
+                current_t, min_dist = refined_t, refined_dist
+
+        # Two termination conditions:
+        # 1. Loop only till all the available points
+        if current_t > last_t - 1:
+            break
+
+        # 2. Terminate when converging to same point on spline
+        if abs(current_t - previous_t) < 0.01:
+            count_same_t += 1
+            if count_same_t > 3:
+                logger.info("Unexpected Behavior: Converging to same point")
+                break
+        else:
+            count_same_t = 0
+
+        previous_t = current_t
+        previous_sample = sample
+        min_dists.append(1000 ** min_dist)
+        perfect_index = (perfect_index + 1) % len(perfect_x)
+
+    return min_dists
+
+
+def refine_spline_distance(spline_x, spline_y, x, y, t, lower_t, upper_t):
+    """Closest point of the spline to (x, y) near t, with a few Newton steps on the squared distance.
+
+    Arguments:
+        t {float} -- Starting spline parameter
+        lower_t {float} -- Lower bound of the spline parameter
+        upper_t {float} -- Upper bound of the spline parameter
+
+    Returns:
+        tuple -- Refined spline parameter and its distance to (x, y)
+    """
+    for _ in range(POSITION_DEVIATION_REFINE_ITERATIONS):
+        dx = float(spline_x(t)) - x
+        dy = float(spline_y(t)) - y
+        dx_1, dy_1 = float(spline_x(t, 1)), float(spline_y(t, 1))
+        gradient = dx * dx_1 + dy * dy_1
+        hessian = dx_1 ** 2 + dy_1 ** 2 + dx * float(spline_x(t, 2)) + dy * float(spline_y(t, 2))
+        if hessian <= 0:
+            break
+        t = min(max(t - gradient / hessian, lower_t), upper_t)
+    return t, float(np.sqrt((x - spline_x(t)) ** 2 + (y - spline_y(t)) ** 2))
+
+
+def get_position_deviation_distances_optimization(spline_x, spline_y, last_t, perfect_x, perfect_y):
+    min_dists = []
 
     # Iterate through checkpoints and calculate minimum distance
     previous_t = 0
@@ -305,7 +376,7 @@ def get_robot_position_deviation_score(perfect_lap_checkpoints, checkpoints, exp
 
         # Two termination conditions:
         # 1. Loop only till all the available points
-        if current_t > point_t[-1] - 1:
+        if current_t > last_t - 1:
             break
 
         # 2. Terminate when converging to same point on spline
@@ -321,23 +392,14 @@ def get_robot_position_deviation_score(perfect_lap_checkpoints, checkpoints, exp
         min_dists.append(1000 ** min_dist)
         perfect_index = (perfect_index + 1) % len(perfect_x)
 
-    if len(min_dists):
-        experiment_metrics['position_deviation_mae'] = sum(min_dists) / len(min_dists)
-    else:
-        experiment_metrics['position_deviation_mae'] = 0
-        
-    experiment_metrics['position_deviation_total_err'] = sum(min_dists)
-    logger.info('* Position deviation MAE ---> ' + str(experiment_metrics['position_deviation_mae']))
-    logger.info('* Position deviation total error ---> ' + str(experiment_metrics['position_deviation_total_err']))
-    return experiment_metrics
+    return min_dists
 
 
-def get_lap_completed_stats(experiment_metrics, circuit_diameter, first_lap_point, start_clock,
-                            clock_points, checkpoints):
+def get_lap_completed_stats(experiment_metrics, circuit_diameter, first_lap_point, clock_secs, points_number):
     # If lap is completed, add more statistic information
     if experiment_metrics['percentage_completed'] > LAP_COMPLETED_PERCENTAGE:
-        seconds_start = start_clock['clock.secs']
-        seconds_end = clock_points[int(len(clock_points) * (first_lap_point / len(checkpoints)))]['clock.secs']
+        seconds_start = float(clock_secs[0])
+        seconds_end = float(clock_secs[int(len(clock_secs) * (first_lap_point / points_number))])
         experiment_metrics['lap_seconds'] = seconds_end - seconds_start
         experiment_metrics['circuit_diameter'] = circuit_diameter
         logger.info('* Lap seconds ---> ' + str(experiment_metrics['lap_seconds']))
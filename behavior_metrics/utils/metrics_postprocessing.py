@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+"""This module contains the CARLA experiments metrics post-processing.
+
+Computing the metrics of an experiment (reading the bag, scoring the position deviation and drawing the maps) does
+not need the simulator. The experiment process can then only close the bag and write a small manifest next to it,
+and a pool of workers in the driver computes the metrics while the next experiment runs. The metrics JSON is only
+written once the metrics are complete, so pending experiments are never aggregated.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import time
+import types
+import matplotlib.pyplot as plt
+
+from concurrent.futures import ProcessPoolExecutor, wait
+from utils import metrics_carla
+from utils import metrics_recorder
+from utils import waypoint_index
+from utils.constants import CARLA_INFRACTION_PENALTIES
+from utils.logger import logger
+
+MANIFEST_EXTENSION = '.pending'
+
+
+def complete_metrics(experiment_metrics, experiment_metrics_bag_filename, map_waypoints, experiment_metrics_filename,
+                     task, collision_actor_types, termination_code=None, route_length=None, topics=None):
+    """Compute the metrics of a finished experiment from its recorded topics, or from its bag if they are missing.
+
+    Arguments:
+        experiment_metrics {dict} -- Metrics gathered while the experiment was running
+        experiment_metrics_bag_filename {str} -- Metrics bag of the experiment
+        map_waypoints {MapWaypoints} -- Waypoints of the experiment map
+        experiment_metrics_filename {str} -- Prefix of the maps images
+        task {str} -- Task of the experiment
+        collision_actor_types {dict} -- Type (`vehicle`, `walker`, ...) of every actor in the collisions, by id
+        termination_code {int} -- Termination cause of a route experiment
+        route_length {float} -- Length of the route of a route experiment
+        topics {dict} -- Columns of the metrics topics recorded by a `MetricsRecorder`
+
+    Returns:
+        dict -- Complete metrics of the experiment
+    """
+    experiment_metrics = metrics_carla.get_metrics(experiment_metrics, experiment_metrics_bag_filename, map_waypoints,
+                                                   experiment_metrics_filename, types.SimpleNamespace(task=task),
+                                                   topics)
+    experiment_metrics['collisions_vehicle'] = 0
+    experiment_metrics['collisions_walker'] = 0
+    experiment_metrics['collisions_static'] = 0
+
+    for actor_id in experiment_metrics.get('collision_actor_ids', []):
+        actor_type = collision_actor_types.get(str(actor_id))
+        if actor_type:
+            if actor_type == 'vehicle':
+                experiment_metrics['collisions_vehicle'] += 1
+            elif actor_type == 'walker':
+                experiment_metrics['collisions_walker'] += 1
+            else:
+                experiment_metrics['collisions_static'] += 1
+        else:
+            print(f"No actor found with ID {actor_id}")
+
+    if 'traffic_light_infractions' in experiment_metrics:
+        experiment_metrics['traffic_light_infractions_per_km'] = experiment_metrics['traffic_light_infractions'] / (experiment_metrics['effective_completed_distance']/1000)
+
+    if route_length is not None:
+        experiment_metrics['route_completion'] = experiment_metrics['effective_completed_distance'] / route_length
+
+    wrong_turn_counter = 0
+    time_out_counter = 0
+    if termination_code is not None:
+        if termination_code == 1:
+            experiment_metrics['termination cause'] = 'success'
+        elif termination_code == 2:
+            wrong_turn_counter += 1
+            experiment_metrics['termination cause'] = 'wrong turn'
+        elif termination_code == 3:
+            time_out_counter += 1
+            experiment_metrics['termination cause'] = 'time out'
+
+    if 'route_completion' in experiment_metrics.keys() and 'traffic_light_infractions' in experiment_metrics.keys() and termination_code is not None:
+        experiment_metrics['driving score'] = experiment_metrics['route_completion'] * \
+                                              CARLA_INFRACTION_PENALTIES['collision_vehicle']**experiment_metrics['collisions_vehicle'] * \
+                                              CARLA_INFRACTION_PENALTIES['collision_static']**experiment_metrics['collisions_static'] * \
+                                              CARLA_INFRACTION_PENALTIES['collision_walker']**experiment_metrics['collisions_walker'] * \
+                                              CARLA_INFRACTION_PENALTIES['red_light']**experiment_metrics['traffic_light_infractions'] * \
+                                              CARLA_INFRACTION_PENALTIES['wrong_turn']**wrong_turn_counter * \
+                                              CARLA_INFRACTION_PENALTIES['time_out']**time_out_counter
+    return experiment_metrics
+
+
+def write_manifest(experiment_metrics_filename, manifest):
+    """Write the manifest of an experiment whose metrics are computed later.
+
+    Arguments:
+        experiment_metrics_filename {str} -- Experiment files prefix (`<folder>/<timestamp>`)
+        manifest {dict} -- Arguments of `complete_metrics`, with the map name and waypoints resolution instead of
+        the waypoints
+    """
+    manifest_filename = experiment_metrics_filename + MANIFEST_EXTENSION
+    tmp_filename = manifest_filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_filename, manifest_filename)
+    logger.info("Metrics post-processing queued in {}".format(manifest_filename))
+    return manifest_filename
+
+
+def process_manifest(manifest_filename):
+    """Compute the metrics of a queued experiment and write its metrics JSON.
+
+    Returns:
+        str -- Metrics JSON filename
+    """
+    with open(manifest_filename) as f:
+        manifest = json.load(f)
+    experiment_metrics_filename = manifest_filename[:-len(MANIFEST_EXTENSION)]
+    map_waypoints = waypoint_index.get_map_waypoints(manifest['carla_map'], manifest['waypoints_resolution'])
+    topics = None
+    if manifest.get('experiment_metrics_columns_filename'):
+        topics = metrics_recorder.load_columns(manifest['experiment_metrics_columns_filename'])
+    experiment_metrics = complete_metrics(manifest['experiment_metrics'], manifest['experiment_metrics_bag_filename'],
+                                          map_waypoints, experiment_metrics_filename, manifest['task'],
+                                          manifest['collision_actor_types'], manifest['termination_code'],
+                                          manifest['route_length'], topics)
+    with open(experiment_metrics_filename + '.json', 'w') as f:
+        json.dump(experiment_metrics, f)
+    os.remove(manifest_filename)
+    logger.info("Metrics stored in JSON file {}.json".format(experiment_metrics_filename))
+    return experiment_metrics_filename + '.json'
+
+
+def find_manifests(root, since=None):
+    """Manifests of the experiments under `root` whose metrics are pending.
+
+    Keyword Arguments:
+        since {float} -- Only the manifests written after this time (default: {None}, all of them)
+    """
+    manifests = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            with os.scandir(entry.path) as files:
+                manifests.extend(file.path for file in files if file.name.endswith(MANIFEST_EXTENSION) and
+                                 (since is None or file.stat().st_mtime >= since))
+    return sorted(manifests)
+
+
+def _init_worker():
+    plt.switch_backend('Agg')
+
+
+class MetricsPostprocessingQueue:
+    """Pool of workers computing the metrics of the finished experiments.
+
+    Only the manifests written since the queue was created are processed, so the failed experiments of previous
+    runs are not retried on every run.
+
+    Attributes:
+        root {str} -- Directory where the experiment folders are created
+        jobs {int} -- Number of worker processes
+        start_time {float} -- Creation time of the queue
+    """
+
+    def __init__(self, root, jobs=1):
+        self.root = root
+        self.jobs = jobs
+        self.start_time = time.time()
+        self.executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker)
+        self.futures = {}
+
+    def submit_pending(self):
+        """Queue the manifests written under the root by this run that are not queued yet."""
+        for manifest_filename in find_manifests(self.root, since=self.start_time):
+            if manifest_filename not in self.futures:
+                self.futures[manifest_filename] = self.executor.submit(process_manifest, manifest_filename)
+
+    def pending(self):
+        return sum(1 for future in self.futures.values() if not future.done())
+
+    def drain(self):
+        """Wait until all the queued experiments are processed.
+
+        The manifest of an experiment whose metrics fail is left in place, so its metrics can be computed again
+        with `process_manifest`.
+
+        Returns:
+            list -- Manifests of the experiments whose metrics failed
+        """
+        self.submit_pending()
+        logger.info('Waiting for the metrics of {} experiments'.format(self.pending()))
+        wait(list(self.futures.values()))
+        failed = []
+        for manifest_filename, future in self.futures.items():
+            if future.exception() is not None:
+                logger.error('Metrics post-processing failed for {}: {}'.format(manifest_filename, future.exception()))
+                failed.append(manifest_filename)
+        return failed
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+"""This module records the metrics topics of an experiment in memory.
+
+The recorder subscribes to the metrics topics inside the application and appends the message fields the metrics need
+to growable NumPy columns, so the metrics are computed straight from memory once the experiment finishes instead of
+recording a bag with a `rosbag record` process and parsing it back. The columns have the same layout as the ones
+returned by `rosbag_reader.read_topics`. The complete messages can still be written to a bag for archival by a
+background thread.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import operator
+import queue
+import threading
+import numpy as np
+import rosbag
+import rospy
+
+from utils.logger import logger
+from utils.rosbag_reader import TIME_COLUMN
+
+INITIAL_CAPACITY = 1024
+COLUMNS_SEPARATOR = '|'
+
+
+class TopicColumns:
+    """Columns of the recorded fields of a topic, preallocated and doubled when they are full.
+
+    Arguments:
+        fields {dict} -- Dotted message field to dtype
+        capacity {int} -- Initial number of rows
+    """
+
+    def __init__(self, fields, capacity=INITIAL_CAPACITY):
+        self.count = 0
+        self.columns = {TIME_COLUMN: np.empty(capacity, dtype=np.float64)}
+        for field, dtype in fields.items():
+            self.columns[field] = np.empty(capacity, dtype=dtype)
+        self.getters = [(field, operator.attrgetter(field)) for field in fields]
+
+    def append(self, timestamp, msg):
+        if self.count == len(self.columns[TIME_COLUMN]):
+            for field, column in self.columns.items():
+                grown = np.empty(2 * len(column), dtype=column.dtype)
+                grown[:self.count] = column
+                self.columns[field] = grown
+        i = self.count
+        self.columns[TIME_COLUMN][i] = timestamp
+        for field, getter in self.getters:
+            self.columns[field][i] = getter(msg)
+        self.count = i + 1
+        return i
+
+    def row(self, i):
+        """Recorded fields of the i-th message."""
+        return {field: self.columns[field][i] for field, getter in self.getters}
+
+    def to_dict(self):
+        """Copy of the recorded rows of every column."""
+        return {field: column[:self.count].copy() for field, column in self.columns.items()}
+
+
+class MetricsRecorder:
+    """Records the fields of the metrics topics in memory while an experiment runs.
+
+    Every message is stamped with the ROS time it is received at, as `rosbag record` does.
+
+    Arguments:
+        topics {dict} -- For each topic, a tuple with its message class and a dict mapping the dotted message fields
+        to record to their dtype
+
+    Keyword Arguments:
+        bag_filename {str} -- Bag where the complete messages are also written, from a background thread
+        (default: {None}, no bag)
+        listeners {list} -- Functions called with the topic, receive time and recorded fields (as a dict) of every
+        message, e.g. `CarlaMetricsStream.update` (default: {()})
+    """
+
+    def __init__(self, topics, bag_filename=None, listeners=()):
+        self.topics = topics
+        self.bag_filename = bag_filename
+        self.listeners = list(listeners)
+        self.lock = threading.Lock()
+        self.columns = {topic: TopicColumns(fields) for topic, (msg_class, fields) in topics.items()}
+        self.subscribers = []
+        self.bag_queue = None
+        self.bag_thread = None
+
+    def start(self):
+        if self.bag_filename is not None:
+            self.bag_queue = queue.Queue()
+            self.bag_thread = threading.Thread(target=self.__write_bag, daemon=True)
+            self.bag_thread.start()
+        for topic, (msg_class, fields) in self.topics.items():
+            self.subscribers.append(rospy.Subscriber(topic, msg_class, self.__callback, callback_args=topic))
+
+    def __callback(self, msg, topic):
+        stamp = rospy.get_rostime()
+        timestamp = stamp.secs + stamp.nsecs * 1e-9
+        with self.lock:
+            columns = self.columns[topic]
+            i = columns.append(timestamp, msg)
+            row = columns.row(i) if self.listeners else None
+        for listener in self.listeners:
+            listener(topic, timestamp, row)
+        if self.bag_queue is not None:
+            self.bag_queue.put((topic, msg, stamp))
+
+    def __write_bag(self):
+        with rosbag.Bag(self.bag_filename, 'w') as bag:
+            while True:
+                item = self.bag_queue.get()
+                if item is None:
+                    break
+                bag.write(*item)
+
+    def stop(self):
+        """Stop recording, waiting for the bag (if any) to be closed.
+
+        Returns:
+            dict -- For each topic, a dict with a `Time` column (receive time in seconds) and one array per field
+        """
+        for subscriber in self.subscribers:
+            subscriber.unregister()
+        self.subscribers = []
+        if self.bag_thread is not None:
+            self.bag_queue.put(None)
+            self.bag_thread.join()
+            self.bag_thread = None
+            logger.info("Metrics bag closed: {}".format(self.bag_filename))
+        return self.get_columns()
+
+    def get_columns(self):
+        with self.lock:
+            return {topic: columns.to_dict() for topic, columns in self.columns.items()}
+
+
+def save_columns(filename, topics_columns):
+    """Save recorded columns (see `MetricsRecorder.stop`) to a `.npz` file."""
+    arrays = {}
+    for topic, columns in topics_columns.items():
+        for field, column in columns.items():
+            arrays[topic + COLUMNS_SEPARATOR + field] = column
+    np.savez(filename, **arrays)
+
+
+def load_columns(filename):
+    """Columns saved with `save_columns`."""
+    topics_columns = {}
+    with np.load(filename) as arrays:
+        for key in arrays.files:
+            topic, field = key.split(COLUMNS_SEPARATOR, 1)
+            topics_columns.setdefault(topic, {})[field] = arrays[key]
+    return topics_columns
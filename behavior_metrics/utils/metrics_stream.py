@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+"""This module contains the live metrics of the CARLA experiments.
+
+The metrics are updated sample by sample while the experiment is recorded, so they can be shown before it ends.
+Every sample is processed in constant time (plus a nearest waypoint query in the prebuilt spatial index), and the
+values reached at the end of the experiment are the same ones computed from the whole recording by `metrics_carla`.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import collections
+import math
+import threading
+import numpy as np
+
+from utils.control_smoothness import ControlSmoothnessStream
+from utils.metrics_carla import transform_checkpoints_to_map
+
+ODOMETRY_TOPIC = '/carla/ego_vehicle/odometry'
+SPEEDOMETER_TOPIC = '/carla/ego_vehicle/speedometer'
+VEHICLE_STATUS_TOPIC = '/carla/ego_vehicle/vehicle_status'
+COLLISION_TOPIC = '/carla/ego_vehicle/collision'
+LANE_INVASION_TOPIC = '/carla/ego_vehicle/lane_invasion'
+CLOCK_TOPIC = '/clock'
+
+# Same thresholds as metrics_carla
+MAX_POSITION_DEVIATION = 100
+COVERED_WAYPOINT_DISTANCE = 1
+WAYPOINTS_RESOLUTION = 0.5
+DIFFERENT_EVENT_DISTANCE = 1
+DIFFERENT_LANE_INVASION_TIME = 0.5
+
+# Metrics normalized by the effective completed distance, with the metrics_carla names
+PER_KM_METRICS = (
+    ('collisions', 'collisions_per_km'),
+    ('lane_invasions', 'lane_invasions_per_km'),
+    ('position_deviation_mean', 'position_deviation_mean_per_km'),
+    ('suddenness_distance_control_commands', 'suddenness_distance_control_command_per_km'),
+    ('suddenness_distance_throttle', 'suddenness_distance_throttle_per_km'),
+    ('suddenness_distance_steer', 'suddenness_distance_steer_per_km'),
+    ('suddenness_distance_brake_command', 'suddenness_distance_brake_command_per_km'),
+    ('suddenness_distance_speed', 'suddenness_distance_speed_per_km'),
+)
+
+
+def _distance(a, b):
+    # Same expression as the vectorized metrics, so the thresholds give the same results
+    dx = a[0] - b[0]
+    dy = a[1] - b[1]
+    return math.sqrt(dx * dx + dy * dy)
+
+
+class CarlaMetricsStream:
+    """Metrics of a CARLA experiment, updated with every recorded message.
+
+    Collisions and lane invasions are located at the odometry sample closest in time, so an event is only counted
+    once there is odometry after it (or the experiment has finished).
+
+    Arguments:
+        map_waypoints {MapWaypoints} -- Waypoints of the experiment map, None to skip the position deviation
+        carla_map {str} -- Name of the experiment map
+    """
+
+    def __init__(self, map_waypoints=None, carla_map=None):
+        self.lock = threading.Lock()
+        self.carla_map = carla_map
+        self.waypoint_index = None
+        if map_waypoints is not None:
+            self.waypoint_index = map_waypoints.index
+            # The map extent is all the checkpoints transformation needs from the waypoints
+            self.map_x_bounds = np.array([np.max(map_waypoints.x), np.min(map_waypoints.x)])
+        self.smoothness = ControlSmoothnessStream()
+
+        self.odometry_t = []
+        self.odometry_x = []
+        self.odometry_y = []
+        self.completed_distance = 0
+
+        self.position_deviation_samples = 0
+        self.position_deviation_total_err = 0
+        self.position_deviation_max = 0
+        self.covered_waypoints = 0
+        self.last_covered_waypoint = None
+        self.best_waypoint = (np.nan, np.nan)
+
+        self.pending_collisions = collections.deque()
+        self.collisions = 0
+        self.collision_actor_ids = []
+        self.previous_collision = (0, 0)
+        self.pending_lane_invasions = collections.deque()
+        self.lane_invasions = 0
+        self.previous_lane_invasion = (0, 0)
+        self.previous_lane_invasion_time = 0
+
+        self.clock_start = None
+        self.clock_end = None
+
+    def update(self, topic, timestamp, row):
+        """Add a recorded message (see `MetricsRecorder`).
+
+        Arguments:
+            topic {str} -- Topic of the message
+            timestamp {float} -- Receive time of the message in seconds
+            row {dict} -- Recorded fields of the message
+        """
+        with self.lock:
+            if topic == ODOMETRY_TOPIC:
+                self.__update_odometry(timestamp, row['pose.pose.position.x'], row['pose.pose.position.y'])
+            elif topic == SPEEDOMETER_TOPIC:
+                self.smoothness.update_speed(row['data'] * 3.6)
+            elif topic == VEHICLE_STATUS_TOPIC:
+                self.smoothness.update_control(row['control.throttle'], row['control.steer'], row['control.brake'])
+            elif topic == COLLISION_TOPIC:
+                self.pending_collisions.append((timestamp, row['other_actor_id']))
+                self.__resolve_events()
+            elif topic == LANE_INVASION_TOPIC:
+                self.pending_lane_invasions.append(timestamp)
+                self.__resolve_events()
+            elif topic == CLOCK_TOPIC:
+                if self.clock_start is None:
+                    self.clock_start = row['clock.secs']
+                self.clock_end = row['clock.secs']
+
+    def __update_odometry(self, t, x, y):
+        if self.odometry_x:
+            self.completed_distance += _distance((x, y), (self.odometry_x[-1], self.odometry_y[-1]))
+        self.odometry_t.append(t)
+        self.odometry_x.append(x)
+        self.odometry_y.append(y)
+        if self.waypoint_index is not None:
+            self.__update_position_deviation(x, y)
+        self.__resolve_events()
+
+    def __update_position_deviation(self, x, y):
+        map_x, map_y = transform_checkpoints_to_map(self.carla_map, [x], [y], self.map_x_bounds)
+        indices, distances = self.waypoint_index.nearest(map_x, map_y)
+        distance = distances[0]
+        if distance >= MAX_POSITION_DEVIATION:
+            return
+        self.best_waypoint = (self.waypoint_index.x[indices[0]], self.waypoint_index.y[indices[0]])
+        self.position_deviation_samples += 1
+        self.position_deviation_total_err += distance
+        self.position_deviation_max = max(self.position_deviation_max, distance)
+        last = self.last_covered_waypoint
+        if last is None or (last[0] != self.best_waypoint[0] and last[1] != self.best_waypoint[1]):
+            if distance < COVERED_WAYPOINT_DISTANCE:
+                self.covered_waypoints += 1
+                self.last_covered_waypoint = self.best_waypoint
+
+    def __nearest_position(self, t):
+        """Position of the odometry sample closest in time, as `Trajectory.nearest_time_indices` finds it."""
+        times = self.odometry_t
+        right = min(bisect.bisect_left(times, t), len(times) - 1)
+        left = max(right - 1, 0)
+        closest = left if abs(times[left] - t) <= abs(times[right] - t) else right
+        closest = bisect.bisect_left(times, times[closest])
+        return self.odometry_x[closest], self.odometry_y[closest]
+
+    def __resolve_events(self, final=False):
+        if not self.odometry_t:
+            return
+        last_t = self.odometry_t[-1]
+        while self.pending_collisions and (final or self.pending_collisions[0][0] <= last_t):
+            t, actor_id = self.pending_collisions.popleft()
+            position = self.__nearest_position(t)
+            if _distance(position, self.previous_collision) > DIFFERENT_EVENT_DISTANCE:
+                self.collisions += 1
+                self.collision_actor_ids.append(int(actor_id))
+            self.previous_collision = position
+        while self.pending_lane_invasions and (final or self.pending_lane_invasions[0] <= last_t):
+            t = self.pending_lane_invasions.popleft()
+            position = self.__nearest_position(t)
+            if _distance(position, self.previous_lane_invasion) > DIFFERENT_EVENT_DISTANCE and \
+                    t - self.previous_lane_invasion_time > DIFFERENT_LANE_INVASION_TIME:
+                self.lane_invasions += 1
+            self.previous_lane_invasion = position
+            self.previous_lane_invasion_time = t
+
+    def snapshot(self, final=False):
+        """Current value of the metrics.
+
+        Arguments:
+            final {bool} -- The experiment has finished, the events after the last odometry sample are counted too
+
+        Returns:
+            dict -- Metrics with the same keys as the `metrics_carla` ones
+        """
+        with self.lock:
+            if final:
+                self.__resolve_events(final=True)
+            metrics = {
+                'completed_distance': self.completed_distance,
+                'collisions': self.collisions,
+                'collision_actor_ids': list(self.collision_actor_ids),
+                'lane_invasions': self.lane_invasions,
+            }
+            metrics.update(self.smoothness.speed_summary())
+            metrics.update(self.smoothness.control_summary())
+            if self.clock_start is not None:
+                metrics['experiment_total_simulated_time'] = float(self.clock_end - self.clock_start)
+            if self.position_deviation_samples:
+                metrics['effective_completed_distance'] = self.covered_waypoints * WAYPOINTS_RESOLUTION
+                metrics['position_deviation_mean'] = self.position_deviation_total_err / self.position_deviation_samples
+                metrics['position_deviation_total_err'] = self.position_deviation_total_err
+                metrics['position_deviation_max'] = self.position_deviation_max
+        kilometers = metrics.get('effective_completed_distance', 0) / 1000
+        if kilometers:
+            for key, per_km_key in PER_KM_METRICS:
+                if key in metrics:
+                    metrics[per_km_key] = metrics[key] / kilometers
+        return metrics
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""This module contains the perfect lap ground truth of the Gazebo circuits.
+
+The perfect lap bag of a circuit is read only once: its poses, lap point, circuit diameter and arc length
+parameterization are stored in a cache file next to the bag, keyed by the hash of the bag. Later reads load the
+cache, and the perfect laps already loaded in the process are reused while their bag does not change.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import hashlib
+import zipfile
+import numpy as np
+
+from utils import rosbag_reader
+from utils.logger import logger
+
+ODOMETRY_TOPIC = '/F1ROS/odom'
+CACHE_EXTENSION = '.cache.npz'
+CACHE_VERSION = 1
+# The lap is completed at the first pose, after these many, closer than this distance in meters to the start
+LAP_MIN_CHECKPOINTS = 100
+FINISH_LINE_DISTANCE = 1.0
+
+_perfect_laps = {}
+
+
+class Checkpoints(list):
+    """Perfect lap poses as a list of dicts with the bag field names, that also keeps the `x` and `y` arrays."""
+
+    def __init__(self, columns):
+        fields = list(columns)
+        super().__init__(dict(zip(fields, values)) for values in zip(*(columns[field].tolist() for field in fields)))
+        self.x = columns['pose.pose.position.x']
+        self.y = columns['pose.pose.position.y']
+
+
+class PerfectLap:
+    """Ground truth of a circuit.
+
+    Attributes:
+        columns {dict} -- `Time` and `rosbag_reader.POSE_FIELDS` arrays of the perfect lap poses
+        lap_index {int} -- Index of the pose where the lap is completed, -1 if it is never completed
+        circuit_diameter {float} -- Distance driven until the lap is completed (the whole bag if it is not)
+        arc_length {np.ndarray} -- Distance along the closed lap from the first pose to each pose
+        lap_length {float} -- Length of the closed lap
+    """
+
+    def __init__(self, columns, lap_index, circuit_diameter, arc_length, lap_length):
+        self.columns = columns
+        self.lap_index = lap_index
+        self.circuit_diameter = circuit_diameter
+        self.arc_length = arc_length
+        self.lap_length = lap_length
+        self._checkpoints = None
+
+    @property
+    def x(self):
+        return self.columns['pose.pose.position.x']
+
+    @property
+    def y(self):
+        return self.columns['pose.pose.position.y']
+
+    @property
+    def checkpoints(self):
+        if self._checkpoints is None:
+            self._checkpoints = Checkpoints(self.columns)
+        return self._checkpoints
+
+    @classmethod
+    def from_columns(cls, columns):
+        x = columns['pose.pose.position.x']
+        y = columns['pose.pose.position.y']
+        steps = np.sqrt((x[:-1] - x[1:]) ** 2 + (y[:-1] - y[1:]) ** 2)
+
+        finish_line = np.flatnonzero(np.sqrt((x[0] - x) ** 2 + (y[0] - y) ** 2) <= FINISH_LINE_DISTANCE)
+        finish_line = finish_line[finish_line > LAP_MIN_CHECKPOINTS]
+        lap_index = int(finish_line[0]) if len(finish_line) else -1
+
+        # Added in order, as the experiments completed distance, so the diameter does not change with the cache
+        circuit_diameter = float(sum(steps[:lap_index].tolist() if lap_index >= 0 else steps.tolist()))
+
+        arc_length = np.concatenate(([0], np.cumsum(steps)))
+        lap_length = float(arc_length[-1] + np.hypot(x[-1] - x[0], y[-1] - y[0])) if len(x) else 0.0
+        return cls(columns, lap_index, circuit_diameter, arc_length, lap_length)
+
+    @classmethod
+    def from_bag(cls, bag_filename):
+        columns = rosbag_reader.read_topics(bag_filename, {ODOMETRY_TOPIC: rosbag_reader.POSE_FIELDS})[ODOMETRY_TOPIC]
+        return cls.from_columns(columns)
+
+
+def get_file_hash(filename):
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_cache_filename(bag_filename):
+    return bag_filename + CACHE_EXTENSION
+
+
+def write_cache(perfect_lap, cache_filename, source_hash, source_stat):
+    tmp_filename = '{}.{}.tmp'.format(cache_filename, os.getpid())
+    with open(tmp_filename, 'wb') as f:
+        np.savez(f, version=CACHE_VERSION, source_hash=source_hash, source_size=source_stat.st_size,
+                 source_mtime_ns=source_stat.st_mtime_ns, lap_index=perfect_lap.lap_index,
+                 circuit_diameter=perfect_lap.circuit_diameter, arc_length=perfect_lap.arc_length,
+                 lap_length=perfect_lap.lap_length, columns=list(perfect_lap.columns),
+                 **{'column_' + field: column for field, column in perfect_lap.columns.items()})
+    os.replace(tmp_filename, cache_filename)
+
+
+def read_cache(cache_filename, bag_filename, source_stat):
+    """Read the cached perfect lap of a bag.
+
+    The bag is only hashed when its size or modification time differ from the cached ones.
+
+    Returns:
+        PerfectLap -- Cached perfect lap, or None if there is no valid cache for the bag
+    """
+    try:
+        with np.load(cache_filename) as cache:
+            if int(cache['version']) != CACHE_VERSION:
+                return None
+            if int(cache['source_size']) != source_stat.st_size or \
+                    int(cache['source_mtime_ns']) != source_stat.st_mtime_ns:
+                if str(cache['source_hash']) != get_file_hash(bag_filename):
+                    return None
+            columns = {str(field): cache['column_' + str(field)] for field in cache['columns']}
+            return PerfectLap(columns, int(cache['lap_index']), float(cache['circuit_diameter']),
+                              cache['arc_length'], float(cache['lap_length']))
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def load_perfect_lap(bag_filename):
+    """Read the perfect lap of a bag from its cache, creating the cache if it is missing or outdated."""
+    source_stat = os.stat(bag_filename)
+    cache_filename = get_cache_filename(bag_filename)
+    perfect_lap = read_cache(cache_filename, bag_filename, source_stat)
+    if perfect_lap is None:
+        logger.info('Caching perfect lap {}'.format(bag_filename))
+        perfect_lap = PerfectLap.from_bag(bag_filename)
+        try:
+            write_cache(perfect_lap, cache_filename, get_file_hash(bag_filename), source_stat)
+        except OSError as ex:
+            logger.info('Could not cache perfect lap {}: {}'.format(bag_filename, ex))
+    return perfect_lap
+
+
+def get_perfect_lap(bag_filename):
+    """Perfect lap of a bag, shared by all the callers of the process while the bag does not change.
+
+    Arguments:
+        bag_filename {str} -- Path of the perfect lap bag
+
+    Returns:
+        PerfectLap -- Perfect lap of the bag
+    """
+    source_stat = os.stat(bag_filename)
+    key = os.path.abspath(bag_filename)
+    cached = _perfect_laps.get(key)
+    if cached is not None and cached[0] == (source_stat.st_size, source_stat.st_mtime_ns):
+        return cached[1]
+    perfect_lap = load_perfect_lap(bag_filename)
+    _perfect_laps[key] = ((source_stat.st_size, source_stat.st_mtime_ns), perfect_lap)
+    return perfect_lap
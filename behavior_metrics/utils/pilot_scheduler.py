@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""This module contains the scheduler that paces the main loop of the pilots.
+
+The scheduler decides when each brain iteration starts and measures how well the loop keeps its period: the start
+to start period of the iterations, their jitter and the iterations that missed their deadline.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import threading
+import time
+import numpy as np
+
+# fixed: one iteration every time cycle of wall clock time
+# event: one iteration per new data of the event sensor, as fast as the simulator produces it
+# clock: one iteration every time cycle of simulated time (/clock)
+PILOT_SCHEDULERS = ('fixed', 'event', 'clock')
+DEFAULT_PILOT_SCHEDULER = 'fixed'
+DEFAULT_PILOT_EVENT_SENSOR = 'camera_0'
+# Maximum time [s] to wait for an event before running the iteration anyway (e.g. while the simulator is paused)
+EVENT_TIMEOUT = 1.0
+
+
+class PilotScheduler:
+    """Paces the main loop of a pilot.
+
+    `wait` is called at the beginning of every iteration and returns when the brain should be executed, `done` is
+    called after it. The deadline of an iteration is the start of the next one: with the fixed and clock schedulers
+    an iteration misses it when it takes longer than the time cycle, with the event scheduler when new data arrives
+    while the brain is still running. The time the pilot spends paused (see `pause`) is left out of the periods and
+    the lateness.
+
+    Arguments:
+        mode {str} -- One of PILOT_SCHEDULERS
+        time_cycle {float} -- Period of the loop [ms], with the fixed and clock schedulers (the event scheduler runs
+        at the rate of its sensor and waits at most EVENT_TIMEOUT for it)
+        event_sensor {object} -- Sensor with a `sequence` (robot.interfaces.sequence.SensorSequence), used by the
+        event scheduler
+    """
+
+    def __init__(self, mode, time_cycle, event_sensor=None):
+        if mode not in PILOT_SCHEDULERS:
+            raise ValueError('Unknown pilot scheduler {}, use one of {}'.format(mode, PILOT_SCHEDULERS))
+        if mode == 'event' and getattr(event_sensor, 'sequence', None) is None:
+            raise ValueError('The event pilot scheduler needs a sensor with a sequence')
+        self.mode = mode
+        self.period = time_cycle / 1000
+        self.event_sensor = event_sensor
+        self.clock_condition = threading.Condition()
+        self.clock_time = 0
+        self.next_deadline = None
+        self.next_clock_deadline = None
+        self.event_seq = None
+        self.start_time = None
+        self.previous_start_time = None
+        self.paused = False
+        self.reset()
+
+    def reset(self):
+        """Forget the measured iterations (the schedule itself goes on, so it can be called from another thread)."""
+        self.periods = []
+        self.iteration_durations = []
+        self.lateness = []
+        self.deadline_misses = 0
+        self.event_timeouts = 0
+
+    def pause(self):
+        """The pilot is paused, the next iteration starts a new schedule instead of counting as late."""
+        self.paused = True
+
+    def update_clock(self, clock_time):
+        """Simulated time [s] of the last /clock message, wakes up the clock scheduler."""
+        with self.clock_condition:
+            self.clock_time = clock_time
+            self.clock_condition.notify_all()
+
+    def wait(self):
+        """Wait until the next iteration has to start.
+
+        Returns:
+            float -- perf_counter time at which the iteration starts
+        """
+        if self.paused:
+            self.paused = False
+            self.next_deadline = None
+            self.next_clock_deadline = None
+            self.event_seq = None
+            self.previous_start_time = None
+        if self.mode == 'fixed':
+            self._wait_fixed()
+        elif self.mode == 'event':
+            self._wait_event()
+        else:
+            self._wait_clock()
+        self.start_time = time.perf_counter()
+        if self.previous_start_time is not None:
+            self.periods.append(self.start_time - self.previous_start_time)
+        self.previous_start_time = self.start_time
+        return self.start_time
+
+    def _wait_fixed(self):
+        # Absolute deadlines, so the sleep overshoot does not accumulate over the iterations
+        now = time.perf_counter()
+        if self.next_deadline is None:
+            self.next_deadline = now
+        elif now < self.next_deadline:
+            time.sleep(self.next_deadline - now)
+            now = time.perf_counter()
+        self.lateness.append(max(now - self.next_deadline, 0))
+        # A late loop starts again from now instead of running the missed iterations back to back
+        self.next_deadline = max(self.next_deadline + self.period, now)
+
+    def _wait_event(self):
+        sequence = self.event_sensor.sequence
+        seq = sequence.seq if self.event_seq is None else self.event_seq
+        if not sequence.wait_for_new(EVENT_TIMEOUT, seq):
+            self.event_timeouts += 1
+        self.event_seq = sequence.seq
+
+    def _wait_clock(self):
+        with self.clock_condition:
+            if self.next_clock_deadline is None:
+                self.next_clock_deadline = self.clock_time
+            while self.clock_time < self.next_clock_deadline:
+                if not self.clock_condition.wait(EVENT_TIMEOUT):
+                    self.event_timeouts += 1
+                    break
+            self.lateness.append(max(self.clock_time - self.next_clock_deadline, 0))
+            self.next_clock_deadline = max(self.next_clock_deadline + self.period, self.clock_time)
+
+    def done(self):
+        """Finish the current iteration.
+
+        Returns:
+            float -- Duration of the iteration [s]
+        """
+        duration = time.perf_counter() - self.start_time
+        self.iteration_durations.append(duration)
+        if self.mode == 'event':
+            missed = self.event_sensor.sequence.seq > self.event_seq
+        elif self.mode == 'clock':
+            missed = self.clock_time > self.next_clock_deadline
+        else:
+            missed = duration > self.period
+        self.deadline_misses += int(missed)
+        return duration
+
+    def summary(self, prefix='pilot'):
+        """Flat dictionary with the scheduling metrics, to be added to the experiment metrics."""
+        iterations = len(self.iteration_durations)
+        periods = self.periods
+        return {
+            prefix + '_scheduler': self.mode,
+            prefix + '_iterations': iterations,
+            prefix + '_deadline_misses': self.deadline_misses,
+            prefix + '_deadline_miss_percentage': self.deadline_misses * 100 / iterations if iterations else 0,
+            prefix + '_event_timeouts': self.event_timeouts,
+            prefix + '_mean_period': float(np.mean(periods)) if len(periods) else 0,
+            prefix + '_period_jitter': float(np.std(periods)) if len(periods) else 0,
+            prefix + '_max_period': float(np.max(periods)) if len(periods) else 0,
+            prefix + '_max_lateness': float(np.max(self.lateness)) if self.lateness else 0,
+        }
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""This module reads the metrics rosbags straight into NumPy columns.
+
+It replaces the bagpy round trip (one CSV per topic written to disk and read back with pandas) with a
+single pass over the bag that only extracts the requested message fields. Column names follow the bagpy
+naming (`Time`, `pose.pose.position.x`, ...) so the metrics code can keep using the same keys.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import operator
+import numpy as np
+
+TIME_COLUMN = 'Time'
+
+ODOMETRY_FIELDS = {
+    'pose.pose.position.x': np.float64,
+    'pose.pose.position.y': np.float64,
+}
+POSE_FIELDS = {
+    'pose.pose.position.x': np.float64,
+    'pose.pose.position.y': np.float64,
+    'pose.pose.position.z': np.float64,
+    'pose.pose.orientation.x': np.float64,
+    'pose.pose.orientation.y': np.float64,
+    'pose.pose.orientation.z': np.float64,
+    'pose.pose.orientation.w': np.float64,
+}
+CLOCK_FIELDS = {
+    'clock.secs': np.int64,
+    'clock.nsecs': np.int64,
+}
+
+
+def read_topics(bag_filename, topics_fields):
+    """Read the given fields of the given topics of a rosbag.
+
+    The bag is iterated only once and every column is preallocated from the message count of its topic.
+
+    Arguments:
+        bag_filename {str} -- Path of the rosbag
+        topics_fields {dict} -- For each topic, a dict mapping the dotted message field to its dtype
+
+    Returns:
+        dict -- For each topic, a dict with a `Time` column (bag time in seconds) and one array per field.
+        Topics without messages in the bag get empty columns.
+
+    Raises:
+        rosbag.bag.ROSBagException -- If the bag can not be opened
+    """
+    import rosbag
+
+    with rosbag.Bag(bag_filename, 'r') as bag:
+        return read_bag_topics(bag, topics_fields)
+
+
+def read_bag_topics(bag, topics_fields, other_topics=(), callback=None):
+    """Same as `read_topics` on an open rosbag, also passing the messages of other topics to a callback.
+
+    Arguments:
+        bag {rosbag.Bag} -- Open rosbag
+        topics_fields {dict} -- For each topic, a dict mapping the dotted message field to its dtype
+
+    Keyword Arguments:
+        other_topics {list} -- Topics read in the same pass whose messages are only passed to `callback`
+        (default: {()})
+        callback {function} -- Called with the topic, message and bag time of every message of `other_topics`
+        (default: {None})
+    """
+    columns = {}
+    getters = {}
+    counters = {}
+    for topic, fields in topics_fields.items():
+        count = bag.get_message_count(topic_filters=[topic])
+        columns[topic] = {TIME_COLUMN: np.empty(count, dtype=np.float64)}
+        for field, dtype in fields.items():
+            columns[topic][field] = np.empty(count, dtype=dtype)
+        getters[topic] = [(columns[topic][field], operator.attrgetter(field)) for field in fields]
+        counters[topic] = 0
+
+    for topic, msg, t in bag.read_messages(topics=list(topics_fields) + list(other_topics)):
+        if topic not in columns:
+            callback(topic, msg, t)
+            continue
+        i = counters[topic]
+        columns[topic][TIME_COLUMN][i] = t.secs + t.nsecs * 1e-9
+        for column, getter in getters[topic]:
+            column[i] = getter(msg)
+        counters[topic] = i + 1
+
+    for topic, count in counters.items():
+        for field, column in columns[topic].items():
+            columns[topic][field] = column[:count]
+    return columns
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""This module contains the columnar trajectory used by the metrics.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from utils.rosbag_reader import TIME_COLUMN
+
+
+def _column(values, length=None):
+    if values is None:
+        return np.full(length, np.nan)
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _sample(t, source_t, source_values):
+    """Sample a signal at the times `t`, holding the last received value."""
+    if len(source_t) == 0:
+        return np.full(len(t), np.nan)
+    indices = np.searchsorted(source_t, t, side='right') - 1
+    return source_values[np.clip(indices, 0, len(source_t) - 1)]
+
+
+class Trajectory:
+    """Trajectory of a vehicle stored as contiguous float64 columns.
+
+    Every column has one value per pose sample. Channels that were not recorded are filled with NaN.
+
+    Attributes:
+        t {np.ndarray} -- Bag time of each pose sample in seconds
+        x {np.ndarray} -- X position
+        y {np.ndarray} -- Y position
+        yaw {np.ndarray} -- Heading in radians
+        speed {np.ndarray} -- Speed in m/s
+        throttle {np.ndarray} -- Commanded throttle
+        steer {np.ndarray} -- Commanded steer
+        brake {np.ndarray} -- Commanded brake
+    """
+
+    __slots__ = ('t', 'x', 'y', 'yaw', 'speed', 'throttle', 'steer', 'brake')
+
+    def __init__(self, t, x, y, yaw=None, speed=None, throttle=None, steer=None, brake=None):
+        self.t = _column(t)
+        length = len(self.t)
+        self.x = _column(x, length)
+        self.y = _column(y, length)
+        self.yaw = _column(yaw, length)
+        self.speed = _column(speed, length)
+        self.throttle = _column(throttle, length)
+        self.steer = _column(steer, length)
+        self.brake = _column(brake, length)
+
+    @classmethod
+    def from_columns(cls, odometry, speedometer=None, vehicle_status=None):
+        """Build a trajectory from the columns returned by `rosbag_reader.read_topics`.
+
+        Speed and control commands are sampled at the odometry times, holding the last received value.
+
+        Arguments:
+            odometry {dict} -- Odometry columns
+            speedometer {dict} -- Speedometer columns (optional)
+            vehicle_status {dict} -- Vehicle status columns (optional)
+        """
+        t = odometry[TIME_COLUMN]
+        yaw = None
+        if 'pose.pose.orientation.w' in odometry:
+            qx, qy = odometry['pose.pose.orientation.x'], odometry['pose.pose.orientation.y']
+            qz, qw = odometry['pose.pose.orientation.z'], odometry['pose.pose.orientation.w']
+            yaw = np.arctan2(2 * (qw * qz + qx * qy), 1 - 2 * (qy * qy + qz * qz))
+        speed = throttle = steer = brake = None
+        if speedometer is not None:
+            speed = _sample(t, speedometer[TIME_COLUMN], speedometer['data'])
+        if vehicle_status is not None:
+            throttle = _sample(t, vehicle_status[TIME_COLUMN], vehicle_status['control.throttle'])
+            steer = _sample(t, vehicle_status[TIME_COLUMN], vehicle_status['control.steer'])
+            brake = _sample(t, vehicle_status[TIME_COLUMN], vehicle_status['control.brake'])
+        return cls(t, odometry['pose.pose.position.x'], odometry['pose.pose.position.y'], yaw=yaw,
+                   speed=speed, throttle=throttle, steer=steer, brake=brake)
+
+    def __len__(self):
+        return len(self.t)
+
+    def take(self, indices):
+        """Return a new trajectory with the samples at `indices`."""
+        return Trajectory(*(getattr(self, name)[indices] for name in self.__slots__))
+
+    def step_distances(self):
+        """Distance travelled between consecutive samples (one element less than the trajectory)."""
+        return np.sqrt(np.diff(self.x) ** 2 + np.diff(self.y) ** 2)
+
+    def nearest_time_indices(self, times):
+        """Index of the sample closest in time to each of `times`.
+
+        Ties resolve to the earliest sample, as `(t - time).abs().idxmin()` does.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if len(self.t) == 0 or len(times) == 0:
+            return np.zeros(len(times), dtype=np.intp)
+        right = np.clip(np.searchsorted(self.t, times, side='left'), 0, len(self.t) - 1)
+        left = np.clip(right - 1, 0, len(self.t) - 1)
+        closest = np.where(np.abs(self.t[left] - times) <= np.abs(self.t[right] - times), left, right)
+        return np.searchsorted(self.t, self.t[closest], side='left')
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+"""This module contains the spatial index used to match experiment positions against map waypoints.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import hashlib
+import pickle
+import threading
+import numpy as np
+
+from scipy.spatial import cKDTree
+from utils.constants import CARLA_MAPS_WAYPOINTS_CACHE_DIR
+from utils.logger import logger
+
+# Bumped whenever the generation of the cached waypoints (e.g. the conversion to the map frame) changes
+WAYPOINTS_CACHE_VERSION = 1
+
+
+class WaypointIndex:
+    """KD-tree over the 2D map waypoints, built once and queried in batch.
+
+    Distances are recomputed with the same expression used by the original point-by-point loop
+    (sqrt of the summed squared differences) and ties are broken towards the lowest waypoint index,
+    so the results match an exhaustive linear scan exactly.
+
+    Attributes:
+        x {np.ndarray} -- X coordinate of every waypoint
+        y {np.ndarray} -- Y coordinate of every waypoint
+        tree {cKDTree} -- Spatial index over (x, y)
+    """
+
+    def __init__(self, x, y, tree=None):
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        if tree is None:
+            tree = cKDTree(np.column_stack((self.x, self.y)))
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.x)
+
+    def _distances(self, indices, point_x, point_y):
+        return np.sqrt((self.x[indices] - point_x) ** 2 + (self.y[indices] - point_y) ** 2)
+
+    def nearest(self, points_x, points_y):
+        """Find the nearest waypoint for every query point.
+
+        Arguments:
+            points_x {array_like} -- X coordinate of the query points
+            points_y {array_like} -- Y coordinate of the query points
+
+        Returns:
+            (np.ndarray, np.ndarray) -- Index of the nearest waypoint and distance to it for each point
+        """
+        points_x = np.asarray(points_x, dtype=np.float64)
+        points_y = np.asarray(points_y, dtype=np.float64)
+        if len(points_x) == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float64)
+
+        queries = np.column_stack((points_x, points_y))
+        tree_distances, indices = self.tree.query(queries)
+        indices = np.asarray(indices, dtype=np.intp)
+        distances = self._distances(indices, points_x, points_y)
+
+        # The tree and the reference expression may disagree in the last bits, so every waypoint
+        # that lies (almost) as close as the one found is re-checked with the reference expression.
+        radius = tree_distances * (1 + 1e-9) + 1e-9
+        candidates = self.tree.query_ball_point(queries, radius)
+        for i, candidate_indices in enumerate(candidates):
+            if len(candidate_indices) < 2:
+                continue
+            candidate_indices = np.sort(np.asarray(candidate_indices, dtype=np.intp))
+            candidate_distances = self._distances(candidate_indices, points_x[i], points_y[i])
+            best = np.argmin(candidate_distances)
+            indices[i] = candidate_indices[best]
+            distances[i] = candidate_distances[best]
+
+        return indices, distances
+
+    def match(self, points_x, points_y):
+        """Match every point with its nearest waypoint, as the point-by-point scan of the position deviation did.
+
+        Points further than 100 meters from every waypoint keep the previous match and are not scored. A
+        waypoint is covered when a point closer than 1 meter matches it and both its coordinates differ from the
+        last covered waypoint.
+
+        Arguments:
+            points_x {array_like} -- X coordinate of the points
+            points_y {array_like} -- Y coordinate of the points
+
+        Returns:
+            (list, list, list, list) -- Distance of every scored point, X and Y of the waypoint matched with every
+            point and covered waypoints
+        """
+        best_waypoints, best_distances = self.nearest(points_x, points_y)
+
+        min_dists = []
+        best_points_x = []
+        best_points_y = []
+        best_point_x, best_point_y = np.nan, np.nan
+
+        covered_waypoints = []
+        for best_waypoint, min_dist in zip(best_waypoints, best_distances):
+            if min_dist < 100:
+                best_point_x = self.x[best_waypoint]
+                best_point_y = self.y[best_waypoint]
+            best_points_x.append(best_point_x)
+            best_points_y.append(best_point_y)
+            if min_dist < 100:
+                min_dists.append(min_dist)
+                if len(covered_waypoints) == 0 or (covered_waypoints[-1][0] != best_point_x and
+                                                   covered_waypoints[-1][1] != best_point_y):
+                    if min_dist < 1:
+                        covered_waypoints.append((best_point_x, best_point_y))
+        return min_dists, best_points_x, best_points_y, covered_waypoints
+
+
+def to_map_frame(carla_map, x, y):
+    """Apply the per-town axis flips used to draw CARLA waypoints in the metrics maps."""
+    if (carla_map == 'Carla/Maps/Town04' or carla_map == 'Carla/Maps/Town04_Opt'):
+        return -x, y
+    elif (carla_map == 'Carla/Maps/Town06' or carla_map == 'Carla/Maps/Town06_Opt'):
+        return x, -y
+    return x, y
+
+
+class MapWaypoints:
+    """Waypoints of a CARLA map, persisted on disk and loaded lazily.
+
+    The first time a map is requested at a given resolution its waypoints are generated by the simulator,
+    converted to the metrics map frame and stored as a memory-mappable `.npy` file together with the pickled
+    KD-tree. Later experiments (every experiment runs in its own process) only map the files from disk.
+    The waypoints file is named after the cache version and the KD-tree file after the hash of the waypoints it
+    indexes, so stale files are never reused.
+
+    Attributes:
+        carla_map_name {str} -- Name of the map, e.g. `Carla/Maps/Town04`
+        resolution {float} -- Distance in meters between waypoints
+    """
+
+    def __init__(self, carla_map_name, resolution=0.5, carla_map=None, cache_dir=CARLA_MAPS_WAYPOINTS_CACHE_DIR):
+        self.carla_map_name = carla_map_name
+        self.resolution = resolution
+        self.carla_map = carla_map
+        self.cache_dir = cache_dir
+        self.key = '{}_{}_v{}'.format(carla_map_name.split('/')[-1], resolution, WAYPOINTS_CACHE_VERSION)
+        self.waypoints_filename = os.path.join(cache_dir, self.key + '.npy')
+        self.__xy = None
+        self.__index = None
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return self.xy.shape[1]
+
+    @property
+    def xy(self):
+        """(2, N) array with the waypoints in the metrics map frame."""
+        with self.__lock:
+            if self.__xy is None:
+                if not os.path.isfile(self.waypoints_filename):
+                    self.__generate()
+                self.__xy = np.load(self.waypoints_filename, mmap_mode='r')
+        return self.__xy
+
+    @property
+    def x(self):
+        return self.xy[0]
+
+    @property
+    def y(self):
+        return self.xy[1]
+
+    @property
+    def index(self):
+        """`WaypointIndex` over the waypoints, unpickled from the cache when available."""
+        xy = self.xy
+        with self.__lock:
+            if self.__index is None:
+                waypoints_hash = hashlib.sha1(np.ascontiguousarray(xy).tobytes()).hexdigest()[:16]
+                index_filename = os.path.join(self.cache_dir, '{}_{}_index.pkl'.format(self.key, waypoints_hash))
+                tree = None
+                if os.path.isfile(index_filename):
+                    try:
+                        with open(index_filename, 'rb') as f:
+                            tree = pickle.load(f)
+                    except Exception as ex:
+                        logger.info('Rebuilding waypoints index {}: {}'.format(index_filename, ex))
+                if tree is not None and (not isinstance(tree, cKDTree) or not np.array_equal(tree.data, xy.T)):
+                    logger.info('Rebuilding waypoints index {}: it does not index the waypoints'.format(index_filename))
+                    tree = None
+                self.__index = WaypointIndex(xy[0], xy[1], tree=tree)
+                if tree is None:
+                    self.__write(index_filename, lambda f: pickle.dump(self.__index.tree, f, protocol=pickle.HIGHEST_PROTOCOL))
+        return self.__index
+
+    def __generate(self):
+        if self.carla_map is None:
+            raise ValueError('No cached waypoints for {} and no CARLA map to generate them'.format(self.carla_map_name))
+        logger.info('Generating waypoints for {} every {} m'.format(self.carla_map_name, self.resolution))
+        waypoints = self.carla_map.generate_waypoints(self.resolution)
+        x = np.fromiter((waypoint.transform.location.x for waypoint in waypoints), dtype=np.float64, count=len(waypoints))
+        y = np.fromiter((waypoint.transform.location.y for waypoint in waypoints), dtype=np.float64, count=len(waypoints))
+        xy = np.stack(to_map_frame(self.carla_map_name, x, y))
+        self.__write(self.waypoints_filename, lambda f: np.save(f, xy))
+
+    def __write(self, filename, dump):
+        # Several experiment processes may fill the cache at once, so files are written aside and renamed
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmp_filename, 'wb') as f:
+            dump(f)
+        os.replace(tmp_filename, filename)
+
+
+_map_waypoints = {}
+
+
+def get_map_waypoints(carla_map_name, resolution=0.5, carla_map=None):
+    """Return the shared `MapWaypoints` for a map and resolution.
+
+    Arguments:
+        carla_map_name {str} -- Name of the map, e.g. `Carla/Maps/Town04`
+        resolution {float} -- Distance in meters between waypoints
+        carla_map {carla.Map} -- Map used to generate the waypoints if they are not cached yet
+    """
+    key = (carla_map_name, resolution)
+    if key not in _map_waypoints:
+        _map_waypoints[key] = MapWaypoints(carla_map_name, resolution, carla_map=carla_map)
+    elif carla_map is not None and _map_waypoints[key].carla_map is None:
+        _map_waypoints[key].carla_map = carla_map
+    return _map_waypoints[key]